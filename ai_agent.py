@@ -1,55 +1,162 @@
-import requests
-import json
-import re
 import config
+import threading
 import time
+from collections import deque
 from datetime import datetime  # 必须保留这行导入
+from decision_cache import DecisionCache
+from inference import InferenceClient, PRIORITY_ENTRY
+from ollama_client import perf_stats, format_perf
+from ai_parser import Decision, is_decision_list, parse_batch, parse_decision
 
 class DeepSeekAgent:
     def __init__(self):
-        self.url = config.OLLAMA_URL
+        self.cache = DecisionCache()
+        self.client = InferenceClient()  # 异步优先级队列 + 多模型路由
+        self.perf = deque(maxlen=200)  # 每次推理的耗时统计 (ollama_client.perf_stats)
+        self._perf_lock = threading.Lock()
 
-    def analyze(self, model_name, symbol, price, market_report, qty, avg_price, cash, equity, system_state, prev_memory=None):
+    def analyze(self, model_name, symbol, price, market_report, qty, avg_price, cash, equity, system_state, prev_memory=None, hints=None, on_think=None, priority=PRIORITY_ENTRY):
         """
         Hybrid 模式专用分析器：教 AI 结合硬指标与软形态，并拥有连续记忆
+        hints: strategy.market_hints 的结果，用来算决策缓存指纹 (不传就不走缓存)
+        on_think: 流式模式下逐块收到 <think> 内容的回调
+        priority: 推理排队优先级 (inference.PRIORITY_*)
         """
+        key = self.cache.fingerprint(symbol, price, qty, avg_price, hints, prev_memory)
+        cached = self.cache.get(key)
+        if cached is not None:
+            action, amount_usd, reason, thought = cached
+            return action, amount_usd, f"{reason} (cached)", f"♻️ 行情指纹未变，复用缓存决策\n{thought}"
+        return self._analyze_uncached(key, model_name, symbol, price, market_report, qty, avg_price, cash, equity, system_state, prev_memory, on_think, priority)
+
+    def _analyze_uncached(self, key, model_name, symbol, price, market_report, qty, avg_price, cash, equity, system_state, prev_memory=None, on_think=None, priority=PRIORITY_ENTRY):
+        """缓存已经查过 (没命中)：直接推理并写缓存，analyze_batch 的单币种回退走这里，不会再记一次 miss"""
+        result = self._query(model_name, symbol, price, market_report, qty, avg_price, cash, equity, system_state, prev_memory, on_think, priority)
+        # 网络错误 / 非 200 不缓存，下一轮重新问
+        if not result[2].startswith(("Net Err", "Status ")): self.cache.put(key, result)
+        return result
+
+    def analyze_batch(self, model_name, items, cash, equity, system_state, on_think=None):
+        """
+        📦 批量模式：多个币种打包进一个 prompt，一次推理返回 JSON 数组
+        items: [{'symbol','price','report','qty','avg','prev_memory','hints','priority'}]
+        Returns: {symbol: (action, amount_usd, reason, thought)}
+        缓存命中的币种不进 prompt；配置了 AI_SCREEN_MODEL 时先用小模型初筛，判 HOLD 的不再深度推理；
+        AI 返回里缺失 / 格式错误的币种单独推理 (缓存已经查过，不再重复查)
+        """
+        results, pending, keys = {}, [], {}
+        for it in items:
+            key = self.cache.fingerprint(it['symbol'], it['price'], it['qty'], it['avg'], it.get('hints'), it.get('prev_memory'))
+            cached = self.cache.get(key)
+            if cached is not None:
+                action, amount_usd, reason, thought = cached
+                results[it['symbol']] = (action, amount_usd, f"{reason} (cached)", f"♻️ 行情指纹未变，复用缓存决策\n{thought}")
+            else:
+                keys[it['symbol']] = key
+                pending.append(it)
+
+        if pending and config.AI_SCREEN_MODEL:
+            pending = self._screen(model_name, pending, keys, results, cash, equity, system_state)
+
+        if len(pending) > 1:
+            decisions, thought = self._query_batch(model_name, pending, cash, equity, system_state, on_think)
+            for symbol, (action, amount_usd, reason) in decisions.items():
+                results[symbol] = Decision(action, amount_usd, reason, thought)
+                self.cache.put(keys[symbol], results[symbol])
+
+        # 单币种 / 批量里没拿到有效结果的币种：逐个单独问
+        for it in pending:
+            if it['symbol'] in results: continue
+            if len(pending) > 1:
+                print(f"[{it['symbol']}] Batch entry missing or malformed, falling back to single prompt")
+                if on_think: on_think("\n")  # 和批量推理的思考输出分行
+            results[it['symbol']] = self._analyze_uncached(
+                keys[it['symbol']], model_name, it['symbol'], it['price'], it['report'], it['qty'], it['avg'], cash, equity,
+                system_state, it.get('prev_memory'), on_think=on_think, priority=it.get('priority', PRIORITY_ENTRY))
+        return results
+
+    def _screen(self, model_name, items, keys, results, cash, equity, system_state):
+        """
+        🔎 小模型初筛：判 HOLD 的币种直接定为 HOLD (写入 results 和缓存)，其余返回给推理模型
+        初筛返回缺失 / 格式错误的币种保守处理：照样交给推理模型
+        """
+        decisions, _ = self._query_batch(config.AI_SCREEN_MODEL, items, cash, equity, system_state)
+        escalate = []
+        for it in items:
+            decision = decisions.get(it['symbol'])
+            if decision is not None and decision[0] == "HOLD":
+                results[it['symbol']] = ("HOLD", 0.0, f"[screen] {decision[2]}", f"🔎 初筛模型 {config.AI_SCREEN_MODEL} 判定 HOLD，未调用推理模型")
+                self.cache.put(keys[it['symbol']], results[it['symbol']])
+            else:
+                escalate.append(it)
+        if escalate: print(f"🔎 初筛放行 {[it['symbol'] for it in escalate]} -> {model_name}")
+        return escalate
+
+    def _query_batch(self, model_name, items, cash, equity, system_state, on_think=None):
+        """Returns: ({symbol: (action, amount_usd, reason)} 只含格式正确的条目, thought)"""
+        sections = []
+        for it in items:
+            sections.append(f"""
+        ===== {it['symbol']} =====
+        [STRATEGY MEMORY]
+        {self._memory_block(it.get('prev_memory'))}
+        
+        [DATA INPUT]
+        {it['report']}
+        
+        [POSITION]
+        {self._position_block(it['symbol'], it['price'], it['qty'], it['avg'])}
+        """)
+        symbols = [it['symbol'] for it in items]
+
+        prompt = f"""
+        [SYSTEM STATUS]
+        - Runtime: {system_state.get('run_time_min', 0)} min | Loop: {system_state.get('loop_count', 0)}
+        - Time: {datetime.now().strftime("%H:%M:%S")}
+        
+        [ACCOUNT] (Cash is shared by all symbols)
+        - Cash: ${cash:.2f} | Equity: ${equity:.2f}
+        
+        [SYMBOLS] You manage {len(items)} symbols: {", ".join(symbols)}. Decide for EACH symbol independently.
+        {"".join(sections)}
+
+        [OUTPUT JSON ARRAY ONLY] (One object per symbol, same order as above)
+        [
+            {{
+                "symbol": "<SYMBOL>",
+                "action": "BUY" | "SELL" | "HOLD",
+                "amount_usd": <float>,
+                "reason": "Brief logic."
+            }}
+        ]
+        """
+
+        try:
+            priority = min(it.get('priority', PRIORITY_ENTRY) for it in items)
+            status, raw_res = self._generate(self._payload(model_name, prompt), on_think, is_decision_list,
+                                             f"{model_name} BATCH {len(items)}", priority)
+        except Exception as e:
+            print(f"Batch Net Err: {e}")
+            return {}, ""
+        if status != 200: return {}, ""
+        print(f"\n[BATCH {symbols}] AI RAW OUTPUT:\n{raw_res}\n{'-'*30}")
+        return parse_batch(raw_res, symbols)
+
+    def _query(self, model_name, symbol, price, market_report, qty, avg_price, cash, equity, system_state, prev_memory=None, on_think=None, priority=PRIORITY_ENTRY):
+        """真正请求 Ollama 推理"""
         
         # 1. 构建持仓状态
-        position_block = "NO POSITION."
-        if qty > 0:
-            unrealized_pl = (price - avg_price) * qty
-            pl_pct = (price - avg_price) / avg_price * 100
-            position_block = f"""
-            [CURRENT POSITION]
-            - Symbol: {symbol}
-            - Quantity: {qty:.4f}
-            - Entry Price: ${avg_price:.2f}
-            - Current Price: ${price:.2f}
-            - Unrealized PnL: ${unrealized_pl:.2f} ({pl_pct:.2f}%)
-            """
+        position_block = self._position_block(symbol, price, qty, avg_price)
 
         # 2. 构建记忆模块 (新增)
-        memory_block = "No previous memory (First run or reset)."
-        if prev_memory:
-            # 计算距离上次思考过了多久
-            time_diff = int(time.time() - prev_memory.get('timestamp', time.time()))
-            memory_block = f"""
-            [YOUR PREVIOUS THOUGHTS] ({time_diff} seconds ago)
-            - Last Action: {prev_memory.get('action', 'UNKNOWN')}
-            - Last Reasoning: "{prev_memory.get('reason', 'None')}"
-            
-            (SELF-REFLECTION: Does your previous logic still hold true? Don't flip-flop unless market structure changed.)
-            """
+        memory_block = self._memory_block(prev_memory)
 
-        # 3. 构建 Prompt
+        # 3. 构建 Prompt (固定的目标 + 决策协议放在 system 前缀里，这里只有每次都变的部分)
         prompt = f"""
         [SYSTEM STATUS]
         - Runtime: {system_state.get('run_time_min', 0)} min | Loop: {system_state.get('loop_count', 0)}
         - Time: {datetime.now().strftime("%H:%M:%S")}
         
-        [OBJECTIVE]
-        Aggressive Scalper. Capitalize on trends, but protect capital strictly.
-        
         [STRATEGY MEMORY]
         {memory_block}
         
@@ -59,8 +166,67 @@ class DeepSeekAgent:
         [ACCOUNT]
         - Cash: ${cash:.2f} | Equity: ${equity:.2f}
         {position_block}
+
+        [OUTPUT JSON ONLY]
+        {{
+            "action": "BUY" | "SELL" | "HOLD",
+            "amount_usd": <float>,
+            "reason": "Brief logic. E.g. 'Trend UP + RSI Divergence detected'."
+        }}
+        """
         
-        [HYBRID DECISION PROTOCOL] (Follow Strictly)
+        # --- 发送请求 ---
+        payload = self._payload(model_name, prompt)
+
+        try:
+            status, raw_res = self._generate(payload, on_think, label=f"{model_name} {symbol}", priority=priority)
+
+            if status == 200:
+                print(f"\n[{symbol}] AI RAW OUTPUT:\n{raw_res}\n{'-'*30}")
+                
+                # --- 解析逻辑 (ai_parser：JSON 优先，正则兜底) ---
+                decision = parse_decision(raw_res)
+                if decision.reason == "Regex Fallback" and decision.amount_usd <= 0:
+                    if decision.action == "BUY": decision = decision._replace(amount_usd=min(cash * 0.1, 100.0))
+                    elif decision.action == "SELL" and qty > 0: decision = decision._replace(amount_usd=qty * price * 0.5)
+                return decision
+            
+            return Decision("HOLD", 0.0, f"Status {status}", "")
+            
+        except Exception as e:
+            return Decision("HOLD", 0.0, f"Net Err: {str(e)}", "")
+
+    @staticmethod
+    def _position_block(symbol, price, qty, avg_price):
+        if qty <= 0: return "NO POSITION."
+        unrealized_pl = (price - avg_price) * qty
+        pl_pct = (price - avg_price) / avg_price * 100
+        return f"""
+            [CURRENT POSITION]
+            - Symbol: {symbol}
+            - Quantity: {qty:.4f}
+            - Entry Price: ${avg_price:.2f}
+            - Current Price: ${price:.2f}
+            - Unrealized PnL: ${unrealized_pl:.2f} ({pl_pct:.2f}%)
+            """
+
+    @staticmethod
+    def _memory_block(prev_memory):
+        if not prev_memory: return "No previous memory (First run or reset)."
+        # 计算距离上次思考过了多久
+        time_diff = int(time.time() - prev_memory.get('timestamp', time.time()))
+        return f"""
+            [YOUR PREVIOUS THOUGHTS] ({time_diff} seconds ago)
+            - Last Action: {prev_memory.get('action', 'UNKNOWN')}
+            - Last Reasoning: "{prev_memory.get('reason', 'None')}"
+            
+            (SELF-REFLECTION: Does your previous logic still hold true? Don't flip-flop unless market structure changed.)
+            """
+
+    @staticmethod
+    def _protocol():
+        """决策协议 (单币种 / 批量 prompt 共用)"""
+        return f"""[HYBRID DECISION PROTOCOL] (Follow Strictly)
         
         1. **STEP 1: Read [PYTHON HINTS]**
            - This is your BASELINE. If Trend is 'DOWN' and RSI is 'NEUTRAL', your bias is SELL or STAY OUT.
@@ -70,71 +236,46 @@ class DeepSeekAgent:
            - Compare with [STRATEGY MEMORY]: If you bought recently, give the trade room to breathe unless invalidation hit.
            
         3. **STEP 3: Execute**
-           - BUY: If Trend is UP or significant Bullish Divergence found. (Max 20% of Cash).
-           - SELL: If Trend is DOWN, RSI Overbought (>70), Stop Loss hit, or Thesis Failed.
-           - HOLD: If signals are mixed or chopping.
+           - BUY: If Trend is UP or significant Bullish Divergence found. (Max {config.MAX_CASH_FRACTION:.0%} of Cash).
+           - SELL: If Trend is DOWN, RSI Overbought (>{config.RSI_OVERBOUGHT}), Stop Loss hit, or Thesis Failed.
+           - HOLD: If signals are mixed or chopping."""
 
-        [OUTPUT JSON ONLY]
-        {{
-            "action": "BUY" | "SELL" | "HOLD",
-            "amount_usd": <float>,
-            "reason": "Brief logic. E.g. 'Trend UP + RSI Divergence detected'."
-        }}
+    def _system_prompt(self):
+        """
+        固定前缀 (目标 + 决策协议)：每次调用一字不差，Ollama 常驻的模型可以直接复用这段的 KV 缓存，
+        只需要评估后面变化的部分 (行情 / 持仓 / 时间)
         """
+        return f"""
+        [OBJECTIVE]
+        Aggressive Scalper. Capitalize on trends, but protect capital strictly.
         
-        # --- 发送请求 ---
-        payload = {
+        {self._protocol()}
+        """
+
+    def _payload(self, model_name, prompt):
+        return {
             "model": model_name,
+            "system": self._system_prompt(),
             "prompt": prompt,
             "stream": False,
-            "options": {"temperature": 0.2, "num_ctx": 4096} 
+            "keep_alive": config.AI_KEEP_ALIVE,  # 模型常驻显存，前缀 KV 缓存才不会丢
+            # num_ctx 必须每次一样，变了 Ollama 会重新加载模型
+            "options": {"temperature": 0.2, "num_ctx": config.AI_NUM_CTX}
         }
 
-        try:
-            resp = requests.post(self.url, json=payload, timeout=120)
-
-            if resp.status_code == 200:
-                raw_res = resp.json()['response']
-                print(f"\n[{symbol}] AI RAW OUTPUT:\n{raw_res}\n{'-'*30}")
-                
-                # --- 解析逻辑 ---
-                thought = "无思考"
-                think_match = re.search(r'<think>(.*?)</think>', raw_res, re.DOTALL)
-                if think_match:
-                    thought = think_match.group(1).strip()
-                    clean_text = re.sub(r'<think>.*?</think>', '', raw_res, flags=re.DOTALL)
-                else:
-                    clean_text = raw_res
-
-                clean_text = re.sub(r'```json', '', clean_text, flags=re.IGNORECASE)
-                clean_text = clean_text.replace("```", "").strip()
-
-                json_match = re.search(r'\{.*\}', clean_text, re.DOTALL)
-                if json_match:
-                    try:
-                        json_str = json_match.group().replace("'", '"')
-                        data = json.loads(json_str)
-                        return (data.get('action', 'HOLD').upper(), float(data.get('amount_usd', 0.0)), data.get('reason', 'JSON'), thought)
-                    except: pass
-
-                # Fallback Regex
-                action = "HOLD"
-                amount_usd = 0.0
-                act_matches = re.findall(r'\b(BUY|SELL|HOLD)\b', clean_text.upper())
-                if act_matches: action = act_matches[-1]
-                amt_match = re.search(r'(\d[\d\.\,]*)\s*(USD|DOLLAR)', clean_text, re.IGNORECASE)
-                if not amt_match: amt_match = re.search(r'amount_usd["\']?:?\s*([\d\.\,]+)', clean_text, re.IGNORECASE)
-                if amt_match: 
-                    try: amount_usd = float(amt_match.group(1).replace(',', ''))
-                    except: pass
-                
-                if amount_usd <= 0:
-                    if action == "BUY": amount_usd = min(cash * 0.1, 100.0)
-                    elif action == "SELL" and qty > 0: amount_usd = qty * price * 0.5
+    def _generate(self, payload, on_think=None, stop_when=None, label="", priority=PRIORITY_ENTRY):
+        """Returns: (status_code, 原始回复全文)；每次调用的耗时记到 self.perf 并打印"""
+        # 流式 / 非流式都进推理队列：优先级和每个地址的并发上限对所有请求生效
+        out = self.client.generate(payload, on_think=on_think, stop_when=stop_when, priority=priority, stream=config.OLLAMA_STREAM)
+        if out['status'] == 200:
+            perf = perf_stats(out)
+            with self._perf_lock: self.perf.append(perf)
+            print(f"⏱️ [{label}] {format_perf(perf)}")
+        return out['status'], out['raw']
 
-                return action, amount_usd, "Regex Fallback", thought
-            
-            return "HOLD", 0.0, f"Status {resp.status_code}", ""
-            
-        except Exception as e:
-            return "HOLD", 0.0, f"Net Err: {str(e)}", ""
+    def drain_perf(self):
+        """取走上次调用以来的耗时记录 (GUI 每轮汇总一次)"""
+        with self._perf_lock:
+            records = list(self.perf)
+            self.perf.clear()
+        return records
@@ -0,0 +1,164 @@
+# ai_parser.py
+r"""
+🧾 AI 回复解析：DeepSeekAgent / DeepSeekAnalyst / 流式早停共用
+- <think> 用 str.find 切一刀，不再对整段思考过程跑 DOTALL 正则
+- JSON 用括号配对扫描 (跳过字符串里的括号)，取第一个满足条件的顶层 {...} / [...]，不会像贪婪 \{.*\} 那样把前后两段拼错
+- 兜底正则全部预编译，只扫回答部分
+结果统一成 Decision (namedtuple，可以照旧按 4 元组解包 / 放进缓存)
+"""
+import json
+import re
+from collections import namedtuple
+
+THINK_OPEN, THINK_CLOSE = "<think>", "</think>"
+NO_THOUGHT = "无思考"
+ACTIONS = ("BUY", "SELL", "HOLD")
+
+FENCE_RE = re.compile(r"```(?:json)?", re.IGNORECASE)
+ACTION_RE = re.compile(r"\b(BUY|SELL|HOLD)\b", re.IGNORECASE)
+AMOUNT_UNIT_RE = re.compile(r"(\d[\d\.\,]*)\s*(?:USD|DOLLAR)", re.IGNORECASE)
+AMOUNT_KEY_RE = re.compile(r"amount_usd[\"']?:?\s*([\d\.\,]+)", re.IGNORECASE)
+
+Decision = namedtuple("Decision", "action amount_usd reason thought")
+
+
+def parse_json(text):
+    """宽松解析：允许 AI 用单引号"""
+    for candidate in (text, text.replace("'", '"')):
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            pass
+    return None
+
+
+def has_action(obj):
+    """单币种决策：带 action 字段的 JSON 对象 (也是流式默认的早停条件)"""
+    return isinstance(obj, dict) and 'action' in obj
+
+
+def is_decision_list(obj):
+    """批量决策：每项都带 action 的 JSON 数组"""
+    return isinstance(obj, list) and len(obj) > 0 and all(has_action(x) for x in obj)
+
+
+class JsonScanner:
+    """
+    🧩【括号配对扫描】可以一次扫完整段文本，也可以随流式文本增长反复调用 scan()，只扫新增部分
+    单引号只在 {...} 里、出现在值 / 键该开始的位置 (紧跟 { , :) 时才当成字符串，
+    正文里的 don't、[the hint's trend] 之类的撇号不会吞掉后面的 JSON
+    """
+    def __init__(self, accept=None, pos=0):
+        self.accept = accept or (lambda obj: True)
+        self.pos = pos
+        self.stack = []   # 还没闭合的括号
+        self.start = None
+        self.quote = None
+        self.escape = False
+        self.prev = None  # 括号内上一个非空白字符
+
+    @property
+    def depth(self):
+        return len(self.stack)
+
+    def scan(self, text):
+        """从上次的位置继续扫，返回第一个解析成功且满足 accept 的 JSON，没有就返回 None"""
+        for i in range(self.pos, len(text)):
+            c = text[i]
+            if self.quote:
+                if self.escape: self.escape = False
+                elif c == '\\': self.escape = True
+                elif c == self.quote: self.quote = None
+                continue
+            if c == '"' and self.stack:
+                self.quote = c
+            elif c == "'" and self.stack and self.stack[-1] == '{' and self.prev in ('{', ',', ':'):
+                self.quote = c
+            elif c in '{[':
+                if not self.stack: self.start = i
+                self.stack.append(c)
+            elif c in '}]' and self.stack:
+                self.stack.pop()
+                if not self.stack:
+                    obj = parse_json(text[self.start:i + 1])
+                    if obj is not None and self.accept(obj):
+                        self.pos = i + 1
+                        return obj
+            if self.stack and not c.isspace(): self.prev = c
+        self.pos = len(text)
+        return None
+
+
+def find_json(text, accept=None):
+    """整段文本里找第一个满足 accept 的 JSON；正文里有没闭合的括号 ("see [1") 时跳过它从下一个字符重扫"""
+    pos = 0
+    while True:
+        scanner = JsonScanner(accept, pos)
+        obj = scanner.scan(text)
+        if obj is not None or not scanner.stack: return obj
+        pos = scanner.start + 1
+
+
+def split_think(raw):
+    """
+    Returns: (thought, answer)
+    兼容模板自带 <think> 导致回复里只有 </think> 的情况；思考没写完 (没有 </think>) 时整段当回答
+    """
+    end = raw.find(THINK_CLOSE)
+    if end < 0: return NO_THOUGHT, raw
+    start = raw.rfind(THINK_OPEN, 0, end)
+    thought = raw[start + len(THINK_OPEN) if start >= 0 else 0:end].strip()
+    answer = raw[:start] if start >= 0 else ""
+    return thought or NO_THOUGHT, answer + raw[end + len(THINK_CLOSE):]
+
+
+def strip_fences(text):
+    return FENCE_RE.sub("", text).strip()
+
+
+def _amount(value):
+    try:
+        return float(str(value).replace(',', '')) if value not in (None, "") else 0.0
+    except ValueError:
+        return None
+
+
+def parse_decision(raw):
+    """
+    单币种回复 -> Decision
+    JSON 缺失 / 损坏时退回正则：取最后一个 BUY/SELL/HOLD，金额找 "xx USD" 或 amount_usd: xx，找不到为 0 (由调用方决定默认金额)
+    """
+    thought, answer = split_think(raw)
+    answer = strip_fences(answer)
+
+    data = find_json(answer, has_action)
+    if data is not None:
+        amount_usd = _amount(data.get('amount_usd'))
+        if amount_usd is not None:
+            return Decision(str(data['action']).upper(), amount_usd, data.get('reason', 'JSON'), thought)
+
+    actions = ACTION_RE.findall(answer)
+    match = AMOUNT_UNIT_RE.search(answer) or AMOUNT_KEY_RE.search(answer)
+    amount_usd = (_amount(match.group(1)) or 0.0) if match else 0.0
+    return Decision(actions[-1].upper() if actions else "HOLD", amount_usd, "Regex Fallback", thought)
+
+
+def parse_batch(raw, symbols):
+    """
+    批量回复 -> ({symbol: (action, amount_usd, reason)} 只含格式正确的条目, thought)
+    没写 symbol 但条数对得上时按顺序对应
+    """
+    thought, answer = split_think(raw)
+    data = find_json(strip_fences(answer), lambda obj: isinstance(obj, list))
+    if data is None: return {}, thought
+
+    decisions = {}
+    for i, entry in enumerate(data):
+        if not isinstance(entry, dict): continue
+        symbol = entry.get('symbol') or (symbols[i] if len(data) == len(symbols) else None)
+        action = str(entry.get('action', '')).upper()
+        if symbol not in symbols or symbol in decisions or action not in ACTIONS: continue
+        amount_usd = _amount(entry.get('amount_usd'))
+        if amount_usd is None: continue
+        decisions[symbol] = (action, amount_usd, entry.get('reason', 'JSON'))
+    return decisions, thought
@@ -1,12 +1,13 @@
 # analyst.py
 import requests
-import json
-import re
 import config
+from ai_parser import find_json, split_think, strip_fences
+from ollama_client import OllamaClient
 
 class DeepSeekAnalyst:
     def __init__(self):
         self.model = config.MODEL_NAME
+        self.client = OllamaClient(config.OLLAMA_URL, timeout=30)
 
     def analyze(self, symbol, current_price, market_data_str):
         """调用本地 Ollama 进行分析"""
@@ -27,33 +28,39 @@ class DeepSeekAnalyst:
         """
 
         try:
+            if config.OLLAMA_STREAM:
+                # 流式：拿到完整 JSON 立即停止生成
+                out = self.client.generate({"model": self.model, "prompt": prompt, "keep_alive": config.AI_KEEP_ALIVE,
+                                            "options": {"temperature": 0.1, "num_ctx": config.AI_NUM_CTX}})
+                if out['result'] is not None: return out['result']
+                if out['status'] != 200: return {"action": "HOLD", "reason": f"API Error {out['status']}"}
+                return self._parse(out['raw'])
+
             response = requests.post(
                 config.OLLAMA_URL,
                 json={
                     "model": self.model,
                     "prompt": prompt,
                     "stream": False,
-                    "options": {"temperature": 0.1}
+                    "keep_alive": config.AI_KEEP_ALIVE,
+                    "options": {"temperature": 0.1, "num_ctx": config.AI_NUM_CTX}
                 },
                 timeout=30 # 稍微给点时间
             )
             
             if response.status_code == 200:
-                raw_text = response.json()['response']
-                
-                # 去除 DeepSeek R1 的 <think> 标签，但保留内容作为日志可能更有趣？
-                # 这里为了JSON解析稳定，我们先去掉标签，提取纯文本
-                clean_text = re.sub(r'<think>.*?</think>', '', raw_text, flags=re.DOTALL).strip()
-                
-                # 尝试提取 JSON
-                match = re.search(r'\{.*\}', clean_text, re.DOTALL)
-                if match:
-                    return json.loads(match.group())
-                else:
-                    # 如果没提取到 JSON，把原始回复的前50个字当理由返回
-                    return {"action": "HOLD", "reason": f"Format Err: {clean_text[:50]}..."}
+                return self._parse(response.json()['response'])
                 
             return {"action": "HOLD", "reason": f"API Error {response.status_code}"}
             
         except Exception as e:
-            return {"action": "HOLD", "reason": f"Connection Error: {str(e)}"}
\ No newline at end of file
+            return {"action": "HOLD", "reason": f"Connection Error: {str(e)}"}
+
+    @staticmethod
+    def _parse(raw_text):
+        # 去除 DeepSeek R1 的 <think> 部分，只在回答里找 JSON
+        clean_text = strip_fences(split_think(raw_text)[1])
+        data = find_json(clean_text, lambda obj: isinstance(obj, dict))
+        if data is not None: return data
+        # 如果没提取到 JSON，把原始回复的前50个字当理由返回
+        return {"action": "HOLD", "reason": f"Format Err: {clean_text[:50]}..."}
@@ -2,13 +2,148 @@ import alpaca_trade_api as tradeapi
 import pandas as pd
 import pandas_ta as ta
 import requests
+from requests.adapters import HTTPAdapter
+import threading
+import time
 from datetime import datetime, timedelta, timezone
 
+import config
+import strategy
+from bar_store import BarStore
+from indicators import IndicatorEngine
+from orders import OrderManager
+from rate_limit import limit_session
+
+# --- K 线周期表: 周期名 -> (Alpaca TimeFrame, 冷启动回看窗口, 缓存最多保留根数) ---
+TIMEFRAMES = {
+    "1Min":  (tradeapi.TimeFrame.Minute, timedelta(hours=12), 800),
+    "5Min":  (tradeapi.TimeFrame(5, tradeapi.TimeFrameUnit.Minute), timedelta(days=3), 800),
+    "15Min": (tradeapi.TimeFrame(15, tradeapi.TimeFrameUnit.Minute), timedelta(days=7), 800),
+    "1Hour": (tradeapi.TimeFrame.Hour, timedelta(days=30), 800),
+    "1Day":  (tradeapi.TimeFrame.Day, timedelta(days=60), 60),
+}
+
+class BarCache:
+    """
+    🗃️【K 线缓存】按 (symbol, timeframe) 保存已经拉到的 K 线
+    新数据按时间戳合并 (同一根 K 线以最新的为准)，超过 maxlen 的老 K 线直接丢掉
+    """
+    def __init__(self):
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def get(self, symbol, tf_key):
+        with self._lock:
+            df = self._frames.get((symbol, tf_key))
+            return None if df is None else df.copy()
+
+    def last_timestamp(self, symbol, tf_key):
+        with self._lock:
+            df = self._frames.get((symbol, tf_key))
+            return None if df is None or df.empty else df.index[-1]
+
+    def merge(self, symbol, tf_key, fresh, maxlen):
+        with self._lock:
+            old = self._frames.get((symbol, tf_key))
+            df = fresh if old is None else pd.concat([old, fresh])
+            df = df[~df.index.duplicated(keep='last')].sort_index()
+            self._frames[(symbol, tf_key)] = df.tail(maxlen)
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+
+class PositionBook:
+    """
+    📒【持仓快照】一次 list_positions 拿到全部持仓，按规范化代码 (去掉 "/"、大写) 索引
+    成交回报 (OrderManager) 直接记到本地，过了 TTL 再整体向服务器对账
+    """
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._positions = {}  # {key: {'symbol', 'qty', 'pl', 'avg'}}
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(symbol):
+        return symbol.replace("/", "").strip().upper()
+
+    def is_stale(self):
+        return time.time() - self._fetched_at > self.ttl
+
+    def invalidate(self):
+        self._fetched_at = 0.0
+
+    def load(self, positions):
+        book = {}
+        for pos in positions:
+            book[self.key(pos.symbol)] = {
+                'symbol': pos.symbol,
+                'qty': float(pos.qty),
+                'pl': float(pos.unrealized_pl),
+                'avg': float(pos.avg_entry_price),
+            }
+        with self._lock:
+            self._positions = book
+            self._fetched_at = time.time()
+
+    def get(self, symbol):
+        with self._lock:
+            pos = self._positions.get(self.key(symbol))
+            return (pos['qty'], pos['pl'], pos['avg']) if pos else (0, 0, 0)
+
+    def real_symbol(self, symbol):
+        """Alpaca 持仓里的真实代码 (crypto 持仓返回的是 BTCUSD 这种不带 / 的写法)"""
+        with self._lock:
+            pos = self._positions.get(self.key(symbol))
+            return pos['symbol'] if pos else symbol
+
+    def apply_fill(self, symbol, side, qty, price=None):
+        """本地记账：买入按成交价摊薄均价，卖出按比例扣减数量和浮盈"""
+        k = self.key(symbol)
+        with self._lock:
+            pos = self._positions.get(k)
+            if side == 'buy':
+                if pos is None:
+                    pos = self._positions[k] = {'symbol': symbol, 'qty': 0.0, 'pl': 0.0, 'avg': 0.0}
+                new_qty = pos['qty'] + qty
+                if price and new_qty > 0:
+                    pos['avg'] = (pos['qty'] * pos['avg'] + qty * price) / new_qty
+                pos['qty'] = new_qty
+            elif pos is not None:
+                remaining = pos['qty'] - qty
+                if remaining <= 1e-9:
+                    del self._positions[k]
+                else:
+                    pos['pl'] *= remaining / pos['qty']
+                    pos['qty'] = remaining
+
 class AlpacaBackend:
     def __init__(self):
         self.api = None
         self.connected = False
         self.headers = {}
+        self.credentials = (None, None)
+        self.bar_cache = BarCache()
+        self.bar_store = BarStore() if config.BAR_STORE_ENABLED else None  # K 线落盘 (重启后先读本地)
+        self.indicators = {}  # {symbol: IndicatorEngine} 流式指标状态
+        self.hints = {}       # {symbol: strategy.market_hints} 最近一次分析的 Python 硬结论 (AI 决策缓存指纹用)
+        self.positions = PositionBook(config.POSITION_TTL)
+        self.orders = OrderManager(self.positions)  # 订单簿 + 本地资金账本
+        self.feed = None      # market_hub.HubClient：多进程分片时行情 / K 线统一从行情中心取，不再自己请求
+        self.limiter = None   # rate_limit.TokenBucket：本账户 (分片) 的 API 请求预算
+
+        # 长连接池：行情 HTTP 请求复用 TCP+TLS 连接，不再每次 requests.get 重新握手
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+    def set_rate_limit(self, bucket):
+        """
+        🪣 本实例所有 Alpaca 请求 (行情 session + SDK 下单 / 查询) 共用一个令牌桶
+        """
+        self.limiter = bucket
+        limit_session(self.session, bucket, pool_connections=4, pool_maxsize=16)
+        if self.api: limit_session(self.api._session, bucket)
 
     def submit_qty_order(self, symbol, side, qty):
         """
@@ -19,13 +154,16 @@ class AlpacaBackend:
             qty = float(qty)
             if qty <= 0: return False, "数量必须大于0"
 
-            self.api.submit_order(
+            client_id = self.orders.new_client_id(symbol, side)
+            order = self.api.submit_order(
                 symbol=symbol, 
                 qty=qty, 
                 side=side, 
                 type='market', 
-                time_in_force='gtc'
+                time_in_force='gtc',
+                client_order_id=client_id
             )
+            self.orders.track(client_id, symbol, side, order)
             return True, f"精确{side}: {qty}"
         except Exception as e:
             return False, str(e)
@@ -33,14 +171,21 @@ class AlpacaBackend:
     def connect(self, key, secret, url):
         try:
             self.api = tradeapi.REST(key, secret, url, api_version='v2')
-            account = self.api.get_account()
+            if self.limiter: limit_session(self.api._session, self.limiter)
+            self.bar_cache.clear()
+            self.indicators = {}
+            self.positions.invalidate()
+            self.orders.api = self.api
+            self.orders.sync_account(force=True)
             self.connected = True
+            self.credentials = (key, secret)
             self.headers = {
                 "APCA-API-KEY-ID": key,
                 "APCA-API-SECRET-KEY": secret,
                 "accept": "application/json"
             }
-            return True, f"✅ 连接成功! 资金: ${float(account.cash):,.2f}"
+            self.session.headers.update(self.headers)  # 先拼好当前账户的 Key 再挂到长连接上
+            return True, f"✅ 连接成功! 资金: ${self.orders.cash:,.2f}"
         except Exception as e:
             return False, f"❌ 连接失败: {str(e)}"
 
@@ -48,24 +193,48 @@ class AlpacaBackend:
         """
         ⚡️【极速通道 - HTTP 稳健版】
         """
-        if not self.connected: return 0.0
+        return self.get_latest_prices([symbol]).get(symbol, 0.0)
+
+    def get_latest_prices(self, symbols):
+        """
+        ⚡️【极速通道 - 批量版】Crypto / 股票各一次请求拿到全部币种的最新成交价
+        Returns: {symbol: price}，拿不到价格的币种不出现在结果里
+        """
+        if not self.connected or not symbols: return {}
+        if self.feed: return self.feed.latest_prices(symbols)
+        crypto = [s for s in symbols if "/" in s]
+        stocks = [s for s in symbols if "/" not in s]
+        prices = {}
+        for group, url, params in (
+            (crypto, f"{config.DATA_URL}/v1beta3/crypto/us/latest/trades", {}),
+            (stocks, f"{config.DATA_URL}/v2/stocks/trades/latest", {"feed": config.DATA_FEED}),
+        ):
+            if not group: continue
+            try:
+                params["symbols"] = ",".join(group)
+                resp = self.session.get(url, params=params, timeout=2)
+                if resp.status_code != 200:
+                    print(f"❌ 获取价格失败 {group}: HTTP {resp.status_code}")
+                    continue
+                for sym, trade in (resp.json().get("trades") or {}).items():
+                    price = float(trade["p"])
+                    if price > 0: prices[sym] = price
+            except Exception as e:
+                print(f"❌ 获取价格异常 {group}: {e}")
+        return prices
+
+    def on_stream_bar(self, symbol, bar):
+        """
+        📡【推送回调】WebSocket 推来的 1 分钟 K 线直接并入缓存，下一轮分析就不用再拉
+        """
         try:
-            if "/" in symbol:
-                url = "https://data.alpaca.markets/v1beta3/crypto/us/latest/trades"
-                params = {"symbols": symbol}
-                resp = requests.get(url, params=params, headers=self.headers, timeout=2)
-                if resp.status_code == 200:
-                    data = resp.json()
-                    if "trades" in data and symbol in data["trades"]:
-                        price = float(data["trades"][symbol]["p"])
-                        if price > 0: return price
-            else:
-                trade = self.api.get_latest_trade(symbol)
-                return float(trade.price)
+            idx = pd.DatetimeIndex([pd.Timestamp(bar['time'])])
+            df = pd.DataFrame({k: [bar[k]] for k in ('open', 'high', 'low', 'close', 'volume')}, index=idx)
+            if self.bar_cache.last_timestamp(symbol, "1Min") is not None:
+                self.bar_cache.merge(symbol, "1Min", df, TIMEFRAMES["1Min"][2])
+                self._persist_bars(symbol, "1Min", df)
         except Exception as e:
-            print(f"❌ 获取价格异常 [{symbol}]: {e}")
-            return 0.0
-        return 0.0
+            print(f"Stream Bar Error [{symbol}]: {e}")
 
     # 🔥 修复报错的关键函数
     def get_account_info(self):
@@ -75,13 +244,84 @@ class AlpacaBackend:
         """
         if not self.connected: return 0.0, 0.0
         try:
-            account = self.api.get_account()
+            # 读本地账本 (成交回报实时增减)，过了 ACCOUNT_TTL 才向服务器对账
+            self.orders.sync_account()
             # cash 是可用现金, equity 是总净值
-            return float(account.cash), float(account.equity)
+            return self.orders.cash, self.orders.equity
         except Exception as e:
             print(f"Get Account Info Error: {e}")
             return 0.0, 0.0
 
+    # 🔥 新增功能：批量拉取 K 线 (多币种一次请求)
+    def get_bars_batch(self, symbols, timeframe, start, limit=None):
+        """
+        📦【批量通道】一次多币种请求拉取 K 线，按币种拆成独立 DataFrame
+        Crypto / 股票各走各的端点，每个时间周期最多 2 次请求 (而不是每个币种 1 次)
+        Returns: {symbol: df}，没有数据的币种不出现在结果里
+        """
+        if not self.connected or not symbols: return {}
+        crypto = [s for s in symbols if "/" in s]
+        stocks = [s for s in symbols if "/" not in s]
+        frames = {}
+        for group, fetch in ((crypto, self.api.get_crypto_bars), (stocks, self.api.get_bars)):
+            if not group: continue
+            # 注意：SDK 的 limit 是所有币种加起来的总条数，这里不传，拿到后按币种截取最新的 limit 根
+            bars = fetch(group, timeframe, start=start).df
+            if bars.empty: continue
+
+            df = bars.rename(columns={'c': 'close', 'o': 'open', 'h': 'high', 'l': 'low', 'v': 'volume'})
+            df.index = pd.to_datetime(df.index)
+            for sym, sub in df.groupby('symbol'):
+                sub = sub.drop(columns='symbol')
+                frames[sym] = sub.tail(limit) if limit else sub
+        return frames
+
+    def get_bars_cached(self, symbols, tf_key):
+        """
+        🗃️【增量通道】只请求缓存里最后一根 K 线之后的数据
+        最后一根会重新拉一次 (可能还没走完)，冷启动或断档太久的币种按回看窗口全量拉
+        内存缓存是空的 (刚启动 / 刚打开这个周期) 时先从本地 K 线仓库读回看窗口，只向 API 补缺的尾巴
+        Returns: {symbol: df}
+        """
+        if self.feed: return self.feed.get_bars(symbols, tf_key)  # 行情中心统一拉取 + 缓存，所有分片共用
+        tf, lookback, maxlen = TIMEFRAMES[tf_key]
+        now = datetime.now(timezone.utc)
+        if self.bar_store:
+            for symbol in symbols:
+                if self.bar_cache.last_timestamp(symbol, tf_key) is not None: continue
+                stored = self.bar_store.read(symbol, tf_key, now - lookback)
+                if not stored.empty: self.bar_cache.merge(symbol, tf_key, stored.tail(maxlen), maxlen)
+
+        cold, warm, warm_since = [], [], None
+        for symbol in symbols:
+            last = self.bar_cache.last_timestamp(symbol, tf_key)
+            if last is None or now - last > lookback:
+                cold.append(symbol)
+            else:
+                warm.append(symbol)
+                warm_since = last if warm_since is None else min(warm_since, last)
+
+        for group, start in ((cold, now - lookback), (warm, warm_since)):
+            if not group: continue
+            fresh = self.get_bars_batch(group, tf, start.isoformat())
+            for symbol, df in fresh.items():
+                self.bar_cache.merge(symbol, tf_key, df, maxlen)
+                self._persist_bars(symbol, tf_key, df)
+
+        frames = {}
+        for symbol in symbols:
+            df = self.bar_cache.get(symbol, tf_key)
+            if df is not None and not df.empty: frames[symbol] = df
+        return frames
+
+    def _persist_bars(self, symbol, tf_key, df):
+        """K 线落盘 (磁盘出问题只打印，不影响本轮分析)"""
+        if not self.bar_store: return
+        try:
+            self.bar_store.append(symbol, tf_key, df)
+        except OSError as e:
+            print(f"Bar Store Error [{symbol} {tf_key}]: {e}")
+
     # 🔥 新增功能：获取宏观趋势 (上帝视角)
     def get_macro_context(self, symbol):
         """
@@ -89,106 +329,98 @@ class AlpacaBackend:
         """
         if not self.connected: return "MACRO: UNKNOWN (Data Error)"
         try:
-            # 拉取最近 60 天的日线
-            now = datetime.now(timezone.utc)
-            start = (now - timedelta(days=60)).isoformat()
-            
-            if "/" in symbol:
-                bars = self.api.get_crypto_bars(symbol, tradeapi.TimeFrame.Day, start=start, limit=60).df
-            else:
-                bars = self.api.get_bars(symbol, tradeapi.TimeFrame.Day, start=start, limit=60).df
-                
-            if bars.empty: return "MACRO: UNKNOWN (No Bars)"
-            
-            df = bars.copy()
-            map_cols = {'c': 'close', 'o': 'open', 'h': 'high', 'l': 'low', 'v': 'volume'}
-            df.rename(columns=map_cols, inplace=True)
-            
-            # 计算宏观指标
-            current_close = df.iloc[-1]['close']
-            df['SMA_20'] = df['close'].rolling(20).mean()
-            sma20 = df.iloc[-1]['SMA_20']
-            
-            # 判断趋势
-            trend = "BULLISH 🟢" if current_close > sma20 else "BEARISH 🔴"
-            dist_pct = (current_close - sma20) / sma20 * 100
-            
-            return f"Daily Trend: {trend} (Price ${current_close:.2f} vs SMA20 ${sma20:.2f}, Dist: {dist_pct:.2f}%)"
-            
+            daily = self._fetch_daily_bars([symbol])
+            return self._macro_text(daily.get(symbol))
         except Exception as e:
             return f"MACRO: ERROR ({str(e)})"
 
+    def _fetch_daily_bars(self, symbols):
+        # 最近 60 天的日线 (走缓存，每轮只补当天这一根)
+        return self.get_bars_cached(symbols, "1Day")
+
+    def _macro_text(self, df):
+        if df is None or df.empty: return "MACRO: UNKNOWN (No Bars)"
+        
+        # 计算宏观指标
+        current_close = df.iloc[-1]['close']
+        sma20 = df['close'].rolling(20).mean().iloc[-1]
+        return strategy.macro_text(current_close, sma20)
+
     def get_analysis_data(self, symbol):
         """
         🔥【Hybrid 终极版 + Macro】
         既给 AI 看 K 线形态 (Arrays)，又给 AI 关键指标提示 (Hints)，还加上了宏观背景 (Macro)。
         """
-        if not self.connected: return 0, "No Connection"
+        return self.get_analysis_batch([symbol]).get(symbol, (0, "No Data"))
+
+    def get_analysis_batch(self, symbols):
+        """
+        📦【批量分析】整轮币种共用 2 次请求 (日线 + 分钟线)
+        Returns: {symbol: (current_price, report)}
+        """
+        if not self.connected: return {s: (0, "No Connection") for s in symbols}
         
+        # --- 0. 先获取宏观背景 (失败不影响分钟线分析) ---
+        macro_error = None
         try:
-            # --- 0. 先获取宏观背景 ---
-            macro_text = self.get_macro_context(symbol)
-
-            # --- 1. 获取分钟级数据 ---
-            now_utc = datetime.now(timezone.utc)
-            start_time = (now_utc - timedelta(hours=6)).isoformat()
-            if "/" in symbol:
-                bars = self.api.get_crypto_bars(symbol, tradeapi.TimeFrame.Minute, start=start_time, limit=300).df
-            else:
-                bars = self.api.get_bars(symbol, tradeapi.TimeFrame.Minute, start=start_time, limit=300).df
+            daily = self._fetch_daily_bars(symbols)
+        except Exception as e:
+            daily, macro_error = {}, f"MACRO: ERROR ({str(e)})"
 
-            if bars.empty: return 0, "No Data"
+        try:
+            # --- 1. 获取分钟级数据 (和 1Min 图表共用缓存，取最近 300 根) ---
+            minute = self.get_bars_cached(symbols, "1Min")
+        except Exception as e:
+            return {s: (0, f"Error: {str(e)}") for s in symbols}
 
-            # 2. 数据清洗
-            df = bars.copy()
-            df.rename(columns={'c': 'close', 'o': 'open', 'h': 'high', 'l': 'low', 'v': 'volume'}, inplace=True)
-            current_price = float(df.iloc[-1]['close'])
+        results = {}
+        for symbol in symbols:
+            df = minute.get(symbol)
+            if df is None or df.empty:
+                results[symbol] = (0, "No Data")
+                continue
+            try:
+                results[symbol] = self._build_report(symbol, df, macro_error or self._macro_text(daily.get(symbol)))
+            except Exception as e:
+                results[symbol] = (0, f"Error: {str(e)}")
+        return results
 
-            # 3. 计算指标
-            df.ta.ema(length=20, append=True)
-            df.ta.rsi(length=14, append=True)
-            df.ta.macd(append=True)
-            
-            # 4. 序列化数据 (让 AI 看形态)
-            tail = df.tail(12)
-            def to_seq(series):
-                return "[" + ", ".join([f"{x:.2f}" for x in series.values]) + "]"
-
-            price_seq = to_seq(tail['close'])
-            rsi_seq   = to_seq(tail['RSI_14'])
-            macd_seq  = to_seq(tail['MACD_12_26_9'])
-            vol_seq   = to_seq(tail['volume'])
-
-            # 5. Python 计算硬结论
-            last = df.iloc[-1]
-            ema20 = last['EMA_20']
-            trend_hint = "UP (Price > EMA20)" if current_price > ema20 else "DOWN (Price < EMA20)"
-            rsi_val = last['RSI_14']
-            rsi_hint = "OVERBOUGHT (>70)" if rsi_val > 70 else ("OVERSOLD (<30)" if rsi_val < 30 else "NEUTRAL")
-
-            # 6. 构建报告 (把 Macro 加进去)
-            report = f"""
-            *** GOD'S EYE VIEW (Daily Timeframe) ***
-            {macro_text}
-            
-            *** TACTICAL SNAPSHOT (1-Min Timeframe) ***
-            Current Price: {current_price:.2f}
-            
-            [PYTHON HINTS]
-            - Short-Term Trend: {trend_hint}
-            - RSI State: {rsi_hint} ({rsi_val:.1f})
-            
-            [RAW DATA SEQUENCES] (Last 12 mins)
-            - Price: {price_seq}
-            - RSI14: {rsi_seq}
-            - MACD : {macd_seq}
-            - Vol  : {vol_seq}
-            """
-            
-            return current_price, report
+    def _build_report(self, symbol, df, macro_text):
+        current_price = float(df.iloc[-1]['close'])
 
-        except Exception as e:
-            return 0, f"Error: {str(e)}"
+        # 3. 计算指标 (流式引擎只处理新增的 K 线，数据不够预热时退回 pandas_ta 全量计算)
+        ind = None
+        if config.STREAMING_INDICATORS:
+            engine = self.indicators.setdefault(symbol, IndicatorEngine(ema_len=config.EMA_LEN, rsi_len=config.RSI_LEN))
+            ind = engine.update(df)
+        if ind is None:
+            ind = self._pandas_indicators(df.tail(300).copy())
+        
+        # 4. 序列化数据 + Python 硬结论 + 宏观背景 (与回测共用 strategy.format_report)
+        tail = df.tail(12)
+        report = strategy.format_report(current_price, ind, tail['close'].values, tail['volume'].values, macro_text)
+        self.hints[symbol] = strategy.market_hints(current_price, ind)
+        
+        return current_price, report
+
+    def _pandas_indicators(self, df):
+        """pandas_ta 全量计算 (流式引擎的兜底)，返回与 IndicatorEngine 相同结构的快照"""
+        ema_col, rsi_col = f"EMA_{config.EMA_LEN}", f"RSI_{config.RSI_LEN}"
+        df.ta.ema(length=config.EMA_LEN, append=True)
+        df.ta.rsi(length=config.RSI_LEN, append=True)
+        df.ta.macd(append=True)
+        last = df.iloc[-1]
+        tail = df.tail(12)
+        return {
+            "close": float(last['close']),
+            "ema": last[ema_col],
+            "rsi": last[rsi_col],
+            "macd": last['MACD_12_26_9'],
+            "macd_signal": last['MACDs_12_26_9'],
+            "macd_hist": last['MACDh_12_26_9'],
+            "rsi_seq": tail[rsi_col].values,
+            "macd_seq": tail['MACD_12_26_9'].values,
+        }
 
     def get_chart_data(self, symbol, timeframe_str="1Min"):
         """
@@ -196,46 +428,33 @@ class AlpacaBackend:
         """
         if not self.connected: return None
         try:
-            now_utc = datetime.now(timezone.utc)
-            if timeframe_str == "5Min": 
-                tf = tradeapi.TimeFrame(5, tradeapi.TimeFrameUnit.Minute)
-                start_time = (now_utc - timedelta(days=3)).isoformat()
-            elif timeframe_str == "15Min": 
-                tf = tradeapi.TimeFrame(15, tradeapi.TimeFrameUnit.Minute)
-                start_time = (now_utc - timedelta(days=7)).isoformat()
-            else:
-                tf = tradeapi.TimeFrame.Minute
-                start_time = (now_utc - timedelta(hours=12)).isoformat()
-            
-            limit = 800 
-            
-            if "/" in symbol:
-                bars = self.api.get_crypto_bars(symbol, tf, start=start_time, limit=limit).df
-            else:
-                bars = self.api.get_bars(symbol, tf, start=start_time, limit=limit).df
-                
-            if bars.empty: return None
-            
-            df = bars.copy()
-            map_cols = {'c': 'close', 'o': 'open', 'h': 'high', 'l': 'low', 'v': 'volume'}
-            df.rename(columns=map_cols, inplace=True)
-            df.index = pd.to_datetime(df.index)
+            tf_key = timeframe_str if timeframe_str in TIMEFRAMES else "1Min"
+            df = self.get_bars_cached([symbol], tf_key).get(symbol)
+            if df is None or df.empty: return None
             
             return df
         except Exception as e:
             print(f"Chart Data Error: {e}")
             return None
 
+    def refresh_positions(self, force=False):
+        """
+        📒 一次 list_positions 刷新整本持仓 (未过 TTL 且不强制时直接用本地快照)
+        """
+        if not self.connected: return False
+        if not force and not self.positions.is_stale(): return True
+        try:
+            self.positions.load(self.api.list_positions())
+            return True
+        except Exception as e:
+            print(f"List Positions Error: {e}")
+            return False
+
     def get_position(self, symbol):
         if not self.connected: return 0, 0, 0
         try:
-            all_positions = self.api.list_positions()
-            target_clean = symbol.replace("/", "").strip().upper()
-            for pos in all_positions:
-                pos_clean = pos.symbol.replace("/", "").strip().upper()
-                if pos_clean == target_clean:
-                    return float(pos.qty), float(pos.unrealized_pl), float(pos.avg_entry_price)
-            return 0, 0, 0
+            self.refresh_positions()
+            return self.positions.get(symbol)
         except: return 0, 0, 0
 
     def place_order(self, symbol, side, qty_usd, current_price):
@@ -243,25 +462,22 @@ class AlpacaBackend:
         try:
             qty_usd = round(float(qty_usd), 2)
             if qty_usd < 1.0: return False, "金额太小"
-            self.api.submit_order(symbol=symbol, notional=qty_usd, side=side, type='market', time_in_force='gtc')
+            client_id = self.orders.new_client_id(symbol, side)
+            order = self.api.submit_order(symbol=symbol, notional=qty_usd, side=side, type='market', time_in_force='gtc', client_order_id=client_id)
+            self.orders.track(client_id, symbol, side, order)
             return True, f"已提交 {side} ${qty_usd}"
         except Exception as e: return False, str(e)
 
     def close_full_position(self, symbol):
         if not self.connected: return False, "未连接"
         try:
-            qty, _, _ = self.get_position(symbol)
+            # 清仓必须用服务器上的真实数量 (本地快照可能是估算值)，这里强制对账一次
+            self.refresh_positions(force=True)
+            qty, _, _ = self.positions.get(symbol)
             if qty <= 0: return False, "无持仓"
-            real_symbol = symbol
-            all_positions = self.api.list_positions()
-            target_clean = symbol.replace("/", "").strip().upper()
-            for pos in all_positions:
-                if pos.symbol.replace("/", "").strip().upper() == target_clean:
-                    real_symbol = pos.symbol
-                    break
-            self.api.submit_order(symbol=real_symbol, qty=qty, side='sell', type='market', time_in_force='gtc')
+            real_symbol = self.positions.real_symbol(symbol)
+            client_id = self.orders.new_client_id(symbol, 'sell')
+            order = self.api.submit_order(symbol=real_symbol, qty=qty, side='sell', type='market', time_in_force='gtc', client_order_id=client_id)
+            self.orders.track(client_id, symbol, 'sell', order)
             return True, f"已清仓卖出 {qty}"
         except Exception as e: return False, str(e)
-
-
-
@@ -0,0 +1,267 @@
+# backtest.py
+"""
+⏪ 离线回测：用本地 K 线文件重放 strategy_loop 的完整流程
+指标 (IndicatorEngine) -> 硬性风控 (冷却 / 熔断) -> 决策 (可插拔 policy，默认确定性规则代替 AI) -> 模拟成交 (滑点 + 手续费)
+
+用法:
+    python backtest.py data/BTCUSD_1min.csv --symbol BTC/USD --cash 10000 --slippage-bps 5 --fee-bps 10
+    python backtest.py bars.parquet --policy mypolicies:momentum --trades trades.csv
+
+K 线文件: CSV 或 Parquet，需要时间列 (timestamp/time/第一列) + open/high/low/close/volume (或 o/h/l/c/v)
+"""
+import argparse
+import importlib
+import time
+
+import numpy as np
+import pandas as pd
+
+import config
+import strategy
+from indicators import IndicatorEngine
+
+
+def load_bars(path):
+    """读取本地 K 线文件，统一成 UTC 时间索引 + open/high/low/close/volume 列"""
+    df = pd.read_parquet(path) if str(path).endswith((".parquet", ".pq")) else pd.read_csv(path)
+    df = df.rename(columns={'c': 'close', 'o': 'open', 'h': 'high', 'l': 'low', 'v': 'volume'})
+    if not isinstance(df.index, pd.DatetimeIndex):
+        time_col = next((c for c in ('timestamp', 'time', 'date') if c in df.columns), df.columns[0])
+        df = df.set_index(time_col)
+    df.index = pd.to_datetime(df.index, utc=True)
+    return df.sort_index()[['open', 'high', 'low', 'close', 'volume']].astype(float)
+
+
+def bar_seconds(index):
+    """K 线时间 -> int64 秒级时间戳 (和索引精度无关：pandas 读出来可能是 ns / us / s)"""
+    return np.asarray(index.tz_convert(None) if index.tz is not None else index, dtype='datetime64[s]').view('i8')
+
+
+# ==========================================
+# 🤖 决策 policy (代替 AI)
+# 调用约定: policy(ctx) -> (action, amount_usd, reason)
+# ctx: symbol, time, price, hints, ind, qty, avg, cash, equity, prev_memory, report (needs_report=True 时才生成)
+# ==========================================
+
+class RulePolicy:
+    """
+    确定性规则：按 [HYBRID DECISION PROTOCOL] 的基线 (趋势 + RSI) 做决定
+    - 空仓: 趋势向上且未超买，或 RSI 超卖 -> BUY
+    - 持仓: RSI 超买，或趋势向下且未超卖 -> 全部 SELL
+    sweep.py 里有同一套规则的向量化版本，改这里要同步改那边
+    """
+    needs_report = False
+
+    def __init__(self, buy_fraction=1.0):
+        self.buy_fraction = buy_fraction  # 想买的现金比例，实际金额再由 size_buy 封顶 (Backtester 的 max_cash_fraction)
+
+    def __call__(self, ctx):
+        hints = ctx['hints']
+        trend, rsi_state = hints['trend'], hints['rsi_state']
+        if ctx['qty'] <= 0:
+            if (trend == "UP" and rsi_state != "OVERBOUGHT") or rsi_state == "OVERSOLD":
+                return "BUY", ctx['cash'] * self.buy_fraction, f"Trend {trend} / RSI {rsi_state}"
+            return "HOLD", 0.0, "No setup"
+        if rsi_state == "OVERBOUGHT" or (trend == "DOWN" and rsi_state != "OVERSOLD"):
+            return "SELL", ctx['qty'] * ctx['price'], f"Trend {trend} / RSI {rsi_state}"
+        return "HOLD", 0.0, "Let it run"
+
+
+class AgentPolicy:
+    """接真实的 DeepSeekAgent (每根 K 线一次推理，非常慢，只适合小样本核对 AI 行为)；和实盘一样先过规则预筛"""
+    needs_report = True
+
+    def __init__(self, model_name=config.MODEL_NAME):
+        from ai_agent import DeepSeekAgent
+        from prefilter import PreFilter
+        self.agent = DeepSeekAgent()
+        self.prefilter = PreFilter()
+        self.model_name = model_name
+
+    def __call__(self, ctx):
+        rule = self.prefilter.decide(ctx['symbol'], ctx['qty'], ctx['price'], ctx['hints'])
+        if rule is not None: return rule
+        flag = self.prefilter.sell_candidate(ctx['qty'], ctx['hints'])
+        report = f"{ctx['report']}\n[PRE-FILTER] {flag}" if flag else ctx['report']
+        action, amount_usd, reason, _ = self.agent.analyze(
+            model_name=self.model_name, symbol=ctx['symbol'], price=ctx['price'],
+            market_report=report, qty=ctx['qty'], avg_price=ctx['avg'],
+            cash=ctx['cash'], equity=ctx['equity'],
+            system_state={"run_time_min": 0, "loop_count": 0}, prev_memory=ctx['prev_memory'],
+        )
+        return action, amount_usd, reason
+
+
+def load_policy(spec):
+    """'rule' / 'agent' / 'module:callable' (callable 可以是函数，也可以是无参构造的类)"""
+    if spec == "rule": return RulePolicy()
+    if spec == "agent": return AgentPolicy()
+    module, _, attr = spec.partition(":")
+    obj = getattr(importlib.import_module(module), attr)
+    return obj() if isinstance(obj, type) else obj
+
+
+# ==========================================
+# ⏪ 回测引擎
+# ==========================================
+
+class Backtester:
+    def __init__(self, symbol, policy, cash=10000.0, slippage_bps=5.0, fee_bps=10.0, step=1,
+                 cooldown=None, stop_pct=None, stop_min_value=None, max_cash_fraction=None,
+                 ema_len=None, rsi_len=None, overbought=None, oversold=None):
+        self.symbol = symbol
+        self.policy = policy
+        self.start_cash = cash
+        self.slippage = slippage_bps / 1e4
+        self.fee = fee_bps / 1e4
+        self.step = max(1, int(step))  # 每隔多少根 K 线决策一次 (实盘 60s 一轮 = 1Min 数据每根一次)
+        self.cooldown = config.COOLDOWN_SECONDS if cooldown is None else cooldown
+        self.stop_pct = config.HARD_STOP_PCT if stop_pct is None else stop_pct
+        self.stop_min_value = config.HARD_STOP_MIN_VALUE if stop_min_value is None else stop_min_value
+        self.max_cash_fraction = max_cash_fraction
+        self.ema_len = ema_len or config.EMA_LEN
+        self.rsi_len = rsi_len or config.RSI_LEN
+        self.overbought, self.oversold = overbought, oversold
+
+    def run(self, df):
+        t0 = time.perf_counter()
+        n = len(df)
+        closes = df['close'].to_numpy(dtype=float)
+        volumes = df['volume'].to_numpy(dtype=float)
+        stamps = bar_seconds(df.index)  # 秒级时间戳，冷却计时用 K 线时间而不是墙钟
+        days = df.index.floor('D').asi8
+
+        needs_report = getattr(self.policy, 'needs_report', False)
+        engine = IndicatorEngine(ema_len=self.ema_len, rsi_len=self.rsi_len)
+        cash, qty, avg, cost_basis = self.start_cash, 0.0, 0.0, 0.0
+        last_buy_ts = -1e18
+        memory = None
+        daily_closes = []
+        equity = np.empty(n)
+        in_position = np.zeros(n, dtype=bool)
+        trades, round_trips, fees = [], [], 0.0
+
+        for i in range(n):
+            price, ts = closes[i], stamps[i]
+            if needs_report and i > 0 and days[i] != days[i - 1]:
+                daily_closes.append(closes[i - 1])
+
+            if i % self.step == 0:
+                ind = engine.snapshot(price, volumes[i])
+                if ind is not None and strategy.cooldown_remaining(last_buy_ts, ts, self.cooldown) <= 0:
+                    action, amount_usd, reason = None, 0.0, ""
+                    if strategy.hard_stop_hit(qty, price, avg, self.stop_pct, self.stop_min_value) is not None:
+                        action, amount_usd, reason = "STOP_LOSS", qty * price, "Hard Stop"
+                    else:
+                        ctx = {
+                            "symbol": self.symbol, "time": df.index[i], "price": price,
+                            "ind": ind, "hints": strategy.market_hints(price, ind, self.overbought, self.oversold),
+                            "qty": qty, "avg": avg, "cash": cash, "equity": cash + qty * price,
+                            "prev_memory": memory,
+                        }
+                        if needs_report:
+                            ctx["report"] = strategy.format_report(
+                                price, ind, closes[max(0, i - 11):i + 1], volumes[max(0, i - 11):i + 1],
+                                self._macro(daily_closes, price))
+                        action, amount_usd, reason = self.policy(ctx)
+                        action = (action or "HOLD").upper()
+                        memory = {"action": action, "reason": reason, "timestamp": ts}
+
+                    # --- 模拟成交 (与 execute_decision 相同的规则) ---
+                    if action == "BUY":
+                        buy_usd = strategy.size_buy(amount_usd, cash, self.max_cash_fraction)
+                        if buy_usd > 0:
+                            fill = price * (1 + self.slippage)
+                            fee = buy_usd * self.fee
+                            got = (buy_usd - fee) / fill
+                            avg = (qty * avg + got * fill) / (qty + got)
+                            qty += got
+                            cash -= buy_usd
+                            cost_basis += buy_usd
+                            fees += fee
+                            last_buy_ts = ts
+                            trades.append((df.index[i], "BUY", fill, got, buy_usd, reason))
+                    elif action in ("SELL", "STOP_LOSS") and qty > 0 and amount_usd > 0:
+                        full = action == "STOP_LOSS" or strategy.is_full_exit(amount_usd, qty, price)
+                        sell_qty = qty if full else min(qty, amount_usd / price)
+                        fill = price * (1 - self.slippage)
+                        gross = sell_qty * fill
+                        fee = gross * self.fee
+                        basis = cost_basis * sell_qty / qty
+                        cash += gross - fee
+                        fees += fee
+                        round_trips.append(gross - fee - basis)
+                        cost_basis -= basis
+                        qty -= sell_qty
+                        if full or qty <= 1e-12: qty, avg, cost_basis = 0.0, 0.0, 0.0
+                        if action == "STOP_LOSS": last_buy_ts = ts  # 熔断后同样进入冷却，防止立刻买回
+                        trades.append((df.index[i], action, fill, sell_qty, gross, reason))
+
+            engine.push(price, volumes[i])
+            equity[i] = cash + qty * price
+            in_position[i] = qty > 0
+
+        elapsed = time.perf_counter() - t0
+        return self._report(df, equity, in_position, trades, round_trips, fees, elapsed)
+
+    @staticmethod
+    def _macro(daily_closes, price):
+        if len(daily_closes) < 19: return "MACRO: UNKNOWN (No Bars)"
+        sma20 = (sum(daily_closes[-19:]) + price) / 20
+        return strategy.macro_text(price, sma20)
+
+    def _report(self, df, equity, in_position, trades, round_trips, fees, elapsed):
+        peak = np.maximum.accumulate(equity) if len(equity) else equity
+        drawdown = (equity - peak) / peak if len(equity) else equity
+        wins = [p for p in round_trips if p > 0]
+        final = float(equity[-1]) if len(equity) else self.start_cash
+        return {
+            "symbol": self.symbol,
+            "start": df.index[0] if len(df) else None,
+            "end": df.index[-1] if len(df) else None,
+            "bars": len(df),
+            "start_cash": self.start_cash,
+            "final_equity": final,
+            "pnl": final - self.start_cash,
+            "return_pct": (final / self.start_cash - 1) * 100,
+            "max_drawdown_pct": float(drawdown.min()) * 100 if len(drawdown) else 0.0,
+            "trades": len(trades),
+            "round_trips": len(round_trips),
+            "win_rate_pct": len(wins) / len(round_trips) * 100 if round_trips else 0.0,
+            "avg_trade_pnl": float(np.mean(round_trips)) if round_trips else 0.0,
+            "fees": fees,
+            "exposure_pct": float(in_position.mean()) * 100 if len(in_position) else 0.0,
+            "bars_per_sec": len(df) / elapsed if elapsed > 0 else float('inf'),
+            "trade_log": pd.DataFrame(trades, columns=["time", "action", "price", "qty", "notional", "reason"]),
+        }
+
+
+def print_report(res):
+    print(f"\n⏪ 回测结果 [{res['symbol']}] {res['start']} -> {res['end']}")
+    print(f"- Bars        : {res['bars']:,} ({res['bars_per_sec']:,.0f} bars/s)")
+    print(f"- Equity      : ${res['start_cash']:,.2f} -> ${res['final_equity']:,.2f}")
+    print(f"- PnL         : ${res['pnl']:+,.2f} ({res['return_pct']:+.2f}%)")
+    print(f"- Max DD      : {res['max_drawdown_pct']:.2f}%")
+    print(f"- Trades      : {res['trades']} | Round trips: {res['round_trips']} | Win rate: {res['win_rate_pct']:.1f}%")
+    print(f"- Avg trade   : ${res['avg_trade_pnl']:+,.2f} | Fees: ${res['fees']:,.2f} | Exposure: {res['exposure_pct']:.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay the DeepStock strategy over stored OHLCV bars")
+    parser.add_argument("path", help="K 线文件 (CSV / Parquet)")
+    parser.add_argument("--symbol", default="BTC/USD")
+    parser.add_argument("--policy", default="rule", help="rule | agent | module:callable")
+    parser.add_argument("--cash", type=float, default=10000.0)
+    parser.add_argument("--slippage-bps", type=float, default=5.0)
+    parser.add_argument("--fee-bps", type=float, default=10.0)
+    parser.add_argument("--step", type=int, default=1, help="每隔多少根 K 线决策一次")
+    parser.add_argument("--trades", default=None, help="把成交明细写到这个 CSV")
+    args = parser.parse_args()
+
+    bt = Backtester(args.symbol, load_policy(args.policy), cash=args.cash,
+                    slippage_bps=args.slippage_bps, fee_bps=args.fee_bps, step=args.step)
+    result = bt.run(load_bars(args.path))
+    print_report(result)
+    if args.trades:
+        result["trade_log"].to_csv(args.trades, index=False)
+        print(f"📄 成交明细已保存: {args.trades}")
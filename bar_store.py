@@ -0,0 +1,134 @@
+# bar_store.py
+"""
+💾 本地 K 线仓库：拉到的 K 线落盘，重启 / 开图表 / 回测不用再从 Alpaca 全量下载
+目录: BAR_STORE_DIR/<币种>/<周期>/<YYYY-MM-DD>.bin (按 UTC 日期分区)
+- 每个文件是定长记录 (ts 纳秒 + OHLCV) 直接追加写，读取用 np.memmap，不需要解析
+- 只追加：没走完的最后一根 K 线再拉到时，数据没变就跳过，变了就原地改写文件末尾那一条 (文件不会越写越大)
+- 写了一半的尾巴 (进程被杀) 在下次写入前先截掉，后面的记录才能对齐；读取时同一时间戳以最后写入的为准
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import config
+
+BAR_DTYPE = np.dtype([('ts', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'), ('volume', '<f8')])
+COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+DAY_NS = 86_400 * 10**9
+
+
+def _utc(t):
+    """字符串 / datetime -> UTC 的 pd.Timestamp (不带时区的按 UTC 处理)"""
+    if t is None: return None
+    t = pd.Timestamp(t)
+    return t.tz_convert('UTC') if t.tz is not None else t.tz_localize('UTC')
+
+
+class BarStore:
+    def __init__(self, root=None):
+        self.root = root or config.BAR_STORE_DIR
+        self._last = {}  # {(symbol, tf_key): 已落盘的最后一个时间戳 (ns)}
+        self._lock = threading.Lock()
+
+    def _dir(self, symbol, tf_key):
+        return os.path.join(self.root, symbol.replace("/", "-"), tf_key)
+
+    def _days(self, symbol, tf_key):
+        """已有的日期分区 (排好序的文件名，不带后缀)"""
+        try:
+            return sorted(f[:-4] for f in os.listdir(self._dir(symbol, tf_key)) if f.endswith(".bin"))
+        except FileNotFoundError:
+            return []
+
+    def _load_day(self, symbol, tf_key, day):
+        path = os.path.join(self._dir(symbol, tf_key), day + ".bin")
+        size = os.path.getsize(path) // BAR_DTYPE.itemsize
+        if size == 0: return np.empty(0, BAR_DTYPE)
+        return np.memmap(path, dtype=BAR_DTYPE, mode='r', shape=(size,))  # 写了一半的尾巴按整条截掉
+
+    def last_timestamp(self, symbol, tf_key):
+        """Returns: 已落盘的最后一根 K 线时间 (pd.Timestamp UTC)，没有返回 None"""
+        with self._lock:
+            last = self._last_ns(symbol, tf_key)
+        return None if last is None else pd.Timestamp(last, tz='UTC')
+
+    def _last_ns(self, symbol, tf_key):
+        key = (symbol, tf_key)
+        if key not in self._last:
+            days = self._days(symbol, tf_key)
+            recs = self._load_day(symbol, tf_key, days[-1]) if days else []
+            self._last[key] = int(recs['ts'].max()) if len(recs) else None
+        return self._last[key]
+
+    def append(self, symbol, tf_key, df):
+        """
+        追加写入 (df: index 为时间戳，含 OHLCV 列)
+        比已落盘最后一根更早的 K 线直接跳过，同一根 (未走完的最后一根) 只在数据变了时原地改写
+        Returns: 实际写入 (追加 + 改写) 的条数
+        """
+        if df is None or df.empty: return 0
+        ts = pd.DatetimeIndex(df.index)
+        if ts.tz is not None: ts = ts.tz_convert('UTC').tz_localize(None)
+        ts = np.asarray(ts, dtype='datetime64[ns]').view('i8')
+        with self._lock:
+            last = self._last_ns(symbol, tf_key)
+            keep = ts >= last if last is not None else np.ones(len(ts), bool)
+            if not keep.any(): return 0
+            recs = np.empty(int(keep.sum()), BAR_DTYPE)
+            recs['ts'] = ts[keep]
+            for col in COLUMNS:
+                recs[col] = df[col].to_numpy(dtype='f8')[keep]
+            recs = recs[np.argsort(recs['ts'], kind='stable')]
+
+            folder = self._dir(symbol, tf_key)
+            os.makedirs(folder, exist_ok=True)
+            days = recs['ts'] // DAY_NS
+            written = 0
+            for day in np.unique(days):
+                name = pd.Timestamp(int(day) * DAY_NS, tz='UTC').strftime("%Y-%m-%d")
+                written += self._write_day(os.path.join(folder, name + ".bin"), recs[days == day])
+            self._last[(symbol, tf_key)] = int(recs['ts'][-1])
+            return written
+
+    @staticmethod
+    def _write_day(path, recs):
+        """把按时间排好序的记录写进一个日期分区 (recs 里最早的一根最多和文件最后一条同一时间)"""
+        size = BAR_DTYPE.itemsize
+        with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+            end = f.seek(0, os.SEEK_END) // size * size
+            f.truncate(end)  # 写了一半的尾巴截掉，否则之后追加的记录全部错位
+            f.seek(end)
+            if end:
+                f.seek(end - size)
+                tail = f.read(size)
+                if np.frombuffer(tail, BAR_DTYPE)['ts'][0] == recs['ts'][0]:
+                    if tail == recs[:1].tobytes():
+                        recs = recs[1:]        # 没走完的那根没变化，不重复写
+                    else:
+                        f.seek(end - size)     # 变了就原地覆盖最后一条
+            f.write(recs.tobytes())
+            return len(recs)
+
+    def read(self, symbol, tf_key, start=None, end=None):
+        """
+        读 [start, end] 范围内的 K 线 (只打开涉及到的日期分区)
+        Returns: DataFrame (UTC 时间索引 + OHLCV)，没有数据返回空 DataFrame
+        """
+        lo, hi = _utc(start), _utc(end)
+        lo_day = lo.strftime("%Y-%m-%d") if lo is not None else ""
+        hi_day = hi.strftime("%Y-%m-%d") if hi is not None else "9999"
+        with self._lock:
+            chunks = [np.array(self._load_day(symbol, tf_key, d)) for d in self._days(symbol, tf_key) if lo_day <= d <= hi_day]
+        recs = np.concatenate(chunks) if chunks else np.empty(0, BAR_DTYPE)
+        if len(recs):
+            # 同一时间戳保留最后写入的那条，再按时间排序
+            _, idx = np.unique(recs['ts'][::-1], return_index=True)
+            recs = recs[len(recs) - 1 - idx]
+            ts = recs['ts']
+            first = np.searchsorted(ts, lo.value) if lo is not None else 0
+            last = np.searchsorted(ts, hi.value, side='right') if hi is not None else len(ts)
+            recs = recs[first:last]
+        index = pd.DatetimeIndex(pd.to_datetime(recs['ts'], utc=True), name='timestamp')
+        return pd.DataFrame({col: recs[col] for col in COLUMNS}, index=index)
@@ -0,0 +1,117 @@
+# chart_feed.py
+"""
+🛰️ 图表数据生产者：后台线程拉 K 线 / 现价 / 持仓 / 成交标记，整理成可以直接画的 payload 放进队列
+Tk 主线程只从队列里取最新一份交给 ChartView 渲染，网络请求不再卡住界面
+- request(): 双击币种 / 切换周期时立刻准备一份
+- 图表页可见 (set_active) 时每 CHART_REFRESH_SECONDS 秒自动刷新一次
+"""
+import datetime
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import config
+from trade_journal import nearest_bar
+
+
+class ChartFeed:
+    def __init__(self, backend, journal, interval=None):
+        self.backend = backend
+        self.journal = journal
+        self.interval = interval or config.CHART_REFRESH_SECONDS
+        self.queue = queue.Queue()
+        self.target = None    # (symbol, timeframe) 当前要画的图
+        self.active = False   # 图表页可见时才定时刷新
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def request(self, symbol, timeframe):
+        """切换 / 立即刷新图表 (任意线程)"""
+        self.target = (symbol, timeframe)
+        self._start()
+        self._wake.set()
+
+    def set_active(self, active):
+        self.active = active
+        if active and self.target: self._wake.set()
+
+    def latest(self):
+        """【主线程】取走队列里最新的一份 payload (过期的、不是当前图表的直接丢掉)，没有返回 None"""
+        payload = None
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return payload
+            if (item['symbol'], item['timeframe']) == self.target: payload = item
+
+    def _start(self):
+        with self._lock:
+            if self._started: return
+            self._started = True
+        threading.Thread(target=self._run, daemon=True, name="chart-feed").start()
+
+    def _run(self):
+        while True:
+            forced = self._wake.wait(self.interval)
+            self._wake.clear()
+            target = self.target
+            if target is None or not (forced or self.active): continue
+            t0 = time.time()
+            try:
+                payload = self.prepare(*target)
+            except Exception as e:
+                print(f"Chart Feed Error: {e}")
+                continue
+            payload['fetch_s'] = time.time() - t0
+            self.queue.put(payload)
+
+    def prepare(self, symbol, timeframe):
+        """
+        【工作线程】所有网络请求和数据整理都在这里做完
+        Returns: {'symbol', 'timeframe', 'df' (无时区本地时间索引，没有数据为 None), 'markers', 'hlines'}
+        """
+        payload = {'symbol': symbol, 'timeframe': timeframe, 'df': None, 'markers': [], 'hlines': []}
+        df = self.backend.get_chart_data(symbol, timeframe)
+        live_price = self.backend.get_latest_price_fast(symbol)
+        if df is None or df.empty: return payload
+
+        # ==========================================
+        # 🔥 核心逻辑：统一时间轴为【无时区的本地时间】
+        # ==========================================
+        # 1. 先确保 df 是 UTC
+        if df.index.tz is None:
+            df.index = df.index.tz_localize('UTC')
+        else:
+            df.index = df.index.tz_convert('UTC')
+
+        # 2. 转为本地时间并剥离时区 (Naive Local)
+        my_timezone = datetime.datetime.now().astimezone().tzinfo
+        bar_ts = np.asarray(df.index.tz_convert(None), dtype='datetime64[ns]').view('i8')
+        window = (df.index[0], df.index[-1] + pd.Timedelta(minutes=5))
+        df.index = df.index.tz_convert(my_timezone).tz_localize(None)
+
+        # 3. 只取当前 K 线窗口内的交易记录 (允许5分钟误差；成交时间已缓存成 int64，不用每次解析)
+        trade_ts, trade_actions = self.journal.markers(symbol, *window)
+
+        # --- (A) 辅助线 (Hold均价 & 现价) ---
+        qty, pl, avg = self.backend.get_position(symbol)
+        hlines = []
+        if qty > 0: hlines.append((avg, 'cyan'))                 # 持仓均价线颜色
+        if live_price > 0: hlines.append((live_price, 'white'))  # 现价线颜色
+
+        # --- (B) 标注数据 ---
+        # 🔥 一次 searchsorted 找到每笔成交最近的 K 线索引 (整数坐标，X 轴本质上是 0, 1, 2...)
+        # BUY 标在最低价，SELL 标在最高价
+        idx = nearest_bar(bar_ts, trade_ts)
+        is_buy = trade_actions == 'BUY'
+        keep = is_buy | (trade_actions == 'SELL')
+        ys = np.where(is_buy, df['low'].to_numpy()[idx], df['high'].to_numpy()[idx])
+        markers = [{'x': int(x), 'y': y, 'type': a} for x, y, a in zip(idx[keep], ys[keep], trade_actions[keep])]
+
+        payload.update(df=df, markers=markers, hlines=hlines)
+        return payload
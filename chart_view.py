@@ -0,0 +1,264 @@
+# chart_view.py
+"""
+📈 常驻 K 线视图：整个程序只有一个 Figure + 一个 FigureCanvasTkAgg
+- 同一币种 / 周期的定时刷新只改已有 artist 的数据 (蜡烛 / 成交量 / 均线 / 均价线 & 现价线 / 买卖标记)，不再销毁重建
+- 切换币种或周期才清空坐标轴重新建 artist (还是同一个 Figure，不会泄漏)
+- 鼠标悬停的 HUD 走 blit：恢复背景 + 只画 HUD 这一个 artist，不触发整图重绘
+X 轴和 mplfinance 一样是 0, 1, 2... 的整数序列，刻度再映射回时间
+"""
+import tkinter as tk
+
+import numpy as np
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter, MaxNLocator
+
+# 配色沿用之前 mplfinance 的 nightclouds 深色风格
+UP, DOWN = '#2ebd85', '#f6465d'
+FACE, GRID, TEXT = '#0b0b0b', '#999999', 'white'
+MAV = ((5, '#40e0d0'), (20, '#ff00ff'))
+BODY_WIDTH = 0.3  # 蜡烛实体半宽 (K 线间距为 1)
+
+
+class ChartView:
+    def __init__(self, master):
+        self.fig = Figure(figsize=(12, 8), facecolor=FACE)
+        grid = self.fig.add_gridspec(2, 1, height_ratios=(3, 1), hspace=0.05, left=0.06, right=0.98, top=0.97, bottom=0.06)
+        self.ax_main = self.fig.add_subplot(grid[0])
+        self.ax_vol = self.fig.add_subplot(grid[1], sharex=self.ax_main)
+        self.canvas = FigureCanvasTkAgg(self.fig, master=master)
+        self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+
+        self.key = None        # (symbol, timeframe)，变了才重建
+        self.df = None         # 当前显示的数据 (无时区本地时间索引)
+        self.markers = ()      # 当前显示的买卖标记
+        self.notes = []        # 买卖标记的 annotate artist
+        self._background = None
+        self.is_dragging = False
+        self.last_mouse_x = None
+
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        self.canvas.mpl_connect('scroll_event', self.on_scroll)
+        self.canvas.mpl_connect('button_press_event', self.on_press)
+        self.canvas.mpl_connect('button_release_event', self.on_release)
+        self.canvas.mpl_connect('motion_notify_event', self.on_drag_and_hover)
+
+    # ================= 数据更新 =================
+
+    def update(self, symbol, timeframe, df, markers=(), hlines=()):
+        """
+        df: OHLCV，索引为无时区本地时间
+        markers: [{'x', 'y', 'type': 'BUY'/'SELL'}]
+        hlines: [(价格, 颜色)] 持仓均价线 / 现价线
+        """
+        old = self.df
+        if (symbol, timeframe) != self.key:
+            self._build(symbol, timeframe)
+            old = None
+
+        # 视图记忆：在看最新数据 (右边缘差值小于10根K线) 就跟着新 K 线滚动，否则保持当前视角
+        x_min, x_max = self.ax_main.get_xlim()
+        was_at_edge = old is not None and len(old) - x_max < 10
+
+        self.df = df
+        self._set_candles(df)
+        self._set_hlines(hlines)
+        if tuple(markers) != self.markers: self._set_markers(markers)
+
+        if old is None:
+            self.ax_main.set_xlim(-1, len(df))
+        elif was_at_edge:
+            self.ax_main.set_xlim(len(df) - (x_max - x_min), len(df))
+        self._fit_y()
+        self.hud.set_text(self._hud_text(len(df) - 1, '%Y-%m-%d %H:%M'))
+        self.canvas.draw_idle()
+
+    def _build(self, symbol, timeframe):
+        """切换币种 / 周期：清空坐标轴，重新创建全部 artist"""
+        self.key = (symbol, timeframe)
+        self.df = None
+        self.markers = ()
+        self.notes = []
+        for ax in (self.ax_main, self.ax_vol):
+            ax.clear()
+            ax.set_facecolor(FACE)
+            ax.grid(True, color=GRID, linestyle='--', linewidth=0.5, alpha=0.5)
+            ax.tick_params(colors=TEXT, labelsize=8)
+            for spine in ax.spines.values(): spine.set_color(GRID)
+        self.ax_main.set_ylabel('Price ($)', color=TEXT)
+        self.ax_main.tick_params(labelbottom=False)
+        self.ax_vol.xaxis.set_major_locator(MaxNLocator(8, integer=True))
+        self.ax_vol.xaxis.set_major_formatter(FuncFormatter(self._format_x))
+
+        self.wicks = LineCollection([], linewidths=1.0)
+        self.bodies = PolyCollection([], linewidths=0.5)
+        self.volume = PolyCollection([], linewidths=0)
+        self.ax_main.add_collection(self.wicks)
+        self.ax_main.add_collection(self.bodies)
+        self.ax_vol.add_collection(self.volume)
+        self.mav_lines = [(n, self.ax_main.plot([], [], color=color, linewidth=1.0)[0]) for n, color in MAV]
+        self.price_lines = []
+        self.hud = self.ax_main.text(
+            0.02, 0.96, "", transform=self.ax_main.transAxes, fontsize=10, color=TEXT, verticalalignment='top',
+            bbox=dict(boxstyle='round', facecolor='black', alpha=0.7), animated=True  # 只通过 blit 绘制
+        )
+
+    def _set_candles(self, df):
+        o, h, l, c, v = (df[col].to_numpy(dtype=float) for col in ('open', 'high', 'low', 'close', 'volume'))
+        x = np.arange(len(df), dtype=float)
+        colors = np.where(c >= o, UP, DOWN)
+        left, right = x - BODY_WIDTH, x + BODY_WIDTH
+
+        self.wicks.set_segments(np.stack([np.column_stack([x, l]), np.column_stack([x, h])], axis=1))
+        self.wicks.set_color(colors)
+        self.bodies.set_verts(np.stack([np.column_stack(p) for p in ((left, o), (left, c), (right, c), (right, o))], axis=1))
+        self.bodies.set_facecolor(colors)
+        self.bodies.set_edgecolor(colors)
+        zero = np.zeros_like(v)
+        self.volume.set_verts(np.stack([np.column_stack(p) for p in ((left, zero), (left, v), (right, v), (right, zero))], axis=1))
+        self.volume.set_facecolor(colors)
+
+        closes = df['close']
+        for n, line in self.mav_lines:
+            line.set_data(x, closes.rolling(n).mean().to_numpy())
+
+    def _set_hlines(self, hlines):
+        # 数量变了才增删 Line2D，否则只改 y 值
+        while len(self.price_lines) > len(hlines): self.price_lines.pop().remove()
+        while len(self.price_lines) < len(hlines):
+            self.price_lines.append(self.ax_main.axhline(0, linestyle='--', linewidth=1.0))
+        for line, (price, color) in zip(self.price_lines, hlines):
+            line.set_ydata([price, price])
+            line.set_color(color)
+
+    def _set_markers(self, markers):
+        """🔥 "棍子+圆圈+文字" 标注：B 在 K 线低点下方，S 在高点上方 (标记有变化才重画)"""
+        for note in self.notes: note.remove()
+        self.notes = []
+        for m in markers:
+            buy = m['type'] == 'BUY'
+            color = '#00b300' if buy else '#ff3333'
+            self.notes.append(self.ax_main.annotate(
+                'B' if buy else 'S',
+                xy=(m['x'], m['y']),
+                xytext=(0, -25 if buy else 25),
+                textcoords='offset points',
+                color='white',
+                fontweight='bold',
+                ha='center', va='center',
+                bbox=dict(boxstyle='circle', fc=color, ec='none', alpha=0.9),
+                arrowprops=dict(arrowstyle='-', color=color, lw=1.5)
+            ))
+        self.markers = tuple(markers)
+
+    def _fit_y(self):
+        """Y 轴只按可见范围内的 K 线 (和价格线) 缩放"""
+        if self.df is None or self.df.empty: return
+        x_min, x_max = self.ax_main.get_xlim()
+        lo, hi = max(0, int(np.floor(x_min))), min(len(self.df), int(np.ceil(x_max)) + 1)
+        if lo >= hi: return
+        view = self.df.iloc[lo:hi]
+        prices = [line.get_ydata()[0] for line in self.price_lines]
+        low, high = min([view['low'].min()] + prices), max([view['high'].max()] + prices)
+        pad = (high - low) * 0.05 or high * 0.001 or 1.0
+        self.ax_main.set_ylim(low - pad, high + pad)
+        self.ax_vol.set_ylim(0, float(view['volume'].max()) * 1.1 or 1.0)
+
+    def _format_x(self, x, pos=None):
+        i = int(round(x))
+        if self.df is None or not 0 <= i < len(self.df): return ""
+        return self.df.index[i].strftime('%m-%d %H:%M')
+
+    def _hud_text(self, i, time_format):
+        bar = self.df.iloc[i]
+        return (f"{self.key[0]} [{self.key[1]}] {bar.name.strftime(time_format)}\n"
+                f"O: {bar['open']:.2f}  H: {bar['high']:.2f}\n"
+                f"L: {bar['low']:.2f}  C: {bar['close']:.2f}\n"
+                f"Vol: {float(bar['volume']):.4f}")
+
+    # ================= 交互事件 =================
+
+    def on_draw(self, event):
+        """整图重绘后保存背景 (不含 HUD)，再把 HUD 画上去"""
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        if self.df is not None: self.fig.draw_artist(self.hud)
+
+    def _blit_hud(self):
+        if self._background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._background)
+        self.fig.draw_artist(self.hud)
+        self.canvas.blit(self.fig.bbox)
+
+    def _set_xlim(self, new_min, new_max):
+        self.ax_main.set_xlim(new_min, new_max)
+        self._fit_y()
+        self.canvas.draw_idle()
+
+    def on_scroll(self, event):
+        """鼠标滚轮缩放"""
+        if self.df is None or event.inaxes != self.ax_main: return
+        x_min, x_max = self.ax_main.get_xlim()
+        scale_factor = 0.8 if event.button == 'up' else 1.2
+        range_width = x_max - x_min
+
+        # 居中缩放计算
+        mouse_rel = (event.xdata - x_min) / range_width
+        new_range = range_width * scale_factor
+
+        # 限制缩放极限
+        if new_range < 10: new_range = 10
+        if new_range > len(self.df): new_range = len(self.df)
+
+        new_min = event.xdata - mouse_rel * new_range
+        new_max = new_min + new_range
+
+        # 边界检查
+        if new_max > len(self.df):
+            new_max = len(self.df)
+            new_min = new_max - new_range
+        if new_min < 0:
+            new_min = 0
+            new_max = new_range
+
+        self._set_xlim(new_min, new_max)
+
+    def on_press(self, event):
+        if event.inaxes == self.ax_main and event.button == 1:
+            self.is_dragging = True
+            self.last_mouse_x = event.xdata
+
+    def on_release(self, event):
+        self.is_dragging = False
+        self.last_mouse_x = None
+
+    def on_drag_and_hover(self, event):
+        if self.df is None or event.inaxes != self.ax_main: return
+
+        # 1. 拖拽平移
+        if self.is_dragging and self.last_mouse_x is not None and event.xdata is not None:
+            dx = event.xdata - self.last_mouse_x
+            x_min, x_max = self.ax_main.get_xlim()
+            new_min, new_max = x_min - dx, x_max - dx
+
+            # 边界检查
+            if new_max > len(self.df):
+                diff = new_max - len(self.df)
+                new_max -= diff
+                new_min -= diff
+            if new_min < 0:
+                diff = 0 - new_min
+                new_min += diff
+                new_max += diff
+
+            self._set_xlim(new_min, new_max)
+            return
+
+        # 2. 悬停 HUD 信息 (blit)
+        if event.xdata is None: return
+        x_idx = int(round(event.xdata))
+        if 0 <= x_idx < len(self.df):
+            self.hud.set_text(self._hud_text(x_idx, '%H:%M'))
+            self._blit_hud()
@@ -10,11 +10,129 @@ DEFAULT_QTY_USD = 100
 # 让 AI 每 1 分钟看一次盘，而不是每 10 秒看一次，防止它这一秒买下一秒卖
 DEFAULT_INTERVAL = 60
 
+# --- 策略并发 ---
+# 同时进行 数据获取 + AI 推理 的币种数量上限 (本地 Ollama 显存有限，别开太大)
+STRATEGY_MAX_WORKERS = 4
+# 每轮决策的截止时间 (秒)，超时未完成的币种本轮放弃，不拖慢下一轮
+STRATEGY_ROUND_DEADLINE = 50
+# 每次 AI 推理打包几个币种 (共用一份协议 / 账户信息，返回 JSON 数组)；1 = 每个币种单独一个 prompt
+AI_BATCH_SIZE = 5
+
+# --- 硬性风控 & 下单规则 (strategy.py，实盘与回测共用) ---
+COOLDOWN_SECONDS = 300       # 买入后冷却时间，期间不问 AI
+HARD_STOP_PCT = -0.05        # 单币种亏损超过 5% 强制清仓
+HARD_STOP_MIN_VALUE = 50     # 持仓价值大于 $50 才触发熔断，防止碎股误触
+MIN_ORDER_USD = 10.0         # 买入金额低于这个数不下单
+FULL_EXIT_RATIO = 0.98       # 卖出金额 >= 持仓价值 98% 视为清仓
+MAX_CASH_FRACTION = 0.2      # 提示词里告诉 AI 单笔买入最多用可用现金的 20% (下单时不强制)
+
+# --- 信号参数 (Python 硬结论；sweep.py 可以扫描这些值) ---
+EMA_LEN = 20
+RSI_LEN = 14
+RSI_OVERBOUGHT = 70
+RSI_OVERSOLD = 30
+
+# --- 规则预筛 (prefilter.py)：一眼能判断的情况不问 AI ---
+PREFILTER_ENABLED = True
+PREFILTER_RULES = {
+    "flat_downtrend_hold": True,    # 空仓 + 趋势向下 (且未超卖) -> HOLD
+    "flat_overbought_hold": True,   # 空仓 + RSI 超买 -> HOLD，不追高
+    "held_extreme_rsi_sell": 80,    # 持仓 + RSI 高于这个值 -> 标成 SELL 候选，优先交给 AI 判断 (None 关闭)
+    "held_extreme_rsi_sell_fraction": None,  # 设成 0~1 时不问 AI，直接卖出这个比例的持仓 (默认关闭)
+}
+
+# --- 指标计算 ---
+# True: 流式增量指标 (indicators.py)，每轮只处理新 K 线；False: 每轮 pandas_ta 全量重算
+STREAMING_INDICATORS = True
+
+# --- 本地 K 线仓库 (bar_store.py) ---
+# 拉到的 K 线按 币种/周期/日期 落盘，重启后先读本地，只向 Alpaca 补缺的尾巴
+BAR_STORE_ENABLED = True
+BAR_STORE_DIR = "data/bars"
+
+# --- 成交日志 (trade_journal.py) ---
+# SQLite (WAL) 只追加；第一次启动自动导入旧的 trade_history.json
+TRADE_JOURNAL_FILE = "trade_journal.db"
+
+# --- 图表 & 界面 ---
+# 图表页可见时，后台线程每隔多少秒准备一次新的绘图数据 (chart_feed.py)
+CHART_REFRESH_SECONDS = 5
+# 主线程心跳间隔 (毫秒，100 = 每秒 10 帧)：表格 / 日志批量刷新 + 取图表数据 + 测量 Tk 事件循环延迟
+UI_TICK_MS = 100
+# 日志栏最多保留多少行，超出删掉最早的 (长时间运行不会越来越卡)
+LOG_MAX_LINES = 2000
+
+# --- 无界面引擎 (engine.py) ---
+# 引擎的本地 HTTP 接口，GUI 用 python main.py --attach http://127.0.0.1:8770 以瘦客户端方式连上 (8765 已被 fake_stream 占用)
+ENGINE_HOST = "127.0.0.1"
+ENGINE_PORT = 8770
+# 接口能下发 API Key / 启停交易，每个请求都要在这个请求头里带上 settings.json 的 engine_token
+ENGINE_TOKEN_HEADER = "X-Engine-Token"
+# stop() 后马上 start()：最多等上一次的行情 / 策略线程退出这么多秒，还没退出就拒绝启动
+ENGINE_JOIN_SECONDS = 5
+# 引擎保留最近多少条日志事件，客户端按序号增量拉取
+ENGINE_EVENT_BUFFER = 5000
+# 瘦客户端轮询引擎状态 / 日志的间隔 (秒)
+ENGINE_POLL_SECONDS = 1.0
+
+# --- 多账户 / 多进程分片 (shards.py + market_hub.py) ---
+# 行情中心地址 (multiprocessing.connection，authkey 每次启动随机生成)
+MARKET_HUB_HOST = "127.0.0.1"
+MARKET_HUB_PORT = 8790
+# 行情中心向各分片推送最新价的间隔 (秒)
+HUB_PUBLISH_SECONDS = 1.0
+# 同一币种 / 周期的 K 线多少秒内重复请求直接读行情中心缓存：同一轮 N 个分片只向 Alpaca 拉一次
+HUB_BARS_TTL = 10
+# Alpaca 每个账户每分钟的 API 请求上限 (同一账户下的多个进程平分，shards.json 里可以按账户覆盖)
+ALPACA_RATE_LIMIT_PER_MIN = 200
+
+# --- 本地账本 (orders.py) ---
+# 持仓快照有效期 (秒)：期间 get_position 直接读本地快照 (成交回报实时记账)，过期后一次 list_positions 整体对账
+POSITION_TTL = 300
+# 账户现金对账间隔 (秒)：期间现金由成交回报本地增减
+ACCOUNT_TTL = 300
+# 有未完结订单时，list_orders 批量轮询的间隔 (trade_updates 推送断了也能兜底)
+ORDER_POLL_SECONDS = 5
+
+# --- AI 决策缓存 (decision_cache.py) ---
+# 行情指纹 (趋势 / RSI 状态 / MACD 方向 / 持仓档位 / 价格档位 / 上一轮动作) 没变就复用上次决策，不再推理
+AI_CACHE_ENABLED = True
+AI_CACHE_TTL = 180          # 缓存有效期 (秒)
+AI_CACHE_SIZE = 256         # 最多缓存多少条指纹 (LRU 淘汰)
+AI_CACHE_PRICE_BPS = 10     # 价格档位宽度 (基点)：同档内价格差不超过 0.1%
+AI_CACHE_PNL_STEP = 0.005   # 持仓浮盈亏档位宽度 (0.5%)
+
 # 🔴 关键修改 2：把温度调低，让 AI 更稳重
 AI_TEMPERATURE = 0.0  # 设为 0，让决策更确定性
 
 # --- Alpaca 地址 ---
 BASE_URL = "https://paper-api.alpaca.markets"
+DATA_URL = "https://data.alpaca.markets"
+
+# --- Alpaca 实时行情推送 (WebSocket) ---
+# 关掉就回到每秒 HTTP 轮询；本地调试可以改成 "ws://127.0.0.1:8765" 连 fake_stream.py
+USE_STREAM = True
+DATA_STREAM_URL = "wss://stream.data.alpaca.markets"
+DATA_FEED = "iex"  # 免费账户只有 iex
+# 超过这个秒数没收到推送就认为推送失效，该币种回退到 HTTP 轮询
+STREAM_STALE_SECONDS = 5
+# stop() 最多等旧连接断开 / 推送线程退出多少秒 (Alpaca 每个 Key 只允许一条行情连接，马上重连会被拒)
+STREAM_STOP_SECONDS = 5
 
 # --- Ollama 地址 ---
-OLLAMA_URL = "http://localhost:11434/api/generate"
\ No newline at end of file
+OLLAMA_URL = "http://localhost:11434/api/generate"
+MODEL_NAME = "deepseek-r1:8b"
+# 模型常驻时间 + 固定上下文长度：两者都稳定，固定的 system 前缀才能一直命中 Ollama 的 KV 缓存
+AI_KEEP_ALIVE = "30m"
+AI_NUM_CTX = 8192
+
+# --- 推理调度 (inference.py) ---
+# 每个 Ollama 地址的最大并发 (本地显卡一般 1；多开几个 Ollama 实例就在这里加地址)
+OLLAMA_ENDPOINTS = {OLLAMA_URL: 1}
+# 模型 -> 地址，没列出的模型走 OLLAMA_URL
+AI_MODEL_ENDPOINTS = {}
+# 初筛小模型：先用它批量判断，只有它认为可能要交易 (非 HOLD) 的币种才交给 MODEL_NAME 深度推理；None = 不初筛
+AI_SCREEN_MODEL = None  # 例如 "qwen2.5:1.5b"
+AI_REQUEST_TIMEOUT = 120  # 单次推理两个 chunk 之间的最长等待 (秒)
+# True: 流式读取 (思考过程实时显示，拿到完整决策 JSON 就停止生成)；False: 等整段回复
+OLLAMA_STREAM = True
\ No newline at end of file
@@ -0,0 +1,76 @@
+# decision_cache.py
+"""
+♻️ AI 决策缓存：行情没有实质变化时直接复用上一次的决策，跳过几十秒的本地推理
+
+指纹 = 币种 + 趋势 + RSI 状态 + MACD 方向 + 持仓档位 (空仓 / 浮盈亏档) + 价格档位 (对数网格) + 上一轮动作
+- TTL 过期作废 (市场慢慢在变，不能永远复用)
+- 超过容量按 LRU 淘汰
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+import config
+
+
+class DecisionCache:
+    def __init__(self, ttl=None, max_size=None, price_bps=None, pnl_step=None, enabled=None):
+        self.ttl = config.AI_CACHE_TTL if ttl is None else ttl
+        self.max_size = config.AI_CACHE_SIZE if max_size is None else max_size
+        self.price_bps = config.AI_CACHE_PRICE_BPS if price_bps is None else price_bps
+        self.pnl_step = config.AI_CACHE_PNL_STEP if pnl_step is None else pnl_step
+        self.enabled = config.AI_CACHE_ENABLED if enabled is None else enabled
+
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # {fingerprint: (决策 tuple, 写入时间)}
+        self._lock = threading.Lock()
+
+    def fingerprint(self, symbol, price, qty, avg_price, hints, prev_memory=None):
+        """hints: strategy.market_hints 的结果；没有 hints 就无法判断行情是否变化，返回 None (不走缓存)"""
+        if not self.enabled or not hints or price <= 0: return None
+        macd = hints.get('macd') or 0.0
+        macd_sign = "+" if macd > 0 else "-" if macd < 0 else "0"
+        if qty > 0 and avg_price > 0:
+            position = ("LONG", math.floor((price - avg_price) / avg_price / self.pnl_step))
+        else:
+            position = ("FLAT",)
+        # 价格按 price_bps 宽的对数网格分档：同一档内价格相差不超过 price_bps 个基点
+        price_bucket = math.floor(math.log(price) / math.log1p(self.price_bps / 1e4))
+        prev_action = (prev_memory or {}).get('action')
+        return (symbol, hints.get('trend'), hints.get('rsi_state'), macd_sign, position, price_bucket, prev_action)
+
+    def get(self, key):
+        if key is None: return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None: del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, decision):
+        if key is None: return
+        with self._lock:
+            self._entries[key] = (decision, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+            }
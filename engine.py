@@ -0,0 +1,634 @@
+# engine.py
+"""
+⚙️ 无界面交易引擎：行情监控 + AI 策略两个循环都在这里，不依赖 Tkinter
+- QuantGUI 进程内直接用 (默认)，也可以单独跑成后台进程，GUI 通过 HTTP 以瘦客户端方式连上 (engine_client.py)
+- 界面需要的东西都以事件发出去：系统日志 / AI 日志 / 某个币种的表格行变了
+- 一台机器可以跑多个引擎 (不同配置文件 + 不同端口)，不需要显示器
+
+用法 (settings.json 里要有 engine_token，HTTP 接口只认带这个令牌的请求):
+    python engine.py --config settings.json --port 8770
+    python main.py --attach http://127.0.0.1:8770
+"""
+import argparse
+import datetime
+import hmac
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+import config
+import strategy
+from backend import AlpacaBackend
+from ai_agent import DeepSeekAgent
+from inference import PRIORITY_STOP, priority_for
+from prefilter import PreFilter
+from ollama_client import format_perf, summarize_perf
+from market_stream import MarketStream
+from trade_journal import TradeJournal
+from chart_feed import ChartFeed
+
+
+class TradingEngine:
+    def __init__(self, backend=None, ai=None, journal=None):
+        self.backend = backend or AlpacaBackend()
+        self.ai = ai or DeepSeekAgent()
+        self.journal = journal or TradeJournal()  # 成交日志 (只追加，图表按时间窗口查询)
+        self.prefilter = PreFilter()  # 规则预筛，明确的情况不问 AI
+        self.stream = None  # 实时行情推送 (WebSocket)，断了自动回退轮询
+
+        self.running = False
+        self.threads = []  # 本次运行的行情 / 策略线程，下次 start 前先等它们退出
+        self._run_lock = threading.Lock()  # HTTP 接口是多线程的，start / stop 不能交错
+        self.symbols_list = []
+        self.last_buy_time = {}
+        self.agent_memory = {}
+        self.start_time = 0
+        self.loop_counter = 0
+
+        # 共享数据缓存，用于界面和后台线程通信
+        self.market_cache = {} # {symbol: {'price': 0, 'pl': 0, 'qty': 0, 'status': '等待'}}
+
+        # 事件：进程内直接回调监听者；HTTP 客户端按序号拉取最近的日志
+        self.listeners = []
+        self.events = deque(maxlen=config.ENGINE_EVENT_BUFFER)  # {'seq', 'type': 'sys'/'ai', 'text', 'tag'}
+        self._seq = itertools.count(1)
+        self._event_lock = threading.Lock()
+
+    # ================= 对外接口 =================
+
+    @property
+    def connected(self):
+        return self.backend.connected
+
+    def connect(self, key, secret):
+        success, msg = self.backend.connect(key, secret, config.BASE_URL)
+        self.log_sys(msg, None if success else "ERR")
+        return success, msg
+
+    def start(self, symbols):
+        with self._run_lock:
+            return self._start(symbols)
+
+    def _start(self, symbols):
+        if self.running: return False, "引擎已在运行"
+        if not self.connected: return False, "未连接"
+        symbols = [s.strip().upper() for s in symbols if s.strip()]
+        if not symbols: return False, "交易对为空"
+
+        # stop() 只是把 running 置 False，旧线程可能还在睡眠 / 等这一轮推理收尾，等它们退出再开新的
+        deadline = time.time() + config.ENGINE_JOIN_SECONDS
+        for t in self.threads: t.join(max(0, deadline - time.time()))
+        if any(t.is_alive() for t in self.threads): return False, "上一次运行还在收尾，请稍后再启动"
+        self.symbols_list = symbols
+
+        self.running = True
+        # 🔥 新增：初始化系统状态计数器 (配合 Alpha Arena 逻辑)
+        self.start_time = time.time()  # 记录启动时间戳
+        self.loop_counter = 0
+        self.agent_memory = {}          # 重置循环次数
+        self.market_cache = {sym: {'price': 0, 'qty': 0, 'avg': 0, 'pl': 0, 'status': '初始化'} for sym in self.symbols_list}
+
+        self.log_sys(f"🚀 启动双线程系统: {self.symbols_list}")
+
+        # 📡 实时行情推送：有推送的币种不再每秒 HTTP 轮询
+        key, secret = self.backend.credentials
+        if self.backend.feed:
+            # 多进程分片：最新价由行情中心统一推送 (market_hub.py)，K 线也从那边取
+            self.stream = self.backend.feed
+            self.stream.on_trade = self.on_stream_trade
+            self.stream.start(self.symbols_list)
+        elif config.USE_STREAM:
+            self.stream = MarketStream(key, secret, on_trade=self.on_stream_trade, on_bar=self.backend.on_stream_bar)
+            self.stream.start(self.symbols_list)
+        if config.USE_STREAM:
+            # 🧾 成交回报推送 (每个账户各自一条)，成交直接记入本地账本
+            self.backend.orders.start_stream(key, secret, config.BASE_URL)
+
+        self.threads = [
+            # 🧵 线程 1: 极速行情刷新 (每 1 秒)
+            threading.Thread(target=self.monitor_prices_loop, daemon=True, name="monitor"),
+            # 🧵 线程 2: AI 策略分析 (每 60 秒)
+            threading.Thread(target=self.strategy_loop, daemon=True, name="strategy-loop"),
+        ]
+        for t in self.threads: t.start()
+        return True, "已启动"
+
+    def stop(self):
+        with self._run_lock:
+            return self._stop()
+
+    def _stop(self):
+        if not self.running: return False, "引擎未运行"
+        self.running = False
+        if self.stream:
+            self.stream.stop()
+            self.stream = None
+        self.backend.orders.stop_stream()
+        self.log_sys("🛑 停止中...")
+        return True, "已停止"
+
+    def status(self):
+        return {"connected": self.connected, "running": self.running, "symbols": list(self.symbols_list)}
+
+    def row(self, symbol):
+        """表格一行需要的数据 (含冷却倒计时)，不在监控列表里返回 None"""
+        data = self.market_cache.get(symbol)
+        if data is None: return None
+        rem = strategy.cooldown_remaining(self.last_buy_time.get(symbol, 0), time.time())
+        return dict(data, cooldown=rem)
+
+    def snapshot(self):
+        with self._event_lock:
+            seq = self.events[-1]['seq'] if self.events else 0
+        return dict(self.status(), seq=seq, rows={s: self.row(s) for s in self.symbols_list})
+
+    def make_chart_feed(self):
+        """图表数据生产者 (进程内直接读 backend / 成交日志)"""
+        return ChartFeed(self.backend, self.journal)
+
+    def events_since(self, seq):
+        with self._event_lock:
+            return [e for e in self.events if e['seq'] > seq]
+
+    # ================= 事件 =================
+
+    def subscribe(self, listener):
+        """listener(event)：{'type': 'sys'/'ai', 'text', 'tag'} 或 {'type': 'row', 'symbol'}；在引擎的线程里调用"""
+        self.listeners.append(listener)
+
+    def _emit(self, event):
+        for listener in self.listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"Engine Listener Error: {e}")
+
+    def _log(self, kind, text, tag=None):
+        with self._event_lock:
+            event = {"seq": next(self._seq), "type": kind, "text": text, "tag": tag}
+            self.events.append(event)
+        self._emit(event)
+
+    def notify(self, symbol):
+        """某个币种的表格行数据变了"""
+        self._emit({"type": "row", "symbol": symbol})
+
+    def log_sys(self, msg, tag=None):
+        t = datetime.datetime.now().strftime("%H:%M:%S")
+        self._log("sys", f"[{t}] {msg}\n", tag)
+
+    def think_streamer(self, symbol):
+        """流式推理时把 <think> 内容按行实时推到 AI 日志栏；返回 (回调, 状态)，状态里 used=True 表示已经流式输出过"""
+        state = {"line": "", "used": False}
+
+        def on_think(delta):
+            state["used"] = True
+            state["line"] += delta
+            *lines, state["line"] = state["line"].split("\n")
+            for line in lines:
+                if line.strip(): self.log_ai_line(symbol, line)
+
+        return on_think, state
+
+    def log_ai_line(self, symbol, line):
+        self._log("ai", f"[{symbol}] 💭 {line.strip()}\n")
+
+    def log_ai(self, symbol, thought, decision, reason):
+        self._log("ai", f"--- {symbol} ---\n[思考]\n{thought}\n[决定] {decision} | {reason}\n\n")
+
+    def record_trade(self, symbol, action, price):
+        # 追加写成交日志 (SQLite WAL，时间统一存 UTC 才能和 Alpaca 的 K 线对齐)
+        try:
+            self.journal.record(symbol, action, price)
+        except Exception as e:
+            print(f"Save Trade Error: {e}")
+
+    # ================= 行情 =================
+
+    def on_stream_trade(self, symbol, price):
+        """【推送线程】每个成交 tick 直接写共享缓存，界面由 monitor_prices_loop 每秒统一刷新"""
+        self.update_price_cache(symbol, price)
+
+    def update_price_cache(self, symbol, price):
+        # 更新共享缓存 (Thread-Safe)
+        if price <= 0 or symbol not in self.market_cache: return False
+        cache = self.market_cache[symbol]
+        cache['price'] = price
+
+        # 实时计算浮动盈亏 (PnL)
+        if cache['qty'] > 0:
+            cache['pl'] = (price - cache['avg']) * cache['qty']
+        return True
+
+    def monitor_prices_loop(self):
+        """
+        【线程1】轻量级高频循环 (每 1 秒)
+        任务：
+        1. 推送有效的币种直接用推送价格，推送断了才回退 HTTP 轮询
+        2. 通知界面刷新表格 (浮动盈亏、现价)
+        """
+        while self.running:
+            # --- 任务 A: 快速更新所有币种价格 ---
+            try:
+                # 推送有效的币种，推送回调已经写好缓存；其余的一次批量 HTTP 请求补上
+                polled = [s for s in self.symbols_list
+                          if not (self.stream and self.stream.last_price(s, config.STREAM_STALE_SECONDS) is not None)]
+                prices = self.backend.get_latest_prices(polled) if polled else {}
+                for symbol, price in prices.items():
+                    self.update_price_cache(symbol, price)
+
+                # 成交回报兜底轮询 (只在有未完结订单时才真正请求)
+                self.backend.orders.poll()
+            except Exception as e:
+                print(f"Price Monitor Error: {e}")
+
+            for symbol in self.symbols_list:
+                if not self.running: break
+                if symbol in self.market_cache:
+                    # 持仓以本地账本为准 (纯内存读取，不发请求)
+                    qty, _, avg = self.backend.positions.get(symbol)
+                    self.market_cache[symbol].update({'qty': qty, 'avg': avg})
+                    if qty <= 0: self.market_cache[symbol]['pl'] = 0
+                    self.notify(symbol)
+
+            # 休眠 1 秒
+            time.sleep(1.0)
+
+    # ================= 策略 =================
+
+    def strategy_loop(self):
+        """
+        【线程2】决策循环 (集成：宏观视角 + AI 记忆 + 硬性风控)
+        行情每轮批量拉取一次，AI 推理在线程池中并发执行，只有下单环节在本线程串行，
+        保证 available_cash 的本地记账不会被多个币种同时改写。
+        """
+        executor = ThreadPoolExecutor(max_workers=config.STRATEGY_MAX_WORKERS, thread_name_prefix="strategy")
+        in_flight = {}  # {symbol: future} 上一轮还没跑完的币种不重复提交
+
+        try:
+            while self.running:
+                round_start = time.time()
+                self.log_sys("🔍 AI 正在构建环境感知...", "WARN")
+                self.loop_counter += 1
+                run_minutes = int((round_start - self.start_time) / 60)
+
+                # 构建系统状态
+                system_state = {"run_time_min": run_minutes, "loop_count": self.loop_counter}
+
+                # 获取资金
+                available_cash, total_equity = self.backend.get_account_info()
+                self.log_sys(f"⏳ 第 {self.loop_counter} 轮 | 运行 {run_minutes}m | 现金: ${available_cash:,.2f}")
+
+                # 0. 整轮行情一次批量拉取 (包含 Macro 上帝视角)，不再每个币种单独请求
+                analysis = self.backend.get_analysis_batch(self.symbols_list)
+
+                # 1. 并发提交: 每 AI_BATCH_SIZE 个币种一组，组内 风控 -> 一次 AI 批量推理
+                ready = []
+                for symbol in self.symbols_list:
+                    prev = in_flight.get(symbol)
+                    if prev is not None and not prev.done():
+                        self.log_sys(f"[{symbol}] ⌛ 上一轮分析尚未结束，本轮跳过", "WARN")
+                        continue
+                    ready.append(symbol)
+
+                # 止损复查 / 已有持仓的币种排前面，先组批先提交，推理队列里也优先
+                def order(symbol):
+                    qty, _, avg = self.backend.get_position(symbol)
+                    return priority_for(qty, analysis.get(symbol, (0, ""))[0], avg)
+                ready.sort(key=order)
+
+                futures = {}
+                batch_size = max(1, config.AI_BATCH_SIZE)
+                for i in range(0, len(ready), batch_size):
+                    group = ready[i:i + batch_size]
+                    future = executor.submit(self.evaluate_batch, group, analysis, available_cash, total_equity, system_state)
+                    for symbol in group: in_flight[symbol] = future
+                    futures[future] = group
+
+                # 2. 谁先出结果谁先执行 (串行下单)，超过本轮截止时间的直接放弃
+                deadline = round_start + config.STRATEGY_ROUND_DEADLINE
+                try:
+                    for future in as_completed(futures, timeout=max(0, deadline - time.time())):
+                        if not self.running: break
+                        group = futures[future]
+                        try:
+                            for decision in future.result():
+                                available_cash = self.execute_decision(decision, available_cash)
+                        except Exception as e:
+                            self.log_sys(f"Strategy Error [{','.join(group)}]: {e}", "ERR")
+                except FuturesTimeout:
+                    late = [s for f, group in futures.items() if not f.done() for s in group]
+                    for f in futures: f.cancel()  # 还在排队的直接取消，正在推理的让它跑完但结果作废
+                    self.log_sys(f"⏰ 本轮超时 ({config.STRATEGY_ROUND_DEADLINE}s)，放弃: {late}", "WARN")
+                    for s in late:
+                        if s in self.market_cache:
+                            self.market_cache[s]['status'] = "超时"
+                            self.notify(s)
+
+                pre = self.prefilter.stats() if self.prefilter.enabled else None
+                if pre:
+                    rates = " | ".join(f"{s} {r['skip_rate']:.0%}" for s, r in pre.items())
+                    self.log_sys(f"⚡ 规则预筛跳过 AI 比例: {rates}")
+                perf = self.ai.drain_perf()
+                if perf:
+                    self.log_sys(f"⏱️ AI 推理 {len(perf)} 次 (平均) | {format_perf(summarize_perf(perf))}")
+                if config.AI_CACHE_ENABLED:
+                    stats = self.ai.cache.stats()
+                    self.log_sys(f"♻️ AI 决策缓存: 命中 {stats['hits']} / 未命中 {stats['misses']} ({stats['hit_rate']:.0%})")
+
+                # 3. 按固定节奏开始下一轮 (扣除本轮已用时间)
+                wait = max(0, int(round_start + config.DEFAULT_INTERVAL - time.time()))
+                self.log_sys(f"⏳ 本轮结束，系统休眠 {wait} 秒...", "WARN")
+                for _ in range(wait):
+                    if not self.running: break
+                    time.sleep(1)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def evaluate_batch(self, symbols, analysis, available_cash, total_equity, system_state):
+        """
+        【工作线程】一组币种的 硬性风控 + AI 决策 (行情已由 strategy_loop 批量拉取)
+        风控放行的币种打包成一次 AI 调用 (AI_BATCH_SIZE = 1 时就是每个币种单独问)
+        不下单，只返回决策列表，由 strategy_loop 串行执行。
+        """
+        decisions, pending = [], []
+        for symbol in symbols:
+            decision, request = self.guard_symbol(symbol, analysis.get(symbol, (0, "No Data")))
+            if decision: decisions.append(decision)
+            if request: pending.append(request)
+        if not pending or not self.running: return decisions
+
+        # ==========================================
+        # 🧠 AI 决策 (带记忆)
+        # ==========================================
+
+        # 调用 AI (流式模式下思考过程实时推到 AI 日志栏)
+        label = ",".join(r['symbol'] for r in pending)
+        on_think, streamed = self.think_streamer(label)
+        results = self.ai.analyze_batch(config.MODEL_NAME, pending, available_cash, total_equity, system_state, on_think=on_think)
+        if streamed["used"] and streamed["line"].strip(): self.log_ai_line(label, streamed["line"])
+
+        for req in pending:
+            symbol = req['symbol']
+            action, amount_usd, reason, thought = results[symbol]
+            if streamed["used"] and not reason.endswith("(cached)"): thought = "(见上方实时输出)"
+
+            # 更新记忆
+            self.agent_memory[symbol] = {
+                "action": action,
+                "reason": reason,
+                "timestamp": time.time()
+            }
+
+            # 日志与界面
+            decision_str = f"{action} ${amount_usd:,.2f}" if action != "HOLD" else "HOLD"
+            self.log_ai(symbol, thought, decision_str, reason)
+            self.market_cache[symbol]['status'] = action
+            self.notify(symbol)
+
+            decisions.append({"symbol": symbol, "action": action, "amount_usd": amount_usd, "price": req['price'], "qty": req['qty']})
+        return decisions
+
+    def guard_symbol(self, symbol, analysis):
+        """
+        单个币种的 硬性风控
+        Returns: (decision, request)
+            decision: 风控直接给出的决策 (熔断止损)，否则 None
+            request : 需要问 AI 的上下文 (传给 analyze_batch)，否则 None
+        """
+        if not self.running: return None, None
+
+        self.market_cache[symbol]['status'] = "🧠 思考中..."
+        self.notify(symbol)
+
+        # 1. 本轮批量拉取的数据
+        price, report = analysis
+        if price <= 0: return None, None
+
+        # 2. 获取持仓
+        qty, pl, avg = self.backend.get_position(symbol)
+        self.market_cache[symbol].update({'qty': qty, 'avg': avg})
+
+        # ==========================================
+        # 🛡️ 灵感三：硬性风控 (Hard Guardrails)
+        # ==========================================
+
+        # [风控 A] 冷却时间：买入后 5 分钟内禁止 AI 再次操作
+        # 防止 AI 在高位买了之后，稍微回调一点又想卖，或者买了又买
+        cooldown = strategy.cooldown_remaining(self.last_buy_time.get(symbol, 0), time.time())
+
+        if cooldown > 0:
+            remaining = int(cooldown)
+            self.log_sys(f"[{symbol}] ❄️ 交易冷却中 (剩余 {remaining}s)，跳过 AI", "WARN")
+            self.market_cache[symbol]['status'] = f"冷却 {remaining}s"
+            self.notify(symbol)
+            return None, None # 直接跳过本次循环，不问 AI
+
+        # [风控 B] 熔断止损：如果单币种亏损超过 5%，强制清仓，不问 AI
+        # 只有持仓价值大于 $50 才触发，防止碎股误触
+        loss_pct = strategy.hard_stop_hit(qty, price, avg)
+        if loss_pct is not None:
+            return {"symbol": symbol, "action": "STOP_LOSS", "price": price, "qty": qty, "loss_pct": loss_pct}, None
+
+        # [预筛] 一眼能判断的情况 (空仓逢跌不买 / 不追高；配置了卖出比例时持仓极端超买直接减仓) 直接用规则决定
+        rule = self.prefilter.decide(symbol, qty, price, self.backend.hints.get(symbol))
+        if rule is not None:
+            action, amount_usd, reason = rule
+            self.agent_memory[symbol] = {"action": action, "reason": reason, "timestamp": time.time()}
+            self.market_cache[symbol]['status'] = f"⚡ {action}"
+            self.notify(symbol)
+            if action == "HOLD": return None, None
+            self.log_sys(f"[{symbol}] ⚡ 规则预筛: {action} ${amount_usd:,.2f} ({reason})", "WARN")
+            return {"symbol": symbol, "action": action, "amount_usd": amount_usd, "price": price, "qty": qty}, None
+
+        request = {
+            "symbol": symbol, "price": price, "report": report, "qty": qty, "avg": avg,
+            "prev_memory": self.agent_memory.get(symbol, None),  # <--- 上一轮记忆
+            "hints": self.backend.hints.get(symbol),              # <--- 决策缓存指纹
+            "priority": priority_for(qty, price, avg),            # <--- 推理排队优先级
+        }
+        # [预筛] 持仓 RSI 极端超买：不直接清仓，标成 SELL 候选交给 AI，排到最前面
+        flag = self.prefilter.sell_candidate(qty, request['hints'])
+        if flag:
+            self.log_sys(f"[{symbol}] ⚡ 规则预筛: {flag}", "WARN")
+            request['report'] = f"{report}\n[PRE-FILTER] {flag}"
+            request['priority'] = PRIORITY_STOP
+        return None, request
+
+    def execute_decision(self, decision, available_cash):
+        """
+        【策略线程】串行执行下单，返回扣减后的本地可用现金
+        """
+        symbol = decision['symbol']
+        action = decision['action']
+        price = decision['price']
+        qty = decision['qty']
+
+        if action == "STOP_LOSS":
+            self.log_sys(f"[{symbol}] 🚨 触发硬性熔断 (当前亏损 {decision['loss_pct']*100:.2f}%)，强制清仓！", "SELL")
+
+            success, msg = self.backend.close_full_position(symbol)
+            if success:
+                self.record_trade(symbol, 'STOP_LOSS', price)
+                # 强制清仓后，建议更新冷却时间，防止立刻买回
+                self.last_buy_time[symbol] = time.time()
+
+        # ==========================================
+        # ⚙️ 执行逻辑
+        # ==========================================
+        elif action == "BUY":
+            # 只有当 AI 真的想买 (金额 > 10) 且有钱时才执行
+            buy_usd = strategy.size_buy(decision['amount_usd'], available_cash)
+            if buy_usd > 0:
+                success, msg = self.backend.place_order(symbol, "buy", buy_usd, price)
+                tag = "BUY" if success else "ERR"
+                self.log_sys(f"[{symbol}] 买入 ${buy_usd:,.2f} : {msg}", tag)
+                if success:
+                    self.last_buy_time[symbol] = time.time() # 更新冷却计时器
+                    self.record_trade(symbol, 'BUY', price)
+                    available_cash -= buy_usd # 扣减本地记录的余额
+
+        elif action == "SELL":
+            sell_val_usd = decision['amount_usd']
+
+            if qty > 0 and sell_val_usd > 0:
+                # 智能判断：卖出比例 > 98% 视为清仓
+                is_full_exit = strategy.is_full_exit(sell_val_usd, qty, price)
+
+                if is_full_exit:
+                    success, msg = self.backend.close_full_position(symbol)
+                    self.log_sys(f"[{symbol}] 🌊 清仓卖出: {msg}", "SELL")
+                else:
+                    sell_qty = sell_val_usd / price
+                    success, msg = self.backend.submit_qty_order(symbol, "sell", sell_qty)
+                    self.log_sys(f"[{symbol}] 📉 减仓卖出 ${sell_val_usd:.2f}: {msg}", "SELL")
+
+                if success:
+                    self.record_trade(symbol, 'SELL', price)
+
+        return available_cash
+
+
+class EngineHandler(BaseHTTPRequestHandler):
+    """
+    🔌 本地 HTTP 接口 (JSON)，每个请求都要带 config.ENGINE_TOKEN_HEADER 令牌，否则 401
+    GET  /state                 连接 / 运行状态 + 最新日志序号 + 每个币种的表格行
+    GET  /events?since=N        序号大于 N 的日志
+    GET  /chart?symbol=&tf=     准备好的绘图数据 (chart_feed 同款 payload)
+    POST /connect {key, secret} | /start {symbols: [...]} | /stop
+    """
+    engine = None
+    chart_feed = None
+    token = None
+
+    def _authorized(self):
+        # 转成 bytes 再比：compare_digest 遇到非 ASCII 的 str 会抛 TypeError
+        sent = self.headers.get(config.ENGINE_TOKEN_HEADER, "").encode("utf-8", "surrogateescape")
+        if hmac.compare_digest(sent, self.token.encode("utf-8")): return True
+        self._send_json(401, {"error": "unauthorized"})
+        return False
+
+    def do_GET(self):
+        if not self._authorized(): return
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path == "/state":
+            self._send_json(200, self.engine.snapshot())
+        elif url.path == "/events":
+            try:
+                since = int(query.get('since', 0))
+            except ValueError:
+                return self._send_json(400, {"error": "since must be an integer"})
+            self._send_json(200, self.engine.events_since(since))
+        elif url.path == "/chart":
+            if 'symbol' not in query: return self._send_json(400, {"error": "symbol required"})
+            payload = self.chart_feed.prepare(query['symbol'], query.get('tf', "1Min"))
+            self._send_json(200, encode_chart(payload))
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if not self._authorized(): return
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b"{}")
+        if self.path == "/connect":
+            success, msg = self.engine.connect(body.get('key', ''), body.get('secret', ''))
+        elif self.path == "/start":
+            success, msg = self.engine.start(body.get('symbols', []))
+        elif self.path == "/stop":
+            success, msg = self.engine.stop()
+        else:
+            return self._send_json(404, {"error": "not found"})
+        self._send_json(200, {"success": success, "msg": msg})
+
+    def _send_json(self, status, obj):
+        data = json.dumps(obj, default=float).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def encode_chart(payload):
+    """chart_feed payload -> JSON (K 线按列存，时间为本地无时区的纳秒)"""
+    df = payload['df']
+    out = {k: payload[k] for k in ('symbol', 'timeframe', 'markers', 'hlines')}
+    if df is None:
+        out['bars'] = None
+    else:
+        out['bars'] = {'t': np.asarray(df.index, dtype='datetime64[ns]').view('i8').tolist(), **{c: df[c].astype(float).tolist() for c in ('open', 'high', 'low', 'close', 'volume')}}
+    return out
+
+
+def serve(engine, token, host=None, port=None):
+    """
+    在后台线程启动 HTTP 接口，返回 server (server.shutdown() 停止)
+    token: 客户端必须带的令牌 (不能为空)；默认只监听 127.0.0.1
+    """
+    if not token: raise ValueError("engine_token 不能为空")
+    handler = type("Handler", (EngineHandler,), {"engine": engine, "chart_feed": engine.make_chart_feed(), "token": token})
+    server = ThreadingHTTPServer((host or config.ENGINE_HOST, port or config.ENGINE_PORT), handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="engine-http").start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless DeepStock trading engine")
+    parser.add_argument("--config", default="settings.json", help="api_key / api_secret / symbols / engine_token (与 GUI 的 settings.json 同格式)")
+    parser.add_argument("--host", default=config.ENGINE_HOST)
+    parser.add_argument("--port", type=int, default=config.ENGINE_PORT)
+    parser.add_argument("--no-start", action="store_true", help="只连接不自动启动，等客户端 POST /start")
+    args = parser.parse_args()
+
+    with open(args.config, "r") as f: settings = json.load(f)
+    if not settings.get("engine_token"):
+        print(f"❌ {args.config} 里没有 engine_token：HTTP 接口能下发 API Key / 启停交易，必须设置访问令牌")
+        raise SystemExit(1)
+    # 同一台机器跑多个引擎时，各自用自己的成交日志 / K 线仓库
+    config.TRADE_JOURNAL_FILE = settings.get("trade_journal", config.TRADE_JOURNAL_FILE)
+    config.BAR_STORE_DIR = settings.get("bar_store_dir", config.BAR_STORE_DIR)
+
+    engine = TradingEngine()
+    engine.subscribe(lambda e: print(e['text'], end="") if e['type'] in ("sys", "ai") else None)
+    server = serve(engine, settings["engine_token"], args.host, args.port)
+    print(f"⚙️ Engine listening on http://{args.host}:{args.port}")
+
+    if settings.get("api_key") and settings.get("api_secret"):
+        success, _ = engine.connect(settings["api_key"], settings["api_secret"])
+        if success and not args.no_start:
+            engine.start(settings.get("symbols", "").split(","))
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        engine.stop()
+        server.shutdown()
@@ -0,0 +1,140 @@
+# engine_client.py
+"""
+🔗 瘦客户端：通过 HTTP 连到单独运行的 engine.py，对 GUI 暴露和 TradingEngine 一样的接口
+- 后台线程每 ENGINE_POLL_SECONDS 秒拉一次 /state (表格行) 和 /events (增量日志)，转成同样的事件交给监听者
+- 图表数据由引擎准备好 (/chart)，这里只负责还原成 DataFrame
+- 每个请求都带引擎的访问令牌 (settings.json 的 engine_token)
+"""
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import requests
+
+import config
+from chart_feed import ChartFeed
+
+
+def decode_chart(data):
+    """engine.encode_chart 的逆操作：/chart 返回的 JSON -> chart_feed payload"""
+    bars = data.pop('bars')
+    df = None
+    if bars is not None:
+        index = pd.DatetimeIndex(np.array(bars.pop('t'), dtype=np.int64).view('datetime64[ns]'))
+        df = pd.DataFrame(bars, index=index)
+    data['df'] = df
+    data['hlines'] = [tuple(h) for h in data['hlines']]
+    return data
+
+
+class RemoteEngine:
+    def __init__(self, url, token, interval=None):
+        self.url = url.rstrip('/')
+        self.interval = interval or config.ENGINE_POLL_SECONDS
+        self.session = requests.Session()
+        self.session.headers[config.ENGINE_TOKEN_HEADER] = token
+        self.listeners = []
+        self.last_seq = 0
+        self._poll_lock = threading.Lock()  # start/stop 后立即同步 和 后台轮询 不能同时跑 (否则日志重复)
+        self.state = {"connected": False, "running": False, "symbols": [], "seq": 0, "rows": {}}
+        self._poll()  # 先同步一次，GUI 启动时就能恢复按钮 / 表格状态
+        threading.Thread(target=self._run, daemon=True, name="engine-client").start()
+
+    # ================= 和 TradingEngine 相同的接口 =================
+
+    @property
+    def connected(self):
+        return self.state['connected']
+
+    @property
+    def running(self):
+        return self.state['running']
+
+    @property
+    def symbols_list(self):
+        return self.state['symbols']
+
+    def connect(self, key, secret):
+        return self._post("/connect", {"key": key, "secret": secret})
+
+    def start(self, symbols):
+        success, msg = self._post("/start", {"symbols": list(symbols)})
+        if success: self._poll()
+        return success, msg
+
+    def stop(self):
+        success, msg = self._post("/stop")
+        if success: self._poll()
+        return success, msg
+
+    def status(self):
+        return {k: self.state[k] for k in ("connected", "running", "symbols")}
+
+    def row(self, symbol):
+        return self.state['rows'].get(symbol)
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def make_chart_feed(self):
+        return RemoteChartFeed(self)
+
+    def chart(self, symbol, timeframe):
+        resp = self.session.get(f"{self.url}/chart", params={"symbol": symbol, "tf": timeframe}, timeout=30)
+        resp.raise_for_status()
+        return decode_chart(resp.json())
+
+    # ================= 轮询 =================
+
+    def _post(self, path, body=None):
+        try:
+            resp = self.session.post(self.url + path, json=body or {}, timeout=30)
+            resp.raise_for_status()
+            data = resp.json()
+            return data['success'], data['msg']
+        except Exception as e:
+            return False, f"引擎连接失败: {e}"
+
+    def _emit(self, event):
+        for listener in self.listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"Engine Listener Error: {e}")
+
+    def _poll(self):
+        with self._poll_lock:
+            self._poll_once()
+
+    def _poll_once(self):
+        try:
+            resp = self.session.get(f"{self.url}/state", timeout=10)
+            resp.raise_for_status()  # 令牌不对是 401，不能当成状态用
+            self.state = resp.json()
+            if self.state['seq'] < self.last_seq: self.last_seq = 0  # 引擎重启过，序号从头开始
+            events = self.session.get(f"{self.url}/events", params={"since": self.last_seq}, timeout=10).json()
+        except Exception as e:
+            print(f"Engine Poll Error: {e}")
+            return
+        for event in events:
+            self.last_seq = event['seq']
+            self._emit(event)
+        for symbol in self.state['symbols']:
+            self._emit({"type": "row", "symbol": symbol})
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self._poll()
+
+
+class RemoteChartFeed(ChartFeed):
+    """图表数据改从引擎的 /chart 取 (K 线 / 标记 / 价格线都在引擎那边整理好)"""
+
+    def __init__(self, client, interval=None):
+        super().__init__(None, None, interval)
+        self.client = client
+
+    def prepare(self, symbol, timeframe):
+        return self.client.chart(symbol, timeframe)
@@ -0,0 +1,134 @@
+# fake_ollama.py
+"""
+🧪 本地假 Ollama：模拟 /api/generate (NDJSON 流式 / 非流式)，离线调试 inference.py / ai_agent.py 用
+- 单币种 prompt 回一个 JSON 对象，批量 prompt ("===== SYMBOL =====" 分段) 回 JSON 数组
+- 先输出一段 <think>，按 --token-delay 逐 token 吐字，最后一个 chunk 带 prompt_eval / eval 统计
+- 客户端早停断开时打印实际生成了多少 token
+- 记录收到的请求 / 最高并发 / 早停次数，测试里用 serve() 起一个独立实例检查调度
+
+用法:
+    python fake_ollama.py --port 11435 --token-delay 0.02 --hold-ratio 0.7
+    然后把 config.OLLAMA_URL / OLLAMA_ENDPOINTS 改成 "http://127.0.0.1:11435/api/generate"
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SECTION_RE = re.compile(r"===== (\S+) =====")
+
+
+class FakeOllama(BaseHTTPRequestHandler):
+    token_delay = 0.02
+    think_tokens = 40
+    hold_ratio = 0.7
+    active = 0
+    peak = 0          # 最高同时处理的请求数
+    early_stops = 0   # 客户端中途断开的次数
+    received = []     # 收到的请求体 (按到达顺序)
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b"{}")
+        prompt = body.get('system', '') + body.get('prompt', '')
+        cls = type(self)
+        with cls.lock:
+            cls.received.append(body)
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        self.generating = True
+        try:
+            self._generate(body, prompt)
+        finally:
+            self._finish()
+
+    def _finish(self):
+        """生成结束 (发最后一个 chunk 之前就算，客户端收到它就可能立刻发下一个请求)"""
+        if not self.generating: return
+        self.generating = False
+        with type(self).lock: type(self).active -= 1
+
+    def _decide(self, symbol):
+        action = "HOLD" if random.random() < self.hold_ratio else random.choice(["BUY", "SELL"])
+        amount = 0.0 if action == "HOLD" else round(random.uniform(20, 200), 2)
+        return {"symbol": symbol, "action": action, "amount_usd": amount, "reason": f"fake {action.lower()}"}
+
+    def _generate(self, body, prompt):
+        symbols = SECTION_RE.findall(prompt)
+        if symbols: answer = json.dumps([self._decide(s) for s in symbols])
+        else: answer = json.dumps({k: v for k, v in self._decide("").items() if k != "symbol"})
+        think = " ".join(random.choice(["price", "trend", "rsi", "macd", "volume", "hmm"]) for _ in range(self.think_tokens))
+        tokens = ["<think>"] + [w + " " for w in think.split()] + ["</think>\n\n"] + re.findall(r".{1,4}", answer)
+        # 假装模型在后面继续啰嗦，早停生效的话这些不会被发出去
+        tokens += ["\nExtra ", "words "] * 20
+
+        stats = {"prompt_eval_count": len(prompt) // 4, "prompt_eval_duration": int(len(prompt) * 2e5),
+                 "eval_count": len(tokens), "eval_duration": int(len(tokens) * self.token_delay * 1e9),
+                 "load_duration": 1_000_000, "total_duration": 0}
+
+        if not body.get('stream', True):
+            time.sleep(self.token_delay * len(tokens))
+            self._finish()
+            self._send_json(200, {"model": body.get('model'), "response": "".join(tokens), "done": True, **stats})
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        sent = 0
+        try:
+            for tok in tokens:
+                time.sleep(self.token_delay)
+                self._write_line({"model": body.get('model'), "response": tok, "done": False})
+                sent += 1
+            self._finish()
+            self._write_line({"model": body.get('model'), "response": "", "done": True, "context": [1, 2, 3], **stats})
+            print(f"🧪 [{body.get('model')}] 完整生成 {sent} tokens (并发 {type(self).active})")
+        except (BrokenPipeError, ConnectionResetError):
+            with type(self).lock: type(self).early_stops += 1
+            print(f"🧪 [{body.get('model')}] 客户端早停：生成 {sent}/{len(tokens)} tokens (并发 {type(self).active})")
+
+    def _write_line(self, obj):
+        self.wfile.write((json.dumps(obj) + "\n").encode())
+        self.wfile.flush()
+
+    def _send_json(self, status, obj):
+        data = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(host="127.0.0.1", port=11435, **options):
+    """
+    后台线程起一个独立的假 Ollama (计数器互不干扰)，options 覆盖 token_delay / think_tokens / hold_ratio
+    Returns: (server, handler 类)；handler.received / peak / early_stops 查看收到的请求
+    """
+    handler = type("FakeOllamaInstance", (FakeOllama,), dict(options, active=0, peak=0, early_stops=0, received=[], lock=threading.Lock()))
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="fake-ollama").start()
+    return server, handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fake Ollama /api/generate server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--token-delay", type=float, default=0.02, help="每个 token 的间隔 (秒)")
+    parser.add_argument("--think-tokens", type=int, default=40)
+    parser.add_argument("--hold-ratio", type=float, default=0.7, help="回答 HOLD 的概率")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    FakeOllama.token_delay, FakeOllama.think_tokens, FakeOllama.hold_ratio = args.token_delay, args.think_tokens, args.hold_ratio
+    print(f"🧪 Fake Ollama listening on http://{args.host}:{args.port}/api/generate")
+    ThreadingHTTPServer((args.host, args.port), FakeOllama).serve_forever()
@@ -0,0 +1,82 @@
+# fake_stream.py
+"""
+🧪 本地假行情服务器：模拟 Alpaca 行情 WebSocket 协议 (msgpack)，离线调试 market_stream.py 用
+
+用法:
+    python fake_stream.py --port 8765
+    然后把 config.DATA_STREAM_URL 改成 "ws://127.0.0.1:8765"
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+
+import msgpack
+import websockets
+
+
+async def handle(ws, path=None, tick_interval=0.2, bar_interval=60.0, drop_after=None):
+    await ws.send(msgpack.packb([{'T': 'success', 'msg': 'connected'}]))
+
+    auth = msgpack.unpackb(await ws.recv())
+    if auth.get('action') != 'auth':
+        await ws.send(msgpack.packb([{'T': 'error', 'code': 401, 'msg': 'not authenticated'}]))
+        return
+    await ws.send(msgpack.packb([{'T': 'success', 'msg': 'authenticated'}]))
+
+    sub = msgpack.unpackb(await ws.recv())
+    trades, bars = sub.get('trades', []), sub.get('bars', [])
+    await ws.send(msgpack.packb([{'T': 'subscription', 'trades': trades, 'bars': bars}]))
+
+    prices = {s: random.uniform(50, 500) for s in set(trades) | set(bars)}
+    bar_state = {s: None for s in bars}
+    started = last_bar = time.time()
+    while True:
+        now = datetime.now(timezone.utc)
+        msgs = []
+        for s in trades:
+            prices[s] *= 1 + random.gauss(0, 0.0005)
+            msgs.append({'T': 't', 'S': s, 'p': round(prices[s], 4), 's': random.random(),
+                         't': msgpack.Timestamp.from_datetime(now)})
+        for s in bars:
+            p = prices[s]
+            o, h, l, v = bar_state[s] or (p, p, p, 0.0)
+            bar_state[s] = (o, max(h, p), min(l, p), v + random.random())
+        if time.time() - last_bar >= bar_interval:
+            for s in bars:
+                o, h, l, v = bar_state[s]
+                msgs.append({'T': 'b', 'S': s, 'o': o, 'h': h, 'l': l, 'c': prices[s], 'v': v,
+                             't': msgpack.Timestamp.from_datetime(now.replace(second=0, microsecond=0))})
+                bar_state[s] = None
+            last_bar = time.time()
+        if msgs: await ws.send(msgpack.packb(msgs))
+
+        # 模拟服务端断线，用来验证自动重连
+        if drop_after and time.time() - started > drop_after:
+            await ws.close()
+            return
+        await asyncio.sleep(tick_interval)
+
+
+async def serve(host, port, **kwargs):
+    async def handler(ws, path=None):
+        try:
+            await handle(ws, path, **kwargs)
+        except websockets.ConnectionClosed:
+            pass  # 客户端主动断开
+
+    async with websockets.serve(handler, host, port):
+        print(f"🧪 Fake stream listening on ws://{host}:{port}")
+        await asyncio.Future()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fake Alpaca market-data stream")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tick", type=float, default=0.2, help="trade 推送间隔 (秒)")
+    parser.add_argument("--bar", type=float, default=60.0, help="bar 推送间隔 (秒)")
+    parser.add_argument("--drop-after", type=float, default=None, help="N 秒后主动断线 (测试重连)")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, tick_interval=args.tick, bar_interval=args.bar, drop_after=args.drop_after))
@@ -0,0 +1,249 @@
+# indicators.py
+"""
+📈 流式指标引擎：每来一根 K 线只做 O(1) 更新，不再对整张 DataFrame 重算 pandas_ta
+
+算法与 pandas_ta 的默认实现保持一致:
+- EMA : 前 length 根用 SMA 做种子，之后 ewm(span=length, adjust=False)
+- RSI : Wilder 平滑 (rma = ewm(alpha=1/length, adjust=True, min_periods=length))
+- MACD: EMA12 - EMA26，信号线是对 MACD 有效段再做 EMA9
+
+每个指标都有两种操作:
+- update(x): 提交一根已经走完的 K 线，更新内部状态
+- peek(x)  : 假设 x 是下一根 K 线，算出指标值但不改状态 (用于还没走完的最新一根)
+
+另外提供同算法的整列向量化版本 (ema_series / rsi_series / macd_series)，给参数扫描 (sweep.py) 一次算完整段历史
+"""
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+class SMA:
+    """简单移动平均 (同时给出窗口内总和，滚动成交量直接用它)"""
+    def __init__(self, length):
+        self.length = length
+        self.window = deque()
+        self.total = 0.0
+
+    def update(self, x):
+        self.window.append(x)
+        self.total += x
+        if len(self.window) > self.length:
+            self.total -= self.window.popleft()
+        return self.value
+
+    def peek(self, x):
+        total = self.total + x
+        n = len(self.window) + 1
+        if n > self.length:
+            total -= self.window[0]
+            n = self.length
+        return total / n if n >= self.length else None
+
+    @property
+    def value(self):
+        return self.total / self.length if len(self.window) >= self.length else None
+
+
+class EMA:
+    """指数移动平均 (SMA 种子，与 pandas_ta.ema 一致)"""
+    def __init__(self, length):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.count = 0
+        self.seed_sum = 0.0
+        self.value = None
+
+    def update(self, x):
+        self.value = self.peek(x)
+        self.count += 1
+        if self.count <= self.length: self.seed_sum += x
+        return self.value
+
+    def peek(self, x):
+        if self.count + 1 < self.length: return None
+        if self.count + 1 == self.length: return (self.seed_sum + x) / self.length
+        return self.alpha * x + (1 - self.alpha) * self.value
+
+
+class RMA:
+    """Wilder 平滑，等价于 pandas ewm(alpha=1/length, adjust=True, min_periods=length)"""
+    def __init__(self, length):
+        self.length = length
+        self.decay = 1.0 - 1.0 / length
+        self.count = 0
+        self.num = 0.0
+        self.den = 0.0
+
+    def update(self, x):
+        self.num = x + self.decay * self.num
+        self.den = 1.0 + self.decay * self.den
+        self.count += 1
+        return self.value
+
+    def peek(self, x):
+        if self.count + 1 < self.length: return None
+        return (x + self.decay * self.num) / (1.0 + self.decay * self.den)
+
+    @property
+    def value(self):
+        return self.num / self.den if self.count >= self.length else None
+
+
+class RSI:
+    """相对强弱指数 (Wilder)"""
+    def __init__(self, length=14):
+        self.gain = RMA(length)
+        self.loss = RMA(length)
+        self.prev = None
+        self.value = None
+
+    def update(self, x):
+        if self.prev is not None:
+            diff = x - self.prev
+            self.value = self._rsi(self.gain.update(max(diff, 0.0)), self.loss.update(max(-diff, 0.0)))
+        self.prev = x
+        return self.value
+
+    def peek(self, x):
+        if self.prev is None: return None
+        diff = x - self.prev
+        return self._rsi(self.gain.peek(max(diff, 0.0)), self.loss.peek(max(-diff, 0.0)))
+
+    @staticmethod
+    def _rsi(gain, loss):
+        if gain is None or loss is None: return None
+        if gain + loss == 0: return None  # 完全横盘，pandas_ta 这里也是 NaN
+        return 100.0 * gain / (gain + loss)
+
+
+class MACD:
+    """MACD(12, 26, 9)，返回 (macd, signal, hist)"""
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+        self.value = (None, None, None)
+
+    def update(self, x):
+        f, s = self.fast.update(x), self.slow.update(x)
+        if f is None or s is None: return self.value
+        macd = f - s
+        sig = self.signal.update(macd)
+        self.value = (macd, sig, None if sig is None else macd - sig)
+        return self.value
+
+    def peek(self, x):
+        f, s = self.fast.peek(x), self.slow.peek(x)
+        if f is None or s is None: return (None, None, None)
+        macd = f - s
+        sig = self.signal.peek(macd)
+        return (macd, sig, None if sig is None else macd - sig)
+
+
+class IndicatorEngine:
+    """
+    🧮【单币种指标状态】喂入 K 线 DataFrame，只处理上次之后新增的 K 线
+    最新一根视为未走完，只 peek 不提交，下次它变成倒数第二根时才真正提交
+    """
+    def __init__(self, ema_len=20, rsi_len=14, vol_len=20, tail=12):
+        self.ema_len, self.rsi_len, self.vol_len, self.tail = ema_len, rsi_len, vol_len, tail
+        self.reset()
+
+    def reset(self):
+        self.ema = EMA(self.ema_len)
+        self.sma = SMA(self.ema_len)
+        self.rsi = RSI(self.rsi_len)
+        self.macd = MACD()
+        self.vol = SMA(self.vol_len)
+        self.last_ts = None
+        self.bars = 0
+        self.rsi_tail = deque(maxlen=self.tail - 1)
+        self.macd_tail = deque(maxlen=self.tail - 1)
+
+    def push(self, close, volume):
+        """提交一根已经走完的 K 线 (回测逐根喂数据用)"""
+        self.ema.update(close)
+        self.sma.update(close)
+        self.rsi_tail.append(self.rsi.update(close))
+        self.macd_tail.append(self.macd.update(close)[0])
+        self.vol.update(volume)
+        self.bars += 1
+
+    def update(self, df):
+        """
+        df: 按时间升序、含 close/volume 列的 K 线
+        Returns: 指标快照 dict；数据不够预热时返回 None (调用方走 pandas 兜底)
+        """
+        if df is None or df.empty: return None
+        index = df.index
+        if self.last_ts is None or self.last_ts not in index:
+            # 第一次 / 缓存断档: 从头重放
+            self.reset()
+            start = 0
+        else:
+            start = index.get_loc(self.last_ts) + 1
+
+        closes = df['close'].to_numpy(dtype=float)
+        volumes = df['volume'].to_numpy(dtype=float)
+        for i in range(start, len(df) - 1):
+            self.push(closes[i], volumes[i])
+        if len(df) > 1: self.last_ts = index[-2]
+
+        # 最新一根: 只预览
+        return self.snapshot(closes[-1], volumes[-1])
+
+    def snapshot(self, close, volume):
+        """以 (close, volume) 作为最新一根 K 线计算指标快照，不改内部状态"""
+        ema, rsi, macd = self.ema.peek(close), self.rsi.peek(close), self.macd.peek(close)
+        rsi_seq = list(self.rsi_tail) + [rsi]
+        macd_seq = list(self.macd_tail) + [macd[0]]
+        if ema is None or None in rsi_seq or None in macd_seq or len(rsi_seq) < self.tail:
+            return None
+
+        return {
+            "close": close,
+            "ema": ema,
+            "sma": self.sma.peek(close),
+            "rsi": rsi,
+            "macd": macd[0],
+            "macd_signal": macd[1],
+            "macd_hist": macd[2],
+            "vol_ma": self.vol.peek(volume),
+            "rsi_seq": rsi_seq,
+            "macd_seq": macd_seq,
+        }
+
+
+# ==========================================
+# 🧮 向量化版本 (整段历史一次算完，结果与流式引擎逐根提交一致)
+# ==========================================
+
+def ema_series(close, length):
+    """SMA 种子 + ewm(adjust=False)，前 length-1 根为 NaN"""
+    s = pd.Series(np.asarray(close, dtype=float))
+    if len(s) < length: return np.full(len(s), np.nan)
+    seeded = s.copy()
+    seeded.iloc[:length - 1] = np.nan
+    seeded.iloc[length - 1] = s.iloc[:length].mean()
+    return seeded.ewm(span=length, adjust=False).mean().to_numpy()
+
+
+def rsi_series(close, length=14):
+    """Wilder RSI，预热期和完全横盘处为 NaN"""
+    diff = pd.Series(np.asarray(close, dtype=float)).diff()
+    gain = diff.clip(lower=0).ewm(alpha=1.0 / length, adjust=True, min_periods=length).mean()
+    loss = (-diff).clip(lower=0).ewm(alpha=1.0 / length, adjust=True, min_periods=length).mean()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (100.0 * gain / (gain + loss)).to_numpy()
+
+
+def macd_series(close, fast=12, slow=26, signal=9):
+    """返回 (macd, signal, hist) 三列 ndarray"""
+    macd = ema_series(close, fast) - ema_series(close, slow)
+    valid = ~np.isnan(macd)
+    sig = np.full(len(macd), np.nan)
+    if valid.any():
+        sig[valid] = ema_series(macd[valid], signal)
+    return macd, sig, macd - sig
@@ -0,0 +1,165 @@
+# inference.py
+"""
+🚦 异步推理调度：所有 Ollama 请求都进同一个 asyncio 事件循环 (后台线程)
+- 优先级队列：止损复查 > 已有持仓 > 新开仓扫描，显卡忙的时候重要的先跑
+- 每个 Ollama 地址单独限并发 (OLLAMA_ENDPOINTS)，不同模型可以路由到不同地址 (AI_MODEL_ENDPOINTS)
+- 流式解析沿用 ollama_client.StreamState (思考回调 + 拿到完整 JSON 早停)；关掉流式 (stream=False) 也走同一个队列
+
+策略线程池照常同步调用 generate()，内部转成 Future 排队等结果
+本地调试可以连 fake_ollama.py
+"""
+import asyncio
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import Future
+
+import aiohttp
+
+import config
+from ai_parser import THINK_CLOSE, THINK_OPEN
+from ollama_client import StreamState
+
+# 优先级 (数字越小越先跑)
+PRIORITY_STOP = 0   # 持仓亏损已过半个止损线，优先复查
+PRIORITY_HELD = 1   # 已有持仓
+PRIORITY_ENTRY = 2  # 空仓，找新开仓机会
+
+
+def priority_for(qty, price, avg):
+    if qty > 0 and avg > 0:
+        if (price - avg) / avg < config.HARD_STOP_PCT / 2: return PRIORITY_STOP
+        return PRIORITY_HELD
+    return PRIORITY_ENTRY
+
+
+class InferenceClient:
+    def __init__(self, endpoints=None, model_endpoints=None, timeout=None):
+        self.endpoints = dict(endpoints or config.OLLAMA_ENDPOINTS)   # {url: 最大并发}
+        self.model_endpoints = dict(config.AI_MODEL_ENDPOINTS if model_endpoints is None else model_endpoints)
+        self.timeout = timeout or config.AI_REQUEST_TIMEOUT
+
+        self._seq = itertools.count()  # 同优先级先来先跑
+        self._queues = {}              # {url: asyncio.PriorityQueue}
+        self._loop = None
+        self._session = None
+        self._started = False
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    # ================= 对外接口 (任意线程) =================
+
+    def endpoint_for(self, model):
+        return self.model_endpoints.get(model, config.OLLAMA_URL)
+
+    def submit(self, payload, priority=PRIORITY_ENTRY, on_think=None, stop_when=None, early_stop=True, stream=True):
+        """
+        排队一次推理，返回 concurrent.futures.Future (结果格式同 OllamaClient.generate)
+        stream=False: 一次性拿完整回复 (没有思考回调 / 早停)，排队和限并发照旧
+        """
+        self.start()
+        future = Future()
+        job = (payload, on_think, stop_when, early_stop, stream, future, time.time())
+        url = self.endpoint_for(payload['model'])
+        self._loop.call_soon_threadsafe(self._enqueue, url, (priority, next(self._seq), job))
+        return future
+
+    def generate(self, payload, on_think=None, stop_when=None, early_stop=True, priority=PRIORITY_ENTRY, stream=True):
+        """同步等待结果；排队 + 推理总共超过 3 倍单次超时就放弃 (还在排队的直接撤掉)"""
+        future = self.submit(payload, priority, on_think, stop_when, early_stop, stream)
+        try:
+            return future.result(timeout=self.timeout * 3)
+        except Exception:
+            future.cancel()
+            raise
+
+    def pending(self):
+        """各地址排队中的请求数"""
+        return {url: q.qsize() for url, q in self._queues.items()}
+
+    def start(self):
+        with self._lock:
+            if not self._started:
+                self._started = True
+                threading.Thread(target=self._run, daemon=True, name="inference").start()
+        self._ready.wait()  # 别的线程刚启动事件循环时也要等它就绪，否则 _loop 还是 None
+
+    # ================= 事件循环 (后台线程) =================
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._setup())
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _setup(self):
+        # sock_read: 两个 chunk 之间最多等多久 (R1 开始生成前要先评估完 prompt)
+        self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None, sock_read=self.timeout))
+        for url, limit in self.endpoints.items():
+            self._add_endpoint(url, limit)
+
+    def _add_endpoint(self, url, limit):
+        queue = asyncio.PriorityQueue()
+        self._queues[url] = queue
+        for _ in range(max(1, limit)):
+            self._loop.create_task(self._worker(url, queue))
+        return queue
+
+    def _enqueue(self, url, item):
+        queue = self._queues.get(url) or self._add_endpoint(url, 1)  # 没配置的地址按并发 1 处理
+        queue.put_nowait(item)
+
+    async def _worker(self, url, queue):
+        while True:
+            priority, _, (payload, on_think, stop_when, early_stop, stream, future, queued_at) = await queue.get()
+            if not future.set_running_or_notify_cancel(): continue  # 调用方已经放弃
+            try:
+                if stream: out = await self._generate(url, payload, on_think, stop_when, early_stop)
+                else: out = await self._generate_once(url, payload)
+                out['queue_wait'] = out.pop('started') - queued_at
+                future.set_result(out)
+            except Exception as e:
+                future.set_exception(e)
+
+    async def _generate_once(self, url, payload):
+        """非流式：一次拿到完整回复和服务端统计"""
+        t0 = time.time()
+        async with self._session.post(url, json=dict(payload, stream=False)) as resp:
+            text = await resp.text()
+        body = json.loads(text) if resp.status == 200 else {}
+        raw = body.get('response', text)
+        if body.get('thinking'): raw = f"{THINK_OPEN}{body['thinking']}{THINK_CLOSE}{raw}"  # 新版 Ollama 思考单独一个字段
+        return {"status": resp.status, "raw": raw, "result": None, "early_stop": False, "stats": body,
+                "ttft": None, "tokens": None, "elapsed": time.time() - t0, "started": t0}
+
+    async def _generate(self, url, payload, on_think, stop_when, early_stop):
+        state = StreamState(on_think, stop_when)
+        t0 = time.time()
+        ttft = None
+        stopped = False
+        tokens = 0
+        async with self._session.post(url, json=dict(payload, stream=True)) as resp:
+            if resp.status != 200:
+                return {"status": resp.status, "raw": await resp.text(), "result": None, "early_stop": False,
+                        "stats": {}, "ttft": None, "tokens": 0, "elapsed": time.time() - t0, "started": t0}
+            buffer = b""
+            # 自己按行切：最后一个 chunk 带 context 数组，可能超过 aiohttp 按行读取的长度上限
+            async for data in resp.content.iter_any():
+                buffer += data
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    if not line.strip(): continue
+                    chunk = json.loads(line)
+                    if chunk.get('error'): raise RuntimeError(f"Ollama: {chunk['error']}")
+                    if chunk.get('response') or chunk.get('thinking'):
+                        tokens += 1
+                        if ttft is None: ttft = time.time() - t0
+                    if (state.feed(chunk) and early_stop) or state.done:
+                        stopped = not state.done
+                        break
+                if state.done or stopped: break
+            if stopped: resp.close()  # 断开连接 -> Ollama 停止生成
+        return {"status": 200, "raw": state.raw, "result": state.result, "early_stop": stopped,
+                "stats": state.stats, "ttft": ttft, "tokens": tokens, "elapsed": time.time() - t0, "started": t0}
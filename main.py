@@ -1,161 +1,59 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
-import threading
+import argparse
+from collections import deque
 import time
 import datetime
 import json
-import numpy as np
 import os
-import pandas as pd
-import mplfinance as mpf
-
-
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk 
 
 import config
 # ...
 
 import config
-from backend import AlpacaBackend
-from ai_agent import DeepSeekAgent
+from chart_view import ChartView
+from ui_dispatch import UIDispatcher
 
 CONFIG_FILE = "settings.json"
-TRADES_FILE = "trade_history.json"
 
 class QuantGUI:
-    def __init__(self, root):
+    def __init__(self, root, engine):
+        """
+        engine: 进程内的 engine.TradingEngine，或连到单独引擎进程的 engine_client.RemoteEngine
+        界面只负责显示和按钮，行情监控 / AI 策略都在引擎里跑
+        """
         self.root = root
         self.root.title("DeepStock V2 - 高频监控 & 深度决策")
         self.root.geometry("1400x900")
         
-        self.backend = AlpacaBackend()
-        self.ai = DeepSeekAgent()
-        
-        self.running = False
-        self.symbols_list = []
-        self.last_buy_time = {} 
-        self.trade_markers = self.load_trade_history()
+        self.engine = engine
         self.current_chart_symbol = None
-
-        self.last_data_len = 0
-        self.agent_memory = {}
-        
-        # 共享数据缓存，用于UI和后台线程通信
-        self.market_cache = {} # {symbol: {'price': 0, 'pl': 0, 'qty': 0, 'status': '等待'}}
+        self.chart = None  # 常驻 K 线视图 (第一次打开图表时创建)
+        self.chart_feed = engine.make_chart_feed()  # 后台准备绘图数据
+        self.ui_lag = deque(maxlen=3000)  # Tk 事件循环延迟样本 (秒)
+        self._tick_due = None
 
         self.setup_ui()
+        # 表格 / 日志的批量刷新 (引擎线程只做标记，ui_tick 每帧统一刷新)
+        self.ui = UIDispatcher(self.update_ui_safe, {"sys": self.txt_sys, "ai": self.txt_ai})
+        self.engine.subscribe(self.on_engine_event)
         self.load_settings()
-
-    def load_trade_history(self):
-        if os.path.exists(TRADES_FILE):
-            try:
-                with open(TRADES_FILE, "r") as f: return json.load(f)
-            except: return {}
-        return {}
-
-    # 替换原来的 record_trade 函数
-    def record_trade(self, symbol, action, price):
-        if symbol not in self.trade_markers: self.trade_markers[symbol] = []
-        
-        # 🔥 关键修改：强制使用 UTC 时间保存
-        # 这样才能和 Alpaca 的 K 线数据完美对齐
-        utc_now = datetime.datetime.now(datetime.timezone.utc).isoformat()
-        
-        self.trade_markers[symbol].append({
-            "time": utc_now,
-            "action": action,
-            "price": price
-        })
-        try:
-            with open(TRADES_FILE, "w") as f: json.dump(self.trade_markers, f)
-        except Exception as e:
-            print(f"Save Trade Error: {e}")
-
-    # 替换原来的 plot_chart 函数
-    def plot_chart(self, symbol):
-        for widget in self.tab_chart.winfo_children(): widget.destroy()
-        
-        tf = self.combo_tf.get()
-        df = self.backend.get_chart_data(symbol, tf)
-        if df is None or df.empty:
-            ttk.Label(self.tab_chart, text="无法获取K线数据").pack(expand=True)
-            return
-
-        # 确保 df 的索引是 UTC 时间 (防止时区混乱)
-        if df.index.tz is None:
-            df.index = df.index.tz_localize('UTC')
-        else:
-            df.index = df.index.tz_convert('UTC')
-
-        add_plots = []
-        
-        # --- 绘制买卖标记 ---
-        if symbol in self.trade_markers:
-            history = self.trade_markers[symbol]
-            buys = [float('nan')] * len(df)
-            sells = [float('nan')] * len(df)
-            
-            for trade in history:
-                try:
-                    # 解析保存的时间
-                    t_time = pd.to_datetime(trade['time'])
-                    
-                    # 如果保存的时间没有时区，强制设为 UTC
-                    if t_time.tz is None:
-                        t_time = t_time.tz_localize('UTC')
-                    else:
-                        t_time = t_time.tz_convert('UTC')
-                    
-                    # 🔥 智能过滤：只绘制在当前 K 线时间范围内的点
-                    # 以前的代码因为试图画超出范围的点而出错，导致整个图没标记
-                    if t_time < df.index[0] or t_time > df.index[-1]:
-                        continue
-                        
-                    # 找到最近的时间点
-                    idx = df.index.get_indexer([t_time], method='nearest')[0]
-                    
-                    # 设置标记位置 (Buy在最低价下方，Sell在最高价上方)
-                    if trade['action'] == 'BUY': 
-                        buys[idx] = df.iloc[idx]['low'] * 0.99 
-                    elif trade['action'] == 'SELL': 
-                        sells[idx] = df.iloc[idx]['high'] * 1.01
-                except Exception as e: 
-                    print(f"Marker logic error: {e}")
-            
-            # 添加到图表中
-            # 只有当数组里真的有数据时才添加，防止空数组报错
-            if not pd.isna(buys).all():
-                add_plots.append(mpf.make_addplot(buys, type='scatter', markersize=100, marker='^', color='g'))
-            if not pd.isna(sells).all():
-                add_plots.append(mpf.make_addplot(sells, type='scatter', markersize=100, marker='v', color='r'))
-
-        # --- 绘制持仓成本线 ---
-        qty, pl, avg = self.backend.get_position(symbol)
-        hlines_dict = dict()
-        title_extra = ""
-        if qty > 0:
-            hlines_dict = dict(hlines=[avg], colors=['blue'], linestyle='-.')
-            title_extra = f" | Holding {qty} @ ${avg:.2f}"
-
-        try:
-            s = mpf.make_mpf_style(marketcolors=mpf.make_marketcolors(up='green', down='red', inherit=True))
-            fig, ax = mpf.plot(
-                df, 
-                type='candle', 
-                mav=(5,10), 
-                volume=True, 
-                style=s, 
-                addplot=add_plots, 
-                hlines=hlines_dict,
-                returnfig=True, 
-                figsize=(10,6), 
-                title=f"{symbol} ({tf}){title_extra}"
-            )
-            canvas = FigureCanvasTkAgg(fig, master=self.tab_chart)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-        except Exception as e:
-            ttk.Label(self.tab_chart, text=f"绘图错误: {e}").pack(expand=True)
+        self.sync_engine_state()
+        self.ui_tick()
+        self.root.after(config.DEFAULT_INTERVAL * 1000, self.report_ui_lag)
+
+    def on_engine_event(self, event):
+        """【引擎线程】日志进队列，表格行只做标记"""
+        if event['type'] == "row": self.ui.mark_dirty(event['symbol'])
+        else: self.ui.log(event['type'], event['text'], event['tag'])
+
+    def sync_engine_state(self):
+        """连到已经在运行的引擎时，恢复按钮和表格"""
+        state = self.engine.status()
+        if state['connected']: self.set_connected()
+        if state['running']:
+            self.btn_start.config(text="⏹ 停止")
+            self.init_tree(state['symbols'])
 
     def setup_ui(self):
         # --- UI 部分代码保持不变，直接复用原代码即可 ---
@@ -191,12 +89,14 @@ class QuantGUI:
         self.combo_tf = ttk.Combobox(row2, values=["1Min", "5Min", "15Min", "1Hour"], width=6)
         self.combo_tf.current(1)
         self.combo_tf.pack(side=tk.LEFT, padx=5)
+        self.combo_tf.bind("<<ComboboxSelected>>", self.on_tf_changed)
 
         self.btn_start = ttk.Button(row2, text="▶ 启动", state="disabled", command=self.toggle_trading)
         self.btn_start.pack(side=tk.RIGHT, padx=5)
 
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
 
         tab_table = ttk.Frame(self.notebook)
         self.notebook.add(tab_table, text="📊 实时监控")
@@ -232,6 +132,7 @@ class QuantGUI:
     def save_settings(self):
         data = {"api_key": self.entry_key.get(), "api_secret": self.entry_secret.get(), "symbols": self.entry_symbols.get(), "qty": self.entry_qty.get()}
         try:
+            data = dict(read_settings(), **data)  # 界面上没有的字段 (engine_token 等) 原样保留
             with open(CONFIG_FILE, "w") as f: json.dump(data, f)
         except: pass
 
@@ -246,31 +147,22 @@ class QuantGUI:
         except: pass
 
     def log_sys(self, msg, tag=None):
-        self.root.after(0, lambda: self._write_log(self.txt_sys, msg, tag))
-
-    def log_ai(self, symbol, thought, decision, reason):
-        msg = f"--- {symbol} ---\n[思考]\n{thought}\n[决定] {decision} | {reason}\n\n"
-        self.root.after(0, lambda: self._write_log(self.txt_ai, msg, None))
-
-    def _write_log(self, widget, msg, tag=None):
-        widget.config(state='normal')
+        """界面自己的日志 (引擎的日志通过 on_engine_event 进来)"""
         t = datetime.datetime.now().strftime("%H:%M:%S")
-        full_msg = f"[{t}] {msg}\n" if widget == self.txt_sys else msg
-        widget.insert(tk.END, full_msg, tag)
-        widget.see(tk.END)
-        widget.config(state='disabled')
+        self.ui.log("sys", f"[{t}] {msg}\n", tag)
 
     def connect_alpaca(self):
         key, secret = self.entry_key.get(), self.entry_secret.get()
         if not key or not secret: return messagebox.showerror("错误", "Key缺失")
-        success, msg = self.backend.connect(key, secret, config.BASE_URL)
+        success, msg = self.engine.connect(key, secret)  # 结果由引擎写进日志
         if success:
-            self.lbl_status.config(text="已连接", foreground="green")
-            self.btn_connect.config(state="disabled")
-            self.btn_start.config(state="normal")
-            self.log_sys(msg)
+            self.set_connected()
             self.save_settings()
-        else: self.log_sys(msg, "ERR")
+
+    def set_connected(self):
+        self.lbl_status.config(text="已连接", foreground="green")
+        self.btn_connect.config(state="disabled")
+        self.btn_start.config(state="normal")
 
     def on_tree_double_click(self, event):
         item = self.tree.selection()[0]
@@ -280,361 +172,100 @@ class QuantGUI:
 
     def plot_chart(self, symbol):
         """
-        [终极版] 绘图函数：
-        1. 样式回归：使用 annotate 绘制“棍子+圆圈+文字” (B/S)。
-        2. 定位修复：使用 Nearest 算法确保标记紧贴最近的 K 线。
-        3. 时区修复：统一使用无时区本地时间，彻底解决不显示问题。
+        [后台取数版] 绘图入口：
+        只登记要画的币种 / 周期，K 线、现价、持仓、成交标记都由 chart_feed 在后台线程准备好，
+        主线程在 ui_tick 里取到 payload 后交给 render_chart 渲染，网络请求不再卡住界面。
         """
-        # 0. 视图记忆
-        saved_xlim = None
-        saved_ylim = None
-        was_at_edge = False
-        
-        if symbol == self.current_chart_symbol and hasattr(self, 'ax_main'):
-            try:
-                saved_xlim = self.ax_main.get_xlim()
-                saved_ylim = self.ax_main.get_ylim()
-                # 检查是否在看最新的数据 (差值小于10根K线认为是在看最新)
-                if hasattr(self, 'last_data_len') and (self.last_data_len - saved_xlim[1] < 10):
-                    was_at_edge = True
-            except: pass
-
         self.current_chart_symbol = symbol
+        self.chart_feed.request(symbol, self.combo_tf.get())
 
-        # 1. 清理旧图表
-        for widget in self.tab_chart.winfo_children(): widget.destroy()
-        
-        # 2. 获取数据
-        tf_raw = self.combo_tf.get() 
-        df = self.backend.get_chart_data(symbol, tf_raw)
-        live_price = self.backend.get_latest_price_fast(symbol)
-
-        if df is None or df.empty:
-            ttk.Label(self.tab_chart, text="正在拉取数据...").pack(expand=True)
+    def render_chart(self, payload):
+        """
+        【主线程】只负责渲染：
+        1. 图表只建一次 (chart_view.ChartView)，定时刷新只更新 K 线 / 价格线 / 标记的数据，不再销毁重建。
+        2. 标记位置 / 时区转换已经在 chart_feed 里算好。
+        """
+        if payload['df'] is None:
+            # 还没有图表时显示提示，已有图表就保留上一次的画面
+            if self.chart is None:
+                for widget in self.tab_chart.winfo_children(): widget.destroy()
+                ttk.Label(self.tab_chart, text="正在拉取数据...").pack(expand=True)
             return
 
-        # ==========================================
-        # 🔥 核心逻辑：统一时间轴为【无时区的本地时间】
-        # ==========================================
-        # 1. 先确保 df 是 UTC
-        if df.index.tz is None: 
-            df.index = df.index.tz_localize('UTC')
-        else: 
-            df.index = df.index.tz_convert('UTC')
-        
-        # 2. 转为本地时间并剥离时区 (Naive Local)
-        my_timezone = datetime.datetime.now().astimezone().tzinfo
-        df.index = df.index.tz_convert(my_timezone).tz_localize(None)
-
-        # 3. 重新加载交易记录
-        self.trade_markers = self.load_trade_history()
-        
-        # 4. 绘图风格
-        mc = mpf.make_marketcolors(up='#2ebd85', down='#f6465d', edge='inherit', wick='inherit', volume='in')
-        s = mpf.make_mpf_style(base_mpf_style='nightclouds', marketcolors=mc)
-
-        # --- (A) 准备辅助线 (Hold均价 & 现价) ---
-        # 使用 hlines 绘制水平线
-        qty, pl, avg = self.backend.get_position(symbol)
-        
-        hlines_dict = None
-        hl_vals = []
-        hl_cols = []
-        
-        if qty > 0:
-            hl_vals.append(avg)
-            hl_cols.append('cyan') # 持仓均价线颜色
-        if live_price > 0:
-            hl_vals.append(live_price)
-            hl_cols.append('white') # 现价线颜色
-            
-        if hl_vals:
-            hlines_dict = dict(hlines=hl_vals, colors=hl_cols, linestyle='--', linewidths=1.0)
-
-        # --- (B) 准备标注数据 (不使用 addplot，改用列表暂存) ---
-        # 我们这里只计算位置，具体的画图放到 mpf.plot 之后
-        annotations = []
-        
-        if symbol in self.trade_markers:
-            history = self.trade_markers[symbol]
-            for trade in history:
-                try:
-                    # 1. 解析时间 -> UTC -> 本地 -> 无时区
-                    t_time = pd.to_datetime(trade['time'])
-                    if t_time.tz is None: t_time = t_time.tz_localize('UTC')
-                    else: t_time = t_time.tz_convert('UTC')
-                    
-                    t_naive = t_time.tz_convert(my_timezone).tz_localize(None)
-                    
-                    # 2. 过滤范围 (允许5分钟误差)
-                    if t_naive < df.index[0] or t_naive > df.index[-1] + pd.Timedelta(minutes=5):
-                        continue
-                        
-                    # 3. 🔥 寻找最近的 K 线索引 (整数坐标)
-                    # MPLFinance 的 X 轴本质上是 0, 1, 2... 的整数序列
-                    idx = df.index.get_indexer([t_naive], method='nearest')[0]
-                    
-                    # 4. 记录标注信息
-                    if trade['action'] == 'BUY':
-                        # 记录：(x坐标, y坐标(最低价), 类型)
-                        annotations.append({
-                            'x': idx, 
-                            'y': df.iloc[idx]['low'], 
-                            'type': 'BUY'
-                        })
-                    elif trade['action'] == 'SELL':
-                        # 记录：(x坐标, y坐标(最高价), 类型)
-                        annotations.append({
-                            'x': idx, 
-                            'y': df.iloc[idx]['high'], 
-                            'type': 'SELL'
-                        })
-                except Exception as e:
-                    pass
-
-        # 5. 配置绘图参数
-        plot_kwargs = dict(
-            type='candle', 
-            mav=(5, 20), 
-            volume=True, 
-            style=s, 
-            returnfig=True,
-            figsize=(12, 8), 
-            tight_layout=True, 
-            ylabel='Price ($)',
-            datetime_format='%m-%d %H:%M', 
-            xrotation=0
-            # 注意：这里不再使用 addplot 画买卖点
-        )
-
-        if hlines_dict:
-            plot_kwargs['hlines'] = hlines_dict
-
         try:
-            # 6. 生成图表
-            self.fig, self.axlist = mpf.plot(df, **plot_kwargs)
-            self.ax_main = self.axlist[0]
-
-            # 7. 🔥 核心：手动绘制 "棍子+圆圈+文字" 标注
-            for note in annotations:
-                if note['type'] == 'BUY':
-                    # 买入：绿色圆圈 B，位于 K 线下方，箭头向上指
-                    self.ax_main.annotate(
-                        'B', 
-                        xy=(note['x'], note['y']),          # 箭头尖端 (K线低点)
-                        xytext=(0, -25),                    # 文字位置 (向下偏移25点)
-                        textcoords='offset points', 
-                        color='white', 
-                        fontweight='bold', 
-                        ha='center', va='center',
-                        bbox=dict(boxstyle='circle', fc='#00b300', ec='none', alpha=0.9), # 绿色圆圈
-                        arrowprops=dict(arrowstyle='-', color='#00b300', lw=1.5)         # 绿色棍子
-                    )
-                elif note['type'] == 'SELL':
-                    # 卖出：红色圆圈 S，位于 K 线上方，箭头向下指
-                    self.ax_main.annotate(
-                        'S', 
-                        xy=(note['x'], note['y']),          # 箭头尖端 (K线高点)
-                        xytext=(0, 25),                     # 文字位置 (向上偏移25点)
-                        textcoords='offset points', 
-                        color='white', 
-                        fontweight='bold', 
-                        ha='center', va='center',
-                        bbox=dict(boxstyle='circle', fc='#ff3333', ec='none', alpha=0.9), # 红色圆圈
-                        arrowprops=dict(arrowstyle='-', color='#ff3333', lw=1.5)         # 红色棍子
-                    )
-
-            # --- HUD (左上角信息) ---
-            last_bar = df.iloc[-1]
-            t_str = last_bar.name.strftime('%Y-%m-%d %H:%M')
-            initial_text = (
-                f"{symbol} [{tf_raw}] {t_str}\n"
-                f"O: {last_bar['open']:.2f}  H: {last_bar['high']:.2f}\n"
-                f"L: {last_bar['low']:.2f}  C: {last_bar['close']:.2f}\n"
-                f"Vol: {float(last_bar['volume']):.4f}"
-            )
-            self.text_artist = self.ax_main.text(
-                0.02, 0.96, initial_text, 
-                transform=self.ax_main.transAxes, fontsize=10, color='white', verticalalignment='top',
-                bbox=dict(boxstyle='round', facecolor='black', alpha=0.7)
-            )
-            
-            # 8. 绑定交互
-            self.current_df = df
-            self.fig.canvas.mpl_connect('scroll_event', self.on_scroll)
-            self.fig.canvas.mpl_connect('button_press_event', self.on_press)
-            self.fig.canvas.mpl_connect('button_release_event', self.on_release)
-            self.fig.canvas.mpl_connect('motion_notify_event', self.on_drag_and_hover)
-            self.is_dragging = False
-            self.last_mouse_x = None
-
-            # 9. 显示
-            canvas = FigureCanvasTkAgg(self.fig, master=self.tab_chart)
-            canvas.draw()
-            canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
-
-            # 10. 恢复视角
-            if saved_xlim:
-                current_len = len(df)
-                view_width = saved_xlim[1] - saved_xlim[0]
-                if was_at_edge:
-                    self.ax_main.set_xlim(current_len - view_width, current_len)
-                else:
-                    self.ax_main.set_xlim(saved_xlim)
-            
-            self.last_data_len = len(df)
-            
+            # 第一次显示时创建常驻图表，之后原地更新
+            if self.chart is None:
+                for widget in self.tab_chart.winfo_children(): widget.destroy()
+                self.chart = ChartView(self.tab_chart)
+            self.chart.update(payload['symbol'], payload['timeframe'], payload['df'], payload['markers'], payload['hlines'])
         except Exception as e:
             print(f"Plot Error: {e}")
-            ttk.Label(self.tab_chart, text=f"绘图出错: {e}").pack(expand=True)
 
-    # ================= 交互事件处理函数 =================
+    def on_tab_changed(self, event):
+        # 只有正在看 "K线分析" 页面时才定时刷新图表，节省资源
+        self.chart_feed.set_active(self.notebook.index(self.notebook.select()) == 1)
 
-    def on_scroll(self, event):
-        """鼠标滚轮缩放"""
-        if event.inaxes != self.ax_main: return
-        x_min, x_max = self.ax_main.get_xlim()
-        scale_factor = 0.8 if event.button == 'up' else 1.2
-        range_width = x_max - x_min
-        
-        # 居中缩放计算
-        mouse_rel = (event.xdata - x_min) / range_width
-        new_range = range_width * scale_factor
-        
-        # 限制缩放极限
-        if new_range < 10: new_range = 10
-        if new_range > len(self.current_df): new_range = len(self.current_df)
-        
-        new_min = event.xdata - mouse_rel * new_range
-        new_max = new_min + new_range
-        
-        # 边界检查
-        if new_max > len(self.current_df):
-            new_max = len(self.current_df)
-            new_min = new_max - new_range
-        if new_min < 0:
-            new_min = 0
-            new_max = new_range
-            
-        self.ax_main.set_xlim(new_min, new_max)
-        self.fig.canvas.draw_idle()
-
-    def on_press(self, event):
-        if event.inaxes == self.ax_main and event.button == 1:
-            self.is_dragging = True
-            self.last_mouse_x = event.xdata
-
-    def on_release(self, event):
-        self.is_dragging = False
-        self.last_mouse_x = None
-
-    def on_drag_and_hover(self, event):
-        if not hasattr(self, 'current_df') or self.current_df is None: return
-        if event.inaxes != self.ax_main: return
-
-        # 1. 拖拽平移
-        if self.is_dragging and self.last_mouse_x is not None and event.xdata is not None:
-            dx = event.xdata - self.last_mouse_x
-            x_min, x_max = self.ax_main.get_xlim()
-            new_min, new_max = x_min - dx, x_max - dx
-            
-            # 边界检查
-            if new_max > len(self.current_df):
-                diff = new_max - len(self.current_df)
-                new_max -= diff
-                new_min -= diff
-            if new_min < 0:
-                diff = 0 - new_min
-                new_min += diff
-                new_max += diff
-                
-            self.ax_main.set_xlim(new_min, new_max)
-            self.fig.canvas.draw_idle()
-            return
+    def on_tf_changed(self, event):
+        if self.current_chart_symbol: self.plot_chart(self.current_chart_symbol)
 
-        # 2. 悬停 HUD 信息
+    def ui_tick(self):
+        """
+        【主线程心跳】每 UI_TICK_MS 毫秒一次 (固定帧率)：
+        1. 测量 Tk 事件循环延迟 (实际触发时间 - 预定时间)，主线程被阻塞多久就会晚多久
+        2. 批量刷新这一帧里被标记的表格行 + 积攒的日志
+        3. 取后台准备好的图表数据渲染
+        """
+        now = time.perf_counter()
+        if self._tick_due is not None: self.ui_lag.append(max(0.0, now - self._tick_due))
         try:
-            x_idx = int(round(event.xdata))
-            if 0 <= x_idx < len(self.current_df):
-                bar = self.current_df.iloc[x_idx]
-                info = (f"{self.current_chart_symbol} {bar.name.strftime('%H:%M')}\n"
-                        f"O:{bar['open']:.2f} H:{bar['high']:.2f}\n"
-                        f"L:{bar['low']:.2f} C:{bar['close']:.2f}\n"
-                        f"V:{float(bar['volume']):.4f}")
-                self.text_artist.set_text(info)
-                self.fig.canvas.draw_idle()
-        except: pass
+            self.ui.flush()
+        except Exception as e:
+            print(f"UI Flush Error: {e}")
+        payload = self.chart_feed.latest()
+        if payload: self.render_chart(payload)
+        self._tick_due = time.perf_counter() + config.UI_TICK_MS / 1000
+        self.root.after(config.UI_TICK_MS, self.ui_tick)
+
+    def drain_ui_lag(self):
+        """取走上次调用以来的事件循环延迟样本 (秒)"""
+        samples = []
+        while self.ui_lag: samples.append(self.ui_lag.popleft())
+        return samples
+
+    def report_ui_lag(self):
+        """每个策略周期报告一次界面延迟 (策略循环在引擎里，这里单独定时)"""
+        lag = self.drain_ui_lag()
+        if lag:
+            self.log_sys(f"🖥️ 界面延迟: 平均 {sum(lag) / len(lag) * 1000:.0f}ms | 最大 {max(lag) * 1000:.0f}ms ({len(lag)} 次心跳)")
+        self.root.after(config.DEFAULT_INTERVAL * 1000, self.report_ui_lag)
 
-    def on_mouse_move(self, event):
-        """鼠标移动时更新左上角数据"""
-        if not hasattr(self, 'current_df') or self.current_df is None: return
-        
-        # 检查鼠标是否在K线图区域内
-        if event.inaxes == self.axlist[0]:
-            try:
-                # 获取鼠标所在的 K 线索引 (X轴坐标)
-                x_index = int(round(event.xdata))
-                
-                # 边界检查
-                if 0 <= x_index < len(self.current_df):
-                    # 获取该根 K 线的数据
-                    bar = self.current_df.iloc[x_index]
-                    t_str = bar.name.strftime('%Y-%m-%d %H:%M')
-                    
-                    # 更新文字内容
-                    info_text = (
-                        f"{self.current_chart_symbol}  {t_str}\n"
-                        f"O: {bar['open']:.2f}  H: {bar['high']:.2f}\n"
-                        f"L: {bar['low']:.2f}  C: {bar['close']:.2f}\n"
-                        f"Vol: {float(bar['volume']):.4f}"  # 👈 修改这里：同样改为 float 保留小数
-                    )                   
-                    self.text_artist.set_text(info_text)
-                    
-                    # 快速重绘 (只更新变动部分)
-                    self.fig.canvas.draw_idle()
-            except: pass
     # ================= 核心修改区域 =================
 
     def toggle_trading(self):
-        if not self.running:
+        if not self.engine.running:
             self.save_settings()
-            raw = self.entry_symbols.get()
-            self.symbols_list = [s.strip().upper() for s in raw.split(',') if s.strip()]
-            if not self.symbols_list: return messagebox.showerror("错误", "交易对为空")
-            
-            self.running = True
-            # 🔥 新增：初始化系统状态计数器 (配合 Alpha Arena 逻辑)
-            self.start_time = time.time()  # 记录启动时间戳
-            self.loop_counter = 0
-            self.agent_memory = {}          # 重置循环次数
+            success, msg = self.engine.start(self.entry_symbols.get().split(','))
+            if not success: return messagebox.showerror("错误", msg)
             self.btn_start.config(text="⏹ 停止")
-            
-            # 初始化 Treeview 和 缓存
-            for item in self.tree.get_children(): self.tree.delete(item)
-            for sym in self.symbols_list: 
-                self.tree.insert("", "end", iid=sym, values=(sym, "...", "0", "0", "0", "等待", "--"))
-                self.market_cache[sym] = {'price': 0, 'qty': 0, 'avg': 0, 'pl': 0, 'status': '初始化'}
-
-            self.log_sys(f"🚀 启动双线程系统: {self.symbols_list}")
-            
-            # 🧵 线程 1: 极速行情刷新 (每 1 秒)
-            threading.Thread(target=self.monitor_prices_loop, daemon=True).start()
-            
-            # 🧵 线程 2: AI 策略分析 (每 60 秒)
-            threading.Thread(target=self.strategy_loop, daemon=True).start()
+            self.init_tree(self.engine.symbols_list)
         else:
-            self.running = False
+            self.engine.stop()
             self.btn_start.config(text="▶ 启动")
-            self.log_sys("🛑 停止中...")
+
+    def init_tree(self, symbols):
+        # 初始化 Treeview
+        for item in self.tree.get_children(): self.tree.delete(item)
+        for sym in symbols:
+            self.tree.insert("", "end", iid=sym, values=(sym, "...", "0", "0", "0", "等待", "--"))
 
     def update_ui_safe(self, symbol):
-        """线程安全的 UI 更新函数"""
-        if not self.running or symbol not in self.market_cache: return
-        data = self.market_cache[symbol]
+        """【主线程】刷新一行表格 (数据和冷却倒计时来自引擎)"""
+        if not self.engine.running: return
+        data = self.engine.row(symbol)
+        if data is None: return
         
         # 计算冷却倒计时显示
-        last = self.last_buy_time.get(symbol, 0)
-        rem = max(0, 300 - (time.time() - last))
+        rem = data['cooldown']
         cd_text = f"{int(rem)}s" if rem > 0 else "就绪"
 
         if self.tree.exists(symbol):
@@ -648,204 +279,26 @@ class QuantGUI:
                 cd_text
             ))
 
-    def monitor_prices_loop(self):
-        """
-        【线程1】轻量级高频循环 (每 1 秒)
-        任务：
-        1. 快速轮询最新成交价 (HTTP/Websocket)
-        2. 更新 UI 表格 (浮动盈亏、现价)
-        3. 定时触发 K 线图刷新 (不阻塞主线程)
-        """
-        tick_count = 0
-        
-        while self.running:
-            # --- 任务 A: 快速更新所有币种价格 ---
-            for symbol in self.symbols_list:
-                if not self.running: break
-                try:
-                    # 使用极速通道获取价格
-                    price = self.backend.get_latest_price_fast(symbol)
-                    
-                    if price > 0:
-                        # 更新共享缓存 (Thread-Safe)
-                        if symbol in self.market_cache:
-                            cache = self.market_cache[symbol]
-                            cache['price'] = price
-                            
-                            # 实时计算浮动盈亏 (PnL)
-                            if cache['qty'] > 0:
-                                cache['pl'] = (price - cache['avg']) * cache['qty']
-                            
-                            # 提交 UI 更新任务到主线程
-                            self.root.after(0, lambda s=symbol: self.update_ui_safe(s))
-                            
-                except Exception as e:
-                    print(f"[{symbol}] Price Monitor Error: {e}")
-
-            # --- 任务 B: 自动刷新 K 线图 (每 5 秒一次) ---
-            # 只有当用户正在查看 "K线分析" 页面时才刷新，节省资源
-            try:
-                # 获取当前选中的 Tab 索引 (0=列表, 1=图表)
-                # 注意：跨线程访问 GUI 属性需要小心，这里用 try-catch 兜底
-                current_tab = self.notebook.index(self.notebook.select())
-                
-                if current_tab == 1 and self.current_chart_symbol:
-                    tick_count += 1
-                    if tick_count >= 5: # 5秒阈值
-                        # 使用 lambda 传参，确保在主线程执行绘图
-                        self.root.after(0, lambda: self.plot_chart(self.current_chart_symbol))
-                        tick_count = 0
-            except:
-                pass # 比如刚启动时 tab 可能未准备好
-
-            # 休眠 1 秒
-            time.sleep(1.0)
-
-    def strategy_loop(self):
-        """
-        【线程2】决策循环 (集成：宏观视角 + AI 记忆 + 硬性风控)
-        """
-        while self.running:
-            self.log_sys("🔍 AI 正在构建环境感知...", "WARN")
-            self.loop_counter += 1
-            run_minutes = int((time.time() - self.start_time) / 60)
-            
-            # 构建系统状态
-            system_state = {"run_time_min": run_minutes, "loop_count": self.loop_counter}
-            
-            # 获取资金
-            available_cash, total_equity = self.backend.get_account_info()
-            self.log_sys(f"⏳ 第 {self.loop_counter} 轮 | 运行 {run_minutes}m | 现金: ${available_cash:,.2f}")
-
-            for symbol in self.symbols_list:
-                if not self.running: break
-                
-                try:
-                    self.market_cache[symbol]['status'] = "🧠 思考中..."
-                    self.root.after(0, lambda s=symbol: self.update_ui_safe(s))
-
-                    # 1. 获取数据 (包含 Macro 上帝视角)
-                    price, report = self.backend.get_analysis_data(symbol)
-                    if price <= 0: continue
-                    
-                    # 2. 获取持仓
-                    qty, pl, avg = self.backend.get_position(symbol)
-                    self.market_cache[symbol].update({'qty': qty, 'avg': avg})
-
-                    # ==========================================
-                    # 🛡️ 灵感三：硬性风控 (Hard Guardrails)
-                    # ==========================================
-                    
-                    # [风控 A] 冷却时间：买入后 5 分钟内禁止 AI 再次操作
-                    # 防止 AI 在高位买了之后，稍微回调一点又想卖，或者买了又买
-                    last_op = self.last_buy_time.get(symbol, 0)
-                    time_since_buy = time.time() - last_op
-                    
-                    if time_since_buy < 300: # 300秒 = 5分钟
-                        remaining = int(300 - time_since_buy)
-                        self.log_sys(f"[{symbol}] ❄️ 交易冷却中 (剩余 {remaining}s)，跳过 AI", "WARN")
-                        self.market_cache[symbol]['status'] = f"冷却 {remaining}s"
-                        self.root.after(0, lambda s=symbol: self.update_ui_safe(s))
-                        continue # 直接跳过本次循环，不问 AI
-
-                    # [风控 B] 熔断止损：如果单币种亏损超过 5%，强制清仓，不问 AI
-                    # 只有持仓价值大于 $50 才触发，防止碎股误触
-                    if qty > 0 and (qty * price > 50): 
-                        loss_pct = (price - avg) / avg
-                        if loss_pct < -0.05: # -5% 硬性止损线
-                            self.log_sys(f"[{symbol}] 🚨 触发硬性熔断 (当前亏损 {loss_pct*100:.2f}%)，强制清仓！", "SELL")
-                            
-                            success, msg = self.backend.close_full_position(symbol)
-                            if success:
-                                self.record_trade(symbol, 'STOP_LOSS', price)
-                                self.market_cache[symbol]['qty'] = 0
-                                # 强制清仓后，建议更新冷却时间，防止立刻买回
-                                self.last_buy_time[symbol] = time.time() 
-                            
-                            continue # 清仓后跳过本次循环
-
-                    # ==========================================
-                    # 🧠 AI 决策 (带记忆)
-                    # ==========================================
-
-                    # 获取上一轮记忆
-                    prev_memory = self.agent_memory.get(symbol, None)
-
-                    # 调用 AI
-                    action, amount_usd, reason, thought = self.ai.analyze(
-                        model_name="deepseek-r1:8b", 
-                        symbol=symbol, 
-                        price=price, 
-                        market_report=report, 
-                        qty=qty, 
-                        avg_price=avg, 
-                        cash=available_cash, 
-                        equity=total_equity, 
-                        system_state=system_state, 
-                        prev_memory=prev_memory  # <--- 传入记忆
-                    )
-                    
-                    # 更新记忆
-                    self.agent_memory[symbol] = {
-                        "action": action,
-                        "reason": reason,
-                        "timestamp": time.time()
-                    }
-
-                    # 日志与 UI
-                    decision_str = f"{action} ${amount_usd:,.2f}" if action != "HOLD" else "HOLD"
-                    self.log_ai(symbol, thought, decision_str, reason)
-                    self.market_cache[symbol]['status'] = action 
-                    self.root.after(0, lambda s=symbol: self.update_ui_safe(s))
-
-                    # ==========================================
-                    # ⚙️ 执行逻辑
-                    # ==========================================
-                    if action == "BUY":
-                        buy_usd = amount_usd
-                        if buy_usd > available_cash: buy_usd = available_cash
-                        
-                        # 只有当 AI 真的想买 (金额 > 10) 且有钱时才执行
-                        if buy_usd >= 10.0: 
-                            success, msg = self.backend.place_order(symbol, "buy", buy_usd, price)
-                            tag = "BUY" if success else "ERR"
-                            self.log_sys(f"[{symbol}] 买入 ${buy_usd:,.2f} : {msg}", tag)
-                            if success: 
-                                self.last_buy_time[symbol] = time.time() # 更新冷却计时器
-                                self.record_trade(symbol, 'BUY', price)
-                                available_cash -= buy_usd # 扣减本地记录的余额
-
-                    elif action == "SELL":
-                        sell_val_usd = amount_usd
-                        current_pos_val = qty * price
-                        
-                        if qty > 0 and sell_val_usd > 0:
-                            # 智能判断：卖出比例 > 98% 视为清仓
-                            is_full_exit = sell_val_usd >= (current_pos_val * 0.98)
-                            
-                            if is_full_exit:
-                                success, msg = self.backend.close_full_position(symbol)
-                                self.log_sys(f"[{symbol}] 🌊 清仓卖出: {msg}", "SELL")
-                            else:
-                                sell_qty = sell_val_usd / price
-                                success, msg = self.backend.submit_qty_order(symbol, "sell", sell_qty)
-                                self.log_sys(f"[{symbol}] 📉 减仓卖出 ${sell_val_usd:.2f}: {msg}", "SELL")
-                            
-                            if success:
-                                self.record_trade(symbol, 'SELL', price)
-                                if is_full_exit: self.market_cache[symbol]['qty'] = 0
-
-                except Exception as e:
-                    self.log_sys(f"Strategy Error [{symbol}]: {e}", "ERR")
-            
-            self.log_sys(f"⏳ 本轮结束，系统休眠 60 秒...", "WARN")
-            for _ in range(60):
-                if not self.running: break
-                time.sleep(1)
+def read_settings():
+    if not os.path.exists(CONFIG_FILE): return {}
+    with open(CONFIG_FILE, "r") as f: return json.load(f)
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DeepStock GUI")
+    parser.add_argument("--attach", metavar="URL", help="连到单独运行的引擎 (python engine.py)，例如 http://127.0.0.1:8770；不填则在本进程内运行引擎")
+    parser.add_argument("--token", help="引擎的访问令牌，默认读 settings.json 的 engine_token")
+    args = parser.parse_args()
+
+    if args.attach:
+        from engine_client import RemoteEngine
+        engine = RemoteEngine(args.attach, args.token or read_settings().get("engine_token", ""))
+    else:
+        from engine import TradingEngine
+        engine = TradingEngine()
+
     root = tk.Tk()
-    app = QuantGUI(root)
+    app = QuantGUI(root, engine)
     root.mainloop()
 
 
@@ -0,0 +1,237 @@
+# market_hub.py
+"""
+📡 行情中心 (多进程分片用)：一个进程统一拉行情，所有分片共用
+- 只有这里连 Alpaca 行情推送 + 兜底轮询，最新价每 HUB_PUBLISH_SECONDS 秒推给订阅的分片
+- K 线 (分析用的 1Min / 日线、图表) 走这里的缓存 + 本地 K 线仓库，HUB_BARS_TTL 秒内的重复请求不再打 API
+  N 个分片同一轮要同一批 K 线，只向 Alpaca 拉一次；K 线仓库也只有这一个进程在写
+- 进程间用 multiprocessing.connection (本地 socket + authkey)，消息是 pickle 后的 dict / DataFrame
+
+分片这边用 HubClient：
+    backend.feed = HubClient(address, authkey)   # get_latest_prices / get_bars_cached 改走行情中心
+    HubClient 也有 start / stop / last_price，引擎直接把它当作行情推送 (MarketStream) 用
+"""
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+import config
+from market_stream import MarketStream
+
+
+class MarketHub:
+    def __init__(self, backend, address, authkey, symbols=()):
+        """
+        backend: 已连接的 AlpacaBackend (行情用的账户)
+        symbols: 一开始就订阅推送的币种 (所有分片的并集)；之后新订阅的币种走轮询
+        """
+        self.backend = backend
+        self.listener = Listener(address, authkey=authkey)
+        self.symbols = set(symbols)
+        self.subscribers = []  # [(conn, {symbol})] 推送通道
+        self.stream = None
+        self.prices = {}       # {symbol: price}
+        self._fresh = {}       # {(symbol, tf_key): 上次向 API 刷新的时间}
+        self._inflight = {}    # {(symbol, tf_key): Event} 正在向 API 拉取的 K 线，拉完 set()
+        self._bars_lock = threading.Lock()
+        self._sub_lock = threading.Lock()
+        self.stats = {'bar_requests': 0, 'bar_fetches': 0}
+
+    def run(self):
+        """阻塞运行：行情推送 + 定时发布 + 接受分片连接"""
+        if config.USE_STREAM and self.symbols:
+            key, secret = self.backend.credentials
+            self.stream = MarketStream(key, secret, on_trade=self.on_trade, on_bar=self.backend.on_stream_bar)
+            self.stream.start(sorted(self.symbols))
+        threading.Thread(target=self.publish_loop, daemon=True, name="hub-publish").start()
+        print(f"📡 行情中心已启动: {self.listener.address} {sorted(self.symbols)}")
+        while True:
+            try:
+                conn = self.listener.accept()
+            except Exception as e:  # authkey 不对 / 握手中断，不影响其他分片
+                print(f"Hub Accept Error: {e}")
+                continue
+            threading.Thread(target=self.handle, args=(conn,), daemon=True, name="hub-conn").start()
+
+    def on_trade(self, symbol, price):
+        self.prices[symbol] = price
+
+    # ================= 发布 =================
+
+    def publish_loop(self):
+        while True:
+            with self._sub_lock:
+                symbols = list(self.symbols)
+                subs = list(self.subscribers)
+            try:
+                # 推送失效的币种一次批量 HTTP 轮询补上 (所有分片合起来只请求这一次)
+                polled = [s for s in symbols
+                          if not (self.stream and self.stream.last_price(s, config.STREAM_STALE_SECONDS) is not None)]
+                if polled: self.prices.update(self.backend.get_latest_prices(polled))
+            except Exception as e:
+                print(f"Hub Price Error: {e}")
+
+            for conn, wanted in subs:
+                try:
+                    conn.send(("prices", {s: self.prices[s] for s in wanted if s in self.prices}))
+                except (OSError, EOFError, ValueError):
+                    self._drop(conn)
+            time.sleep(config.HUB_PUBLISH_SECONDS)
+
+    def _drop(self, conn):
+        with self._sub_lock:
+            self.subscribers = [(c, s) for c, s in self.subscribers if c is not conn]
+        conn.close()
+
+    # ================= 请求 =================
+
+    def handle(self, conn):
+        """
+        一个连接一个通道：
+        ("subscribe", [symbols])   之后这个连接只用来推送 ("prices", {symbol: price})
+        ("bars", [symbols], tf)    -> {symbol: df}
+        ("prices", [symbols])      -> {symbol: price}
+        """
+        try:
+            while True:
+                msg = conn.recv()
+                if msg[0] == "subscribe":
+                    with self._sub_lock:
+                        self.symbols.update(msg[1])
+                        self.subscribers.append((conn, set(msg[1])))
+                    return
+                elif msg[0] == "bars":
+                    conn.send(self.get_bars(msg[1], msg[2]))
+                elif msg[0] == "prices":
+                    conn.send(self.latest_prices(msg[1]))
+                else:
+                    conn.send(None)
+        except (EOFError, OSError):
+            conn.close()
+        except Exception as e:
+            print(f"Hub Request Error: {e}")
+            conn.close()
+
+    def get_bars(self, symbols, tf_key):
+        """
+        HUB_BARS_TTL 秒内刷新过的币种直接读缓存，其余的一次批量增量拉取
+        锁只保护记账，网络请求在锁外：不同分片要不同的币种可以同时拉；别的分片正在拉的币种不重复请求，等它拉完
+        """
+        with self._bars_lock:
+            now = time.time()
+            self.stats['bar_requests'] += 1
+            waiting = {self._inflight[(s, tf_key)] for s in symbols if (s, tf_key) in self._inflight}
+            stale = [s for s in symbols if (s, tf_key) not in self._inflight
+                     and now - self._fresh.get((s, tf_key), 0) > config.HUB_BARS_TTL]
+            done = threading.Event()
+            for s in stale: self._inflight[(s, tf_key)] = done
+            if stale: self.stats['bar_fetches'] += 1
+
+        if stale:
+            try:
+                self.backend.get_bars_cached(stale, tf_key)
+                with self._bars_lock:
+                    for s in stale: self._fresh[(s, tf_key)] = now
+            except Exception as e:
+                print(f"Hub Bars Error [{tf_key}]: {e}")  # 拉取失败先返回缓存里已有的
+            finally:
+                with self._bars_lock:
+                    for s in stale: self._inflight.pop((s, tf_key), None)
+                done.set()
+        for event in waiting: event.wait(config.HUB_BARS_TTL)
+
+        frames = {}
+        for symbol in symbols:
+            df = self.backend.bar_cache.get(symbol, tf_key)
+            if df is not None and not df.empty: frames[symbol] = df
+        return frames
+
+    def latest_prices(self, symbols):
+        missing = [s for s in symbols if s not in self.prices]
+        if missing: self.prices.update(self.backend.get_latest_prices(missing))
+        return {s: self.prices[s] for s in symbols if s in self.prices}
+
+
+class HubClient:
+    """
+    🔌 分片进程里的行情中心客户端
+    - get_bars / latest_prices: 请求-应答 (一条连接，加锁串行)
+    - start / stop / last_price: 和 MarketStream 同样的接口，订阅行情中心的最新价推送
+    """
+    def __init__(self, address, authkey, on_trade=None):
+        self.address = address
+        self.authkey = authkey
+        self.on_trade = on_trade  # on_trade(symbol, price)
+        self.running = False
+        self.last_tick = {}       # {symbol: (price, time.time())}
+        self._conn = None
+        self._generation = 0      # 每次 start / stop 加一，旧的推送线程发现对不上就退出
+        self._lock = threading.Lock()
+
+    def _call(self, *msg):
+        with self._lock:
+            try:
+                if self._conn is None: self._conn = Client(self.address, authkey=self.authkey)
+                self._conn.send(msg)
+                return self._conn.recv()
+            except (OSError, EOFError):
+                self._conn = None  # 行情中心重启过，下次重连
+                raise
+
+    def get_bars(self, symbols, tf_key):
+        return self._call("bars", list(symbols), tf_key)
+
+    def latest_prices(self, symbols):
+        return self._call("prices", list(symbols))
+
+    def start(self, symbols):
+        if self.running: return
+        self.running = True
+        self._generation += 1
+        threading.Thread(target=self._listen, args=(list(symbols), self._generation), daemon=True, name="hub-client").start()
+
+    def stop(self):
+        # 推送线程收到下一条消息后自己关连接 (跨线程 close 会让 recv 崩掉)
+        # stop 之后马上 start 时旧线程可能还卡在 recv 里，靠 generation 让它醒来后直接退出
+        self.running = False
+        self._generation += 1
+
+    def last_price(self, symbol, max_age=None):
+        """最近一次推送的价格；超过 max_age 秒没更新视为失效，返回 None (调用方回退到轮询)"""
+        tick = self.last_tick.get(symbol)
+        if tick is None: return None
+        price, ts = tick
+        if max_age is not None and time.time() - ts > max_age: return None
+        return price
+
+    def _listen(self, symbols, generation):
+        alive = lambda: self.running and self._generation == generation
+        backoff = 1
+        while alive():
+            try:
+                with Client(self.address, authkey=self.authkey) as conn:
+                    conn.send(("subscribe", symbols))
+                    backoff = 1
+                    while alive():
+                        kind, prices = conn.recv()
+                        if not alive(): break
+                        now = time.time()
+                        for symbol, price in prices.items():
+                            self.last_tick[symbol] = (price, now)
+                            if self.on_trade: self.on_trade(symbol, price)
+            except (OSError, EOFError) as e:
+                if alive(): print(f"⚠️ 行情中心断开: {e}，{backoff}s 后重连")
+            if alive():
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+
+def wait_for_hub(address, authkey, timeout=30):
+    """等行情中心开始监听 (分片进程启动前调用)"""
+    deadline = time.time() + timeout
+    while True:
+        try:
+            Client(address, authkey=authkey).close()
+            return True
+        except OSError:
+            if time.time() > deadline: return False
+            time.sleep(0.2)
@@ -0,0 +1,137 @@
+# market_stream.py
+"""
+📡 Alpaca 实时行情推送 (WebSocket)：订阅 trades + 1分钟 bars，每个 tick 回调一次
+- Crypto 与股票是两条独立连接，各自断线重连 (指数退避)
+- 协议与 Alpaca 官方一致 (msgpack 帧)，本地调试可以连 fake_stream.py
+"""
+import asyncio
+import threading
+import time
+
+import msgpack
+import websockets
+
+import config
+
+# websockets 14 起 connect() 换成新实现，自定义请求头的参数从 extra_headers 改名为 additional_headers
+HEADERS_KWARG = "additional_headers" if int(websockets.__version__.split(".")[0]) >= 14 else "extra_headers"
+
+
+class MarketStream:
+    def __init__(self, key, secret, on_trade=None, on_bar=None, url=None, feed=None):
+        self.key = key
+        self.secret = secret
+        self.on_trade = on_trade  # on_trade(symbol, price)
+        self.on_bar = on_bar      # on_bar(symbol, {'time','open','high','low','close','volume'})
+        self.url = (url or config.DATA_STREAM_URL).rstrip("/")
+        self.feed = feed or config.DATA_FEED
+
+        self.running = False
+        self.connected = {}   # {endpoint: bool}
+        self.last_tick = {}   # {symbol: (price, time.time())}
+        self._thread = None
+        self._loop = None     # 推送线程里的事件循环
+        self._sockets = set() # 当前打开的连接，stop() 直接关掉
+
+    def start(self, symbols):
+        if self.running: return
+        self.running = True
+        crypto = [s for s in symbols if "/" in s]
+        stocks = [s for s in symbols if "/" not in s]
+        endpoints = []
+        if crypto: endpoints.append((f"{self.url}/v1beta3/crypto/us", crypto))
+        if stocks: endpoints.append((f"{self.url}/v2/{self.feed}", stocks))
+        self._thread = threading.Thread(target=self._run, args=(endpoints,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        停止推送并等后台线程退出：旧连接不断开就马上 start()，会撞上 Alpaca 每个 Key 一条连接的限制
+        连接在推送线程的事件循环里关掉，recv 立即返回，不用等 5 秒超时
+        """
+        self.running = False
+        loop, thread = self._loop, self._thread
+        if loop is not None:
+            for ws in list(self._sockets):
+                try:
+                    asyncio.run_coroutine_threadsafe(ws.close(), loop)
+                except RuntimeError:
+                    pass  # 事件循环已经结束
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(config.STREAM_STOP_SECONDS)
+
+    def last_price(self, symbol, max_age=None):
+        """最近一次推送的价格；超过 max_age 秒没更新视为失效，返回 None (调用方回退到轮询)"""
+        tick = self.last_tick.get(symbol)
+        if tick is None: return None
+        price, ts = tick
+        if max_age is not None and time.time() - ts > max_age: return None
+        return price
+
+    # ================= 内部实现 =================
+
+    def _run(self, endpoints):
+        asyncio.run(self._run_all(endpoints))
+
+    async def _run_all(self, endpoints):
+        self._loop = asyncio.get_running_loop()
+        await asyncio.gather(*[self._run_endpoint(url, syms) for url, syms in endpoints])
+
+    async def _run_endpoint(self, url, symbols):
+        backoff = 1
+        while self.running:
+            ws = None
+            try:
+                async with websockets.connect(url, **{HEADERS_KWARG: {'Content-Type': 'application/msgpack'}}) as ws:
+                    self._sockets.add(ws)
+                    if not self.running: break  # 连上之前已经 stop()
+                    await self._handshake(ws, symbols)
+                    self.connected[url] = True
+                    backoff = 1
+                    print(f"📡 行情推送已连接: {url} {symbols}")
+                    while self.running:
+                        try:
+                            raw = await asyncio.wait_for(ws.recv(), 5)
+                        except asyncio.TimeoutError:
+                            continue  # 让 stop() 能及时生效
+                        for msg in msgpack.unpackb(raw):
+                            self._dispatch(msg)
+            except Exception as e:
+                if self.running: print(f"⚠️ 行情推送断开 [{url}]: {e}，{backoff}s 后重连")
+            finally:
+                self._sockets.discard(ws)
+                self.connected[url] = False
+            for _ in range(backoff if self.running else 0):
+                if not self.running: break  # 退避期间 stop() 也要马上退出
+                await asyncio.sleep(1)
+            backoff = min(backoff * 2, 30)
+
+    async def _handshake(self, ws, symbols):
+        msg = msgpack.unpackb(await ws.recv())
+        if msg[0].get('T') != 'success' or msg[0].get('msg') != 'connected':
+            raise ValueError(f"connected message not received: {msg}")
+        await ws.send(msgpack.packb({'action': 'auth', 'key': self.key, 'secret': self.secret}))
+        msg = msgpack.unpackb(await ws.recv())
+        if msg[0].get('T') != 'success' or msg[0].get('msg') != 'authenticated':
+            raise ValueError(f"auth failed: {msg}")
+        await ws.send(msgpack.packb({'action': 'subscribe', 'trades': symbols, 'bars': symbols}))
+
+    def _dispatch(self, msg):
+        kind, symbol = msg.get('T'), msg.get('S')
+        try:
+            if kind == 't':
+                price = float(msg['p'])
+                self.last_tick[symbol] = (price, time.time())
+                if self.on_trade: self.on_trade(symbol, price)
+            elif kind == 'b':
+                if self.on_bar:
+                    self.on_bar(symbol, {
+                        'time': msg['t'].to_datetime(),
+                        'open': float(msg['o']), 'high': float(msg['h']),
+                        'low': float(msg['l']), 'close': float(msg['c']),
+                        'volume': float(msg['v']),
+                    })
+            elif kind == 'error':
+                print(f"❌ 行情推送错误: {msg.get('msg')} ({msg.get('code')})")
+        except Exception as e:
+            print(f"Stream Dispatch Error [{symbol}]: {e}")
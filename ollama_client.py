@@ -0,0 +1,170 @@
+# ollama_client.py
+"""
+🌊 Ollama 流式客户端：逐块读取 /api/generate 的 NDJSON 输出
+- <think> 内容边生成边回调 (AI 日志栏实时显示 R1 的思考过程)
+- 思考结束后扫描回答部分，一旦拼出完整的决策 JSON 就断开连接，Ollama 随即停止生成，模型马上空出来给下一个币种
+"""
+import json
+import time
+
+import requests
+
+import config
+from ai_parser import THINK_OPEN, THINK_CLOSE, JsonScanner, has_action
+
+
+def perf_stats(out):
+    """
+    ⏱️ 整理一次调用的耗时
+    服务端统计 (prompt_eval_count / prompt_eval_duration / eval_count / eval_duration) 只在完整结束时才有；
+    早停时只有客户端测量：TTFT ≈ 模型加载 + prompt 评估，生成速度按 chunk 数估算
+    prompt_eval_count 只算没命中 KV 缓存、真正重新评估的 token，前缀复用生效时它会明显变小
+    """
+    s = out.get('stats') or {}
+    ttft, elapsed = out.get('ttft'), out.get('elapsed')
+    prompt_tokens = s.get('prompt_eval_count')
+    prompt_s = s['prompt_eval_duration'] / 1e9 if 'prompt_eval_duration' in s else None
+    gen_tokens = s.get('eval_count', out.get('tokens'))
+    if 'eval_duration' in s: gen_s = s['eval_duration'] / 1e9
+    elif ttft is not None and elapsed is not None: gen_s = elapsed - ttft
+    else: gen_s = None
+    return {
+        "queue_wait": out.get('queue_wait'),
+        "ttft": ttft,
+        "elapsed": elapsed,
+        "load_s": s['load_duration'] / 1e9 if 'load_duration' in s else None,
+        "prompt_tokens": prompt_tokens,
+        "prompt_eval_s": prompt_s,
+        "prompt_tps": prompt_tokens / prompt_s if prompt_tokens and prompt_s else None,
+        "gen_tokens": gen_tokens,
+        "gen_tps": gen_tokens / gen_s if gen_tokens and gen_s else None,
+        "early_stop": out.get('early_stop', False),
+    }
+
+
+def summarize_perf(records):
+    """多次调用取平均 (忽略缺失值)"""
+    summary = {}
+    for key in ("queue_wait", "ttft", "elapsed", "load_s", "prompt_tokens", "prompt_eval_s", "prompt_tps", "gen_tokens", "gen_tps"):
+        values = [r[key] for r in records if r.get(key) is not None]
+        summary[key] = sum(values) / len(values) if values else None
+    summary["early_stop"] = sum(1 for r in records if r.get("early_stop"))
+    return summary
+
+
+def format_perf(p):
+    parts = []
+    if p.get('queue_wait'): parts.append(f"queue {p['queue_wait']:.2f}s")
+    if p.get('ttft') is not None: parts.append(f"TTFT {p['ttft']:.2f}s")
+    if p.get('prompt_eval_s') is not None:
+        parts.append(f"prompt {p['prompt_tokens'] or 0:.0f} tok / {p['prompt_eval_s']:.2f}s ({p['prompt_tps'] or 0:.0f} tok/s)")
+    if p.get('gen_tps') is not None: parts.append(f"gen {p['gen_tokens']:.0f} tok ({p['gen_tps']:.1f} tok/s)")
+    if p.get('load_s'): parts.append(f"load {p['load_s']:.2f}s")
+    if p.get('elapsed') is not None: parts.append(f"total {p['elapsed']:.2f}s")
+    if p.get('early_stop') is True: parts.append("early-stop")
+    elif p.get('early_stop'): parts.append(f"early-stop x{p['early_stop']}")
+    return " | ".join(parts)
+
+
+class StreamState:
+    """
+    🧩【流式解析状态】逐块喂入 NDJSON chunk
+    - response 里的 <think>...</think> (旧版 Ollama) 或单独的 thinking 字段 (新版) 都会回调 on_think
+    - 回答部分交给 ai_parser.JsonScanner 增量扫描，每闭合一个顶层 {...} / [...] 就尝试解析，满足 stop_when 即完成
+    """
+    def __init__(self, on_think=None, stop_when=None):
+        self.on_think = on_think
+        self.stop_when = stop_when or has_action
+        self.text = ""        # response 原文 (可能含 <think> 标签)
+        self.thinking = ""    # 单独的 thinking 字段
+        self.mode = None      # None: 还不能判断有没有 <think> / "think" / "answer"
+        self.think_sent = 0   # text 中已经回调过的思考内容位置
+        self.result = None    # 早停时解析出的 JSON
+        self.done = False
+        self.stats = {}       # 最后一个 chunk 的统计字段 (eval_count / prompt_eval_duration / context ...)
+        self.scanner = JsonScanner(self.stop_when)
+
+    def feed(self, chunk):
+        """喂入一个 chunk，返回 True 表示已拿到完整结果，可以停止生成"""
+        if chunk.get('thinking'):
+            self.thinking += chunk['thinking']
+            self._emit(chunk['thinking'])
+        if chunk.get('response'):
+            self.text += chunk['response']
+            self._advance()
+        if chunk.get('done'):
+            self.done = True
+            self.stats = {k: v for k, v in chunk.items() if k not in ('response', 'thinking')}
+        return self.result is not None
+
+    @property
+    def raw(self):
+        """与非流式接口的 response 同样格式的全文 (思考内容包在 <think> 里)"""
+        if self.thinking and THINK_OPEN not in self.text:
+            return f"{THINK_OPEN}{self.thinking}{THINK_CLOSE}{self.text}"
+        return self.text
+
+    def _emit(self, text):
+        if text and self.on_think: self.on_think(text)
+
+    def _advance(self):
+        if self.mode is None:
+            head = self.text.lstrip()
+            if head.startswith(THINK_OPEN):
+                self.mode = "think"
+                self.think_sent = self.text.index(THINK_OPEN) + len(THINK_OPEN)
+            elif THINK_OPEN.startswith(head):
+                return  # 只收到半截 "<thi"，等下一块
+            else:
+                self.mode = "answer"
+
+        if self.mode == "think":
+            end = self.text.find(THINK_CLOSE, self.think_sent)
+            if end < 0:
+                # 末尾可能是半截 "</think"，留着不发
+                safe = len(self.text) - len(THINK_CLOSE) + 1
+                if safe > self.think_sent:
+                    self._emit(self.text[self.think_sent:safe])
+                    self.think_sent = safe
+                return
+            self._emit(self.text[self.think_sent:end])
+            self.mode = "answer"
+            self.scanner.pos = end + len(THINK_CLOSE)
+
+        if self.result is None: self.result = self.scanner.scan(self.text)
+
+
+class OllamaClient:
+    def __init__(self, url=None, timeout=120):
+        self.url = url or config.OLLAMA_URL
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def generate(self, payload, on_think=None, stop_when=None, early_stop=True):
+        """
+        流式调用 /api/generate
+        Returns: {'status', 'raw' (全文，格式同非流式 response), 'result' (早停解析出的 JSON 或 None),
+                  'early_stop', 'stats', 'ttft' (首个 token 耗时), 'tokens' (收到的 chunk 数), 'elapsed'}
+        """
+        state = StreamState(on_think, stop_when)
+        t0 = time.time()
+        ttft = None
+        stopped = False
+        tokens = 0  # 每个 chunk 大约一个 token，早停拿不到服务端统计时用它估算生成速度
+        with self.session.post(self.url, json=dict(payload, stream=True), stream=True, timeout=self.timeout) as resp:
+            if resp.status_code != 200:
+                return {"status": resp.status_code, "raw": resp.text, "result": None, "early_stop": False,
+                        "stats": {}, "ttft": None, "tokens": 0, "elapsed": time.time() - t0}
+            for line in resp.iter_lines():
+                if not line: continue
+                chunk = json.loads(line)
+                if chunk.get('error'): raise RuntimeError(f"Ollama: {chunk['error']}")
+                if chunk.get('response') or chunk.get('thinking'):
+                    tokens += 1
+                    if ttft is None: ttft = time.time() - t0
+                if state.feed(chunk) and early_stop:
+                    stopped = not state.done
+                    break  # 退出 with 关闭连接 -> Ollama 停止生成
+                if state.done: break
+        return {"status": 200, "raw": state.raw, "result": state.result, "early_stop": stopped,
+                "stats": state.stats, "ttft": ttft, "tokens": tokens, "elapsed": time.time() - t0}
@@ -0,0 +1,124 @@
+# orders.py
+"""
+🧾 订单簿 + 资金账本
+- 每笔订单带 client_order_id，成交回报 (trade_updates 推送 / list_orders 批量轮询) 按累计成交量增量记账
+- 成交直接记到 PositionBook 和本地现金上，策略读本地账本，不用每次决策都查账户和持仓
+"""
+import threading
+import time
+import uuid
+
+import alpaca_trade_api as tradeapi
+
+import config
+
+# 终态订单：不再需要跟踪
+FINAL_STATUSES = {'filled', 'canceled', 'expired', 'rejected', 'done_for_day', 'replaced'}
+
+
+class OrderManager:
+    def __init__(self, positions):
+        self.api = None
+        self.positions = positions
+        self.cash = 0.0
+        self.equity = 0.0
+        self.orders = {}  # {client_order_id: {'symbol','side','status','filled_qty','filled_cost','submitted_at'}}
+        self._account_at = 0.0
+        self._polled_at = 0.0
+        self._stream = None
+        self._lock = threading.Lock()
+
+    # ================= 下单登记 =================
+
+    def new_client_id(self, symbol, side):
+        return f"ds-{side}-{self.positions.key(symbol)}-{uuid.uuid4().hex[:12]}"
+
+    def track(self, client_id, symbol, side, order=None):
+        with self._lock:
+            self.orders[client_id] = {
+                'symbol': symbol, 'side': side, 'status': 'new',
+                'filled_qty': 0.0, 'filled_cost': 0.0, 'submitted_at': time.time(),
+            }
+        # 有些市价单提交回来就已经成交了
+        if order is not None: self._apply_order(order)
+
+    def open_orders(self):
+        with self._lock:
+            return {cid: dict(o) for cid, o in self.orders.items() if o['status'] not in FINAL_STATUSES}
+
+    # ================= 资金账本 =================
+
+    def sync_account(self, force=False):
+        """过了 ACCOUNT_TTL 才向服务器对一次账，其余时间现金由成交回报本地增减"""
+        if self.api is None: return False
+        if not force and time.time() - self._account_at < config.ACCOUNT_TTL: return True
+        account = self.api.get_account()
+        with self._lock:
+            self.cash, self.equity = float(account.cash), float(account.equity)
+            self._account_at = time.time()
+        return True
+
+    # ================= 成交回报 =================
+
+    def poll(self, force=False):
+        """
+        批量轮询兜底：有未完结订单时，每 ORDER_POLL_SECONDS 用一次 list_orders 拉回所有订单状态
+        """
+        pending = self.open_orders()
+        if self.api is None or not pending: return
+        if not force and time.time() - self._polled_at < config.ORDER_POLL_SECONDS: return
+        self._polled_at = time.time()
+        oldest = min(o['submitted_at'] for o in pending.values()) - 60
+        after = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(oldest))
+        try:
+            for order in self.api.list_orders(status='all', after=after, limit=500):
+                if order.client_order_id in pending: self._apply_order(order)
+        except Exception as e:
+            print(f"Order Poll Error: {e}")
+
+    def on_trade_update(self, data):
+        """trade_updates 推送回调 (raw dict: {'event': ..., 'order': {...}})"""
+        order = data.get('order') or {}
+        self._apply(order.get('client_order_id'), order.get('status') or data.get('event'),
+                    order.get('filled_qty'), order.get('filled_avg_price'))
+
+    def _apply_order(self, order):
+        self._apply(order.client_order_id, order.status, order.filled_qty, order.filled_avg_price)
+
+    def _apply(self, client_id, status, filled_qty, filled_avg_price):
+        filled_qty = float(filled_qty or 0)
+        cost = filled_qty * float(filled_avg_price or 0)
+        with self._lock:
+            rec = self.orders.get(client_id)
+            if rec is None: return
+            delta_qty = filled_qty - rec['filled_qty']
+            delta_cost = cost - rec['filled_cost']
+            rec['status'] = status or rec['status']
+            if delta_qty <= 1e-12: return
+            rec['filled_qty'], rec['filled_cost'] = filled_qty, cost
+            self.cash += -delta_cost if rec['side'] == 'buy' else delta_cost
+        self.positions.apply_fill(rec['symbol'], rec['side'], delta_qty, delta_cost / delta_qty)
+
+    # ================= trade_updates 推送 =================
+
+    def start_stream(self, key, secret, base_url):
+        if self._stream is not None: return
+        stream = tradeapi.Stream(key, secret, base_url, raw_data=True)
+
+        async def handler(msg):
+            try:
+                self.on_trade_update(msg.get('data', msg))
+            except Exception as e:
+                print(f"Trade Update Error: {e}")
+
+        stream.subscribe_trade_updates(handler)
+        self._stream = stream
+        threading.Thread(target=stream.run, daemon=True).start()
+
+    def stop_stream(self):
+        if self._stream is None: return
+        try:
+            self._stream.stop()
+        except Exception as e:
+            print(f"Trade Stream Stop Error: {e}")
+        self._stream = None
@@ -0,0 +1,65 @@
+# prefilter.py
+"""
+⚡ 规则预筛：风控之后、问 AI 之前，用 Python 硬结论直接处理一眼就能判断的情况
+- 空仓 + 趋势向下 -> HOLD
+- 空仓 + RSI 超买 -> HOLD (不追高)
+- 持仓 + RSI 极端超买 -> SELL 候选：照样问模型 (提示里标出来 + 优先排队)，配置了卖出比例时才直接卖
+只有模棱两可的状态才交给模型；按币种记录被规则截下的比例
+"""
+import threading
+
+import config
+
+
+class PreFilter:
+    def __init__(self, rules=None, enabled=None):
+        self.rules = dict(config.PREFILTER_RULES if rules is None else rules)
+        self.enabled = config.PREFILTER_ENABLED if enabled is None else enabled
+        self._stats = {}  # {symbol: {'seen', 'skipped', 'rules': {rule: 次数}}}
+        self._lock = threading.Lock()
+
+    def decide(self, symbol, qty, price, hints):
+        """
+        hints: strategy.market_hints 的结果
+        Returns: (action, amount_usd, reason) 规则已经能决定；None 交给 AI
+        """
+        matched = self._match(qty, price, hints) if self.enabled and hints else None
+        with self._lock:
+            rec = self._stats.setdefault(symbol, {'seen': 0, 'skipped': 0, 'rules': {}})
+            rec['seen'] += 1
+            if matched is None: return None
+            rule, decision = matched
+            rec['skipped'] += 1
+            rec['rules'][rule] = rec['rules'].get(rule, 0) + 1
+        return decision
+
+    def _match(self, qty, price, hints):
+        rules = self.rules
+        trend, rsi, rsi_state = hints['trend'], hints['rsi'], hints['rsi_state']
+        if qty <= 0:
+            if rules.get('flat_downtrend_hold') and trend == "DOWN" and rsi_state != "OVERSOLD":
+                return 'flat_downtrend_hold', ("HOLD", 0.0, "Rule: No position + Trend DOWN")
+            if rules.get('flat_overbought_hold') and rsi_state == "OVERBOUGHT":
+                return 'flat_overbought_hold', ("HOLD", 0.0, f"Rule: No position + RSI Overbought ({rsi:.1f})")
+        else:
+            limit, fraction = rules.get('held_extreme_rsi_sell'), rules.get('held_extreme_rsi_sell_fraction')
+            if limit is not None and fraction and rsi > limit:
+                return 'held_extreme_rsi_sell', ("SELL", qty * price * fraction, f"Rule: RSI {rsi:.1f} > {limit}, sell {fraction:.0%} of position")
+        return None
+
+    def sell_candidate(self, qty, hints):
+        """
+        持仓 + RSI 极端超买，但没配置直接卖出比例 (decide 没截下) 时：
+        Returns: 写进 prompt 的 SELL 候选提示，由模型决定卖不卖 / 卖多少；不是候选返回 None
+        """
+        limit = self.rules.get('held_extreme_rsi_sell')
+        if not self.enabled or not hints or qty <= 0 or limit is None or hints['rsi'] <= limit: return None
+        return f"SELL CANDIDATE: RSI {hints['rsi']:.1f} > {limit} (extreme overbought). Evaluate SELL first; HOLD only if the thesis is intact."
+
+    def stats(self):
+        """{symbol: {'seen', 'skipped', 'skip_rate', 'rules'}}"""
+        with self._lock:
+            return {
+                symbol: dict(rec, rules=dict(rec['rules']), skip_rate=rec['skipped'] / rec['seen'] if rec['seen'] else 0.0)
+                for symbol, rec in self._stats.items()
+            }
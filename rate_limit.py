@@ -0,0 +1,55 @@
+# rate_limit.py
+"""
+🪣 Alpaca API 限流：令牌桶，每个分片 (shards.py) / 行情中心 (market_hub.py) 各自一份预算
+- 每分钟补充 rate 个令牌，最多攒 burst 个；没有令牌就阻塞等待，不会撞上 HTTP 429
+- 挂在 requests 的 HTTPAdapter 上：行情 session 和 SDK 内部 session 的每一次真实请求 (含分页) 都计数
+"""
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+
+
+class TokenBucket:
+    def __init__(self, rate_per_min, burst=None):
+        self.rate = rate_per_min / 60.0  # 每秒补充的令牌
+        self.capacity = burst or max(1, int(rate_per_min / 10))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.waited = 0.0  # 累计因限流等待的秒数 (日志用)
+        self._lock = threading.Lock()
+
+    def acquire(self, n=1):
+        """取 n 个令牌，不够就等 (返回本次等待的秒数)"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= n:
+                    self.tokens -= n
+                    self.waited += waited
+                    return waited
+                delay = (n - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """每次真正发出 HTTP 请求前先从令牌桶取一个令牌"""
+
+    def __init__(self, bucket, **kwargs):
+        self.bucket = bucket
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        self.bucket.acquire()
+        return super().send(request, **kwargs)
+
+
+def limit_session(session, bucket, **kwargs):
+    """给 requests.Session 的 http / https 都挂上限流 adapter"""
+    adapter = RateLimitedAdapter(bucket, **kwargs)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
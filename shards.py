@@ -0,0 +1,140 @@
+# shards.py
+"""
+🧩 多账户 / 多进程分片运行：一个行情中心进程 + 每个分片一个引擎进程，不需要开多个 GUI
+- 行情中心 (market_hub.py) 统一拉行情 / K 线，推给所有分片，同一份数据只向 Alpaca 请求一次
+- 每个分片是一个无界面引擎 (engine.py)：自己的账户、自己的币种、自己的成交日志和 API 请求预算
+  分片各自开一个 HTTP 接口，可以用 python main.py --attach http://127.0.0.1:<端口> --token <engine_token> 查看
+- AI 推理都走同一个 Ollama 服务 (config.OLLAMA_URL)，模型只加载一次
+
+用法:
+    python shards.py --config shards.json
+
+shards.json:
+{
+  "engine_token": "...",                               (必填，各分片 HTTP 接口的访问令牌)
+  "hub": {"api_key": "...", "api_secret": "..."},      (可选，默认用第一个账户拉行情)
+  "accounts": [
+    {"name": "paper1", "api_key": "...", "api_secret": "...", "symbols": "BTC/USD,ETH/USD,SOL/USD,DOGE/USD"},
+    {"name": "paper2", "api_key": "...", "api_secret": "...", "symbols": "BTC/USD,LTC/USD", "rate_limit": 100}
+  ]
+}
+rate_limit: 这个账户每分钟的 API 请求上限 (和用同一个 Key 拉行情的行情中心平分)
+一个账户只能对应一个分片进程：引擎按本地账本 (OrderManager) 的现金下单，同一个账户拆成多个进程时
+每个进程都以为整笔现金归自己，会一起超额买入；想多开进程就多开几个 (模拟盘) 账户
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from collections import Counter
+
+import config
+from backend import AlpacaBackend
+from engine import TradingEngine, serve
+from market_hub import HubClient, MarketHub, wait_for_hub
+from rate_limit import TokenBucket
+
+
+def plan_shards(settings):
+    """
+    shards.json -> (行情中心配置, [分片配置])
+    同一个 API Key 的请求预算由用到它的所有进程 (包括行情中心) 平分
+    一个账户拆给多个进程 (processes > 1 / 同一个 Key 写了两遍) 会超额占用现金，直接报 ValueError
+    """
+    accounts = settings['accounts']
+    hub = dict(settings.get('hub') or {k: accounts[0][k] for k in ('api_key', 'api_secret')})
+    shards = []
+    for acct in accounts:
+        if int(acct.get('processes', 1)) > 1:
+            raise ValueError(f"账户 {acct['name']}: 不支持 processes > 1 (多个进程共用一份现金会超额下单)，请拆成多个账户")
+        if any(s['api_key'] == acct['api_key'] for s in shards):
+            raise ValueError(f"账户 {acct['name']}: API Key 和其他账户重复，一个账户只能对应一个分片")
+        symbols = [s.strip().upper() for s in acct['symbols'].split(',') if s.strip()]
+        shards.append({
+            "name": acct['name'], "api_key": acct['api_key'], "api_secret": acct['api_secret'],
+            "symbols": symbols, "journal": f"trade_journal_{acct['name']}.db",
+            "token": settings.get('engine_token'),
+        })
+    if not settings.get('engine_token'):
+        raise ValueError("缺少 engine_token：分片的 HTTP 接口能下发 API Key / 启停交易，必须设置访问令牌")
+
+    limits = {a['api_key']: a.get('rate_limit', config.ALPACA_RATE_LIMIT_PER_MIN) for a in accounts}
+    users = Counter([hub['api_key']] + [s['api_key'] for s in shards])
+    hub.setdefault('rate_limit', limits.get(hub['api_key'], config.ALPACA_RATE_LIMIT_PER_MIN) / users[hub['api_key']])
+    for i, shard in enumerate(shards):
+        shard['rate_limit'] = limits[shard['api_key']] / users[shard['api_key']]
+        shard['port'] = config.ENGINE_PORT + 1 + i
+    return hub, shards
+
+
+def run_hub(hub, address, authkey, symbols):
+    """【行情中心进程】"""
+    backend = AlpacaBackend()
+    backend.set_rate_limit(TokenBucket(hub['rate_limit']))
+    success, msg = backend.connect(hub['api_key'], hub['api_secret'], config.BASE_URL)
+    print(f"[hub] {msg}")
+    if not success: return
+    MarketHub(backend, address, authkey, symbols).run()
+
+
+def run_shard(shard, address, authkey):
+    """【分片进程】一个无界面引擎，行情从行情中心取"""
+    name = shard['name']
+    config.TRADE_JOURNAL_FILE = shard['journal']  # 每个分片自己的成交日志
+
+    backend = AlpacaBackend()
+    backend.set_rate_limit(TokenBucket(shard['rate_limit']))
+    backend.feed = HubClient(address, authkey)
+    engine = TradingEngine(backend=backend)
+    engine.subscribe(lambda e: print(f"[{name}] {e['text']}", end="") if e['type'] == "sys" else None)
+    serve(engine, shard['token'], port=shard['port'])
+
+    success, _ = engine.connect(shard['api_key'], shard['api_secret'])
+    if success: engine.start(shard['symbols'])
+    while True: time.sleep(3600)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded multi-account DeepStock runner")
+    parser.add_argument("--config", default="shards.json")
+    args = parser.parse_args()
+
+    with open(args.config, "r") as f: settings = json.load(f)
+    try:
+        hub, shards = plan_shards(settings)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    authkey = os.urandom(16)  # 只有本次启动的子进程能连行情中心
+    address = (config.MARKET_HUB_HOST, config.MARKET_HUB_PORT)
+    symbols = sorted({s for shard in shards for s in shard['symbols']})
+
+    procs = [mp.Process(target=run_hub, args=(hub, address, authkey, symbols), name="market-hub", daemon=True)]
+    procs[0].start()
+    if not wait_for_hub(address, authkey):
+        print("❌ 行情中心启动失败")
+        procs[0].terminate()
+        sys.exit(1)
+    print(f"📡 行情中心: {address[0]}:{address[1]} | {len(symbols)} 个币种 | {hub['rate_limit']:.0f} 次/分钟")
+
+    for shard in shards:
+        proc = mp.Process(target=run_shard, args=(shard, address, authkey), name=shard['name'], daemon=True)
+        proc.start()
+        procs.append(proc)
+        print(f"🧩 {shard['name']}: {shard['symbols']} | {shard['rate_limit']:.0f} 次/分钟 | http://{config.ENGINE_HOST}:{shard['port']}")
+
+    try:
+        alive = set(procs)
+        while alive:
+            for proc in list(alive):
+                if not proc.is_alive():
+                    print(f"⚠️ 进程 {proc.name} 已退出 (exit code {proc.exitcode})")
+                    alive.discard(proc)
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("🛑 停止中...")
+    finally:
+        for proc in procs:
+            if proc.is_alive(): proc.terminate()
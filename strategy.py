@@ -0,0 +1,103 @@
+# strategy.py
+"""
+🛡️ 策略公共步骤：指标提示、报告格式、硬性风控、下单规则
+实盘 (main.py / backend.py) 和回测 (backtest.py) 共用同一套实现，保证回测结果能代表实盘
+"""
+import config
+
+
+def market_hints(price, ind, overbought=None, oversold=None):
+    """
+    Python 计算硬结论 (趋势 / RSI 状态)
+    ind: IndicatorEngine 快照 (或 pandas 兜底的同结构 dict)
+    """
+    overbought = config.RSI_OVERBOUGHT if overbought is None else overbought
+    oversold = config.RSI_OVERSOLD if oversold is None else oversold
+    rsi = ind['rsi']
+    if rsi > overbought: rsi_state = "OVERBOUGHT"
+    elif rsi < oversold: rsi_state = "OVERSOLD"
+    else: rsi_state = "NEUTRAL"
+    return {
+        "trend": "UP" if price > ind['ema'] else "DOWN",
+        "rsi": rsi,
+        "rsi_state": rsi_state,
+        "macd": ind['macd'],
+    }
+
+
+def macro_text(close, sma20):
+    # 判断趋势
+    trend = "BULLISH 🟢" if close > sma20 else "BEARISH 🔴"
+    dist_pct = (close - sma20) / sma20 * 100
+    return f"Daily Trend: {trend} (Price ${close:.2f} vs SMA20 ${sma20:.2f}, Dist: {dist_pct:.2f}%)"
+
+
+def format_report(price, ind, closes, volumes, macro):
+    """构建给 AI 看的报告 (K 线形态序列 + Python 硬结论 + 宏观背景)"""
+    def to_seq(values):
+        return "[" + ", ".join([f"{x:.2f}" for x in values]) + "]"
+
+    hints = market_hints(price, ind)
+    ema_name = f"EMA{config.EMA_LEN}"
+    trend_hint = f"UP (Price > {ema_name})" if hints['trend'] == "UP" else f"DOWN (Price < {ema_name})"
+    rsi_hint = {
+        "OVERBOUGHT": f"OVERBOUGHT (>{config.RSI_OVERBOUGHT})",
+        "OVERSOLD": f"OVERSOLD (<{config.RSI_OVERSOLD})",
+    }.get(hints['rsi_state'], "NEUTRAL")
+
+    return f"""
+            *** GOD'S EYE VIEW (Daily Timeframe) ***
+            {macro}
+            
+            *** TACTICAL SNAPSHOT (1-Min Timeframe) ***
+            Current Price: {price:.2f}
+            
+            [PYTHON HINTS]
+            - Short-Term Trend: {trend_hint}
+            - RSI State: {rsi_hint} ({hints['rsi']:.1f})
+            
+            [RAW DATA SEQUENCES] (Last 12 mins)
+            - Price: {to_seq(closes)}
+            - RSI{config.RSI_LEN}: {to_seq(ind['rsi_seq'])}
+            - MACD : {to_seq(ind['macd_seq'])}
+            - Vol  : {to_seq(volumes)}
+            """
+
+
+# ==========================================
+# 🛡️ 硬性风控 (Hard Guardrails)
+# ==========================================
+
+def cooldown_remaining(last_buy_ts, now, cooldown=None):
+    """[风控 A] 买入后冷却期内禁止 AI 再次操作，返回剩余秒数 (0 = 已就绪)"""
+    cooldown = config.COOLDOWN_SECONDS if cooldown is None else cooldown
+    return max(0.0, cooldown - (now - last_buy_ts))
+
+
+def hard_stop_hit(qty, price, avg, stop_pct=None, min_value=None):
+    """
+    [风控 B] 熔断止损：单币种亏损超过 stop_pct 强制清仓
+    只有持仓价值大于 min_value 才触发，防止碎股误触
+    Returns: 触发时返回亏损比例，否则 None
+    """
+    stop_pct = config.HARD_STOP_PCT if stop_pct is None else stop_pct
+    min_value = config.HARD_STOP_MIN_VALUE if min_value is None else min_value
+    if qty > 0 and avg > 0 and qty * price > min_value:
+        loss_pct = (price - avg) / avg
+        if loss_pct < stop_pct: return loss_pct
+    return None
+
+
+# ==========================================
+# ⚙️ 下单规则
+# ==========================================
+
+def size_buy(amount_usd, cash, max_fraction=None):
+    """买入金额不超过可用现金 (回测 / 参数扫描可以再按 max_fraction 封顶)，低于最小下单金额直接放弃 (返回 0)"""
+    buy_usd = min(amount_usd, cash if max_fraction is None else cash * max_fraction)
+    return buy_usd if buy_usd >= config.MIN_ORDER_USD else 0.0
+
+
+def is_full_exit(sell_usd, qty, price):
+    """卖出金额 >= 持仓价值的 98% 视为清仓"""
+    return sell_usd >= qty * price * config.FULL_EXIT_RATIO
@@ -0,0 +1,224 @@
+# sweep.py
+"""
+🔬 参数扫描：在历史 K 线上批量评估风控 / 指标参数组合，输出排名表
+
+- 指标与信号整列向量化计算 (indicators.ema_series / rsi_series / macd_series)，同一组 (EMA, RSI) 长度只算一次
+- 持仓模拟按"事件"跳跃 (下一个买点 / 卖点 / 止损点用 searchsorted + 向量化条件查找)，不逐根循环
+- 决策规则与 backtest.RulePolicy 完全一致，成交规则与 backtest.Backtester 一致 (同参数下结果相同)
+- 多进程：按 (币种, EMA 长度, RSI 长度) 分组丢进进程池
+
+用法:
+    python sweep.py BTC/USD=data/btc_1min.csv ETH/USD=data/eth_1min.csv \\
+        --ema 10,20,50 --rsi 7,14 --overbought 65,70,75 --cooldown 0,300,900 --stop=-0.03,-0.05 --max-cash 0.1,0.2
+"""
+import argparse
+import bisect
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import config
+from backtest import bar_seconds, load_bars
+from indicators import ema_series, rsi_series, macd_series
+
+PARAM_KEYS = ["ema_len", "rsi_len", "overbought", "oversold", "cooldown", "stop_pct", "stop_min_value", "max_cash_fraction"]
+TAIL = 12  # 与 IndicatorEngine 默认 tail 一致：RSI / MACD 序列凑满 12 根才开始决策
+
+_bars = {}  # 子进程内的 K 线缓存 {path: DataFrame}
+
+
+def _load(path):
+    if path not in _bars: _bars[path] = load_bars(path)
+    return _bars[path]
+
+
+def _full_window(values):
+    """最近 TAIL 根都有值 (对应 IndicatorEngine.snapshot 的预热条件)"""
+    ok = pd.Series(~np.isnan(values)).rolling(TAIL).sum().to_numpy()
+    return ok == TAIL
+
+
+def simulate(close, stamps, warm, ema, rsi, p, cash=10000.0, slippage=0.0005, fee=0.001):
+    """
+    单组参数的持仓模拟
+    Returns: 指标 dict (return_pct, max_drawdown_pct, trades, round_trips, win_rate_pct, fees, exposure_pct)
+    """
+    n = len(close)
+    up = close > ema
+    ob = rsi > p['overbought']
+    os_ = rsi < p['oversold']
+    # 事件循环里只做标量查找，用 list + bisect 比 numpy 标量调用快一个数量级
+    buy_idx = np.flatnonzero(warm & ((up & ~ob) | os_)).tolist()
+    sell_idx = np.flatnonzero(warm & (ob | (~up & ~os_))).tolist()
+    stamp_list = stamps.tolist()
+    price = close.tolist()
+
+    start_cash = cash
+    qty = avg = cost_basis = 0.0
+    i, cooldown_until = 0, -np.inf
+    events = [(0, cash, 0.0)]  # (bar, 成交后现金, 成交后持仓)
+    trades, round_trips, fees = 0, [], 0.0
+
+    while i < n:
+        start = i if cooldown_until <= stamp_list[i] else bisect.bisect_left(stamp_list, cooldown_until)
+        if qty <= 0:
+            # --- 空仓：找下一个买点 ---
+            k = bisect.bisect_left(buy_idx, start)
+            if k >= len(buy_idx): break
+            j = buy_idx[k]
+            buy_usd = min(cash, cash * p['max_cash_fraction'])
+            if buy_usd < config.MIN_ORDER_USD: break  # 空仓时现金不会再变，后面也买不了
+            fill = price[j] * (1 + slippage)
+            fees += buy_usd * fee
+            qty = (buy_usd - buy_usd * fee) / fill
+            avg, cost_basis = fill, buy_usd
+            cash -= buy_usd
+            trades += 1
+            cooldown_until = stamp_list[j] + p['cooldown']
+            events.append((j, cash, qty))
+            i = j + 1
+        else:
+            # --- 持仓：下一个卖点 vs 下一个止损点，谁先到算谁 (同一根上止损优先) ---
+            if start >= n: break
+            k = bisect.bisect_left(sell_idx, start)
+            j_sell = sell_idx[k] if k < len(sell_idx) else n
+            seg = close[start:j_sell + 1]
+            hit = np.flatnonzero(warm[start:j_sell + 1] & (seg < avg * (1 + p['stop_pct'])) & (seg * qty > p['stop_min_value']))
+            j_stop = start + int(hit[0]) if len(hit) else n
+            j = min(j_sell, j_stop)
+            if j >= n: break
+            fill = price[j] * (1 - slippage)
+            gross = qty * fill
+            fees += gross * fee
+            cash += gross - gross * fee
+            round_trips.append(gross - gross * fee - cost_basis)
+            qty = avg = cost_basis = 0.0
+            trades += 1
+            if j == j_stop: cooldown_until = stamp_list[j] + p['cooldown']
+            events.append((j, cash, 0.0))
+            i = j + 1
+
+    # 逐根权益曲线：每根 K 线取它之前最后一次成交后的状态
+    ev = np.array(events)
+    state = np.searchsorted(ev[:, 0], np.arange(n), 'right') - 1
+    held = ev[state, 2]
+    equity = ev[state, 1] + held * close
+    peak = np.maximum.accumulate(equity)
+    final = float(equity[-1]) if n else start_cash
+    wins = sum(1 for x in round_trips if x > 0)
+    return {
+        "return_pct": (final / start_cash - 1) * 100,
+        "max_drawdown_pct": float(((equity - peak) / peak).min()) * 100 if n else 0.0,
+        "trades": trades,
+        "round_trips": len(round_trips),
+        "win_rate_pct": wins / len(round_trips) * 100 if round_trips else 0.0,
+        "fees": float(fees),
+        "exposure_pct": float((held > 0).mean()) * 100 if n else 0.0,
+    }
+
+
+def _run_group(task):
+    """子进程：同一币种 + 同一组指标长度，跑完所有风控参数组合"""
+    symbol, path, ema_len, rsi_len, combos, cash, slippage, fee = task
+    df = _load(path)
+    close = df['close'].to_numpy(dtype=float)
+    stamps = bar_seconds(df.index)
+    ema = ema_series(close, ema_len)
+    rsi = rsi_series(close, rsi_len)
+    macd = macd_series(close)[0]
+    warm = ~np.isnan(ema) & _full_window(rsi) & _full_window(macd)
+
+    rows = []
+    for p in combos:
+        res = simulate(close, stamps, warm, ema, rsi, p, cash, slippage, fee)
+        rows.append({"symbol": symbol, **p, **res})
+    return rows
+
+
+def build_grid(args):
+    values = [args.ema, args.rsi, args.overbought, args.oversold, args.cooldown, args.stop, args.stop_min, args.max_cash]
+    return [dict(zip(PARAM_KEYS, combo)) for combo in itertools.product(*values)]
+
+
+def run_sweep(datasets, grid, cash=10000.0, slippage_bps=5.0, fee_bps=10.0, workers=None):
+    """
+    datasets: [(symbol, path)]
+    Returns: (逐币种明细 DataFrame, 按参数聚合并排名前的 DataFrame)
+    """
+    groups = {}
+    for p in grid:
+        groups.setdefault((p['ema_len'], p['rsi_len']), []).append(p)
+    tasks = [(symbol, path, ema_len, rsi_len, combos, cash, slippage_bps / 1e4, fee_bps / 1e4)
+             for symbol, path in datasets for (ema_len, rsi_len), combos in groups.items()]
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in pool.map(_run_group, tasks):
+            rows.extend(chunk)
+    detail = pd.DataFrame(rows)
+
+    summary = detail.groupby(PARAM_KEYS, as_index=False).agg(
+        return_pct=("return_pct", "mean"),
+        worst_return_pct=("return_pct", "min"),
+        max_drawdown_pct=("max_drawdown_pct", "min"),
+        trades=("trades", "sum"),
+        win_rate_pct=("win_rate_pct", "mean"),
+        fees=("fees", "sum"),
+        exposure_pct=("exposure_pct", "mean"),
+    )
+    return detail, summary
+
+
+def _floats(text):
+    return [float(x) for x in text.split(",")]
+
+
+def _ints(text):
+    return [int(x) for x in text.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grid-search DeepStock guardrail / indicator settings over stored bars")
+    parser.add_argument("data", nargs="+", help="K 线文件，SYMBOL=path 或直接 path (用文件名当币种名)")
+    parser.add_argument("--ema", type=_ints, default=[config.EMA_LEN])
+    parser.add_argument("--rsi", type=_ints, default=[config.RSI_LEN])
+    parser.add_argument("--overbought", type=_floats, default=[config.RSI_OVERBOUGHT])
+    parser.add_argument("--oversold", type=_floats, default=[config.RSI_OVERSOLD])
+    parser.add_argument("--cooldown", type=_floats, default=[config.COOLDOWN_SECONDS])
+    parser.add_argument("--stop", type=_floats, default=[config.HARD_STOP_PCT])
+    parser.add_argument("--stop-min", type=_floats, default=[config.HARD_STOP_MIN_VALUE])
+    parser.add_argument("--max-cash", type=_floats, default=[1.0], help="单笔买入最多用可用现金的比例 (1.0 = 和实盘一样不额外封顶)")
+    parser.add_argument("--cash", type=float, default=10000.0)
+    parser.add_argument("--slippage-bps", type=float, default=5.0)
+    parser.add_argument("--fee-bps", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认 CPU 核数")
+    parser.add_argument("--rank-by", default="return_pct", help="排名字段 (越大越好)，如 return_pct / worst_return_pct / max_drawdown_pct")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--out", default="sweep_results.csv", help="排名表 CSV")
+    parser.add_argument("--detail", default=None, help="逐币种明细 CSV (可选)")
+    args = parser.parse_args()
+
+    datasets = []
+    for item in args.data:
+        symbol, sep, path = item.partition("=")
+        if not sep: symbol, path = os.path.splitext(os.path.basename(item))[0], item
+        datasets.append((symbol, path))
+
+    grid = build_grid(args)
+    print(f"🔬 {len(grid)} 组参数 x {len(datasets)} 个币种 = {len(grid) * len(datasets)} 次回测")
+    t0 = time.perf_counter()
+    detail, summary = run_sweep(datasets, grid, args.cash, args.slippage_bps, args.fee_bps, args.workers)
+    ranked = summary.sort_values(args.rank_by, ascending=False).reset_index(drop=True)
+    print(f"⏱️ 用时 {time.perf_counter() - t0:.1f}s\n")
+
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(ranked.head(args.top).to_string(float_format=lambda x: f"{x:.2f}"))
+    ranked.to_csv(args.out, index=False)
+    print(f"\n📄 排名表已保存: {args.out}")
+    if args.detail:
+        detail.to_csv(args.detail, index=False)
+        print(f"📄 逐币种明细已保存: {args.detail}")
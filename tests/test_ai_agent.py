@@ -0,0 +1,33 @@
+import pytest
+
+import config
+from ai_agent import DeepSeekAgent
+from ai_parser import Decision
+from decision_cache import DecisionCache
+
+
+def item(symbol, price=100.0):
+    return {'symbol': symbol, 'price': price, 'report': "", 'qty': 0, 'avg': 0, 'hints': {"trend": "UP"}}
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    monkeypatch.setattr(config, "AI_SCREEN_MODEL", None)
+    a = DeepSeekAgent()
+    a.cache = DecisionCache(enabled=True)
+    a.queries = []
+    monkeypatch.setattr(a, "_query", lambda model, symbol, *args: a.queries.append(symbol) or Decision("HOLD", 0.0, "ok", ""))
+    monkeypatch.setattr(a, "_query_batch", lambda *args, **kw: ({}, ""))  # 批量返回全部缺失 -> 逐个回退
+    return a
+
+
+@pytest.mark.parametrize("symbols", [["BTC/USD"], ["BTC/USD", "ETH/USD"]])
+def test_each_miss_counted_once(agent, symbols):
+    results = agent.analyze_batch("m", [item(s) for s in symbols], 1000, 1000, {})
+    assert set(results) == set(symbols) and agent.queries == symbols
+    assert (agent.cache.hits, agent.cache.misses) == (0, len(symbols))
+
+    # 第二轮行情不变：全部命中缓存，不再推理
+    agent.analyze_batch("m", [item(s) for s in symbols], 1000, 1000, {})
+    assert agent.queries == symbols
+    assert (agent.cache.hits, agent.cache.misses) == (len(symbols), len(symbols))
@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+from ai_parser import NO_THOUGHT, JsonScanner, find_json, has_action, parse_batch, parse_decision
+
+# (原始回复, action, amount_usd, reason)；reason 为 None 表示不检查
+CORPUS = [
+    # <think> 块
+    ('<think>RSI is 72, overbought.</think>{"action": "SELL", "amount_usd": 120, "reason": "RSI hot"}', "SELL", 120.0, "RSI hot"),
+    ('模板自带 think 开头...</think>\n{"action": "BUY", "amount_usd": 30, "reason": "dip"}', "BUY", 30.0, "dip"),
+    ('<think>maybe {"action": "BUY"} ? no.</think>{"action": "HOLD", "amount_usd": 0, "reason": "wait"}', "HOLD", 0.0, "wait"),
+    # 围栏
+    ('```json\n{"action": "BUY", "amount_usd": "1,250.5", "reason": "trend"}\n```', "BUY", 1250.5, "trend"),
+    ('Here you go:\n```\n{"action": "sell", "amount_usd": 10, "reason": "x"}\n```\nDone.', "SELL", 10.0, "x"),
+    # 撇号 / 单引号 JSON
+    ("Given [the hint's trend] I'd say {'action': 'BUY', 'amount_usd': 50, 'reason': 'ok'}", "BUY", 50.0, "ok"),
+    ("It's overbought, don't chase. {\"action\": \"HOLD\", \"amount_usd\": 0, \"reason\": \"it's flat\"}", "HOLD", 0.0, "it's flat"),
+    ("{'action': 'SELL', 'amount_usd': 75, 'reason': 'stop'}", "SELL", 75.0, "stop"),
+    # 多余 / 没闭合的括号
+    ('see [1 then {"action": "SELL", "amount_usd": 5, "reason": "r"}', "SELL", 5.0, "r"),
+    ('Levels: [100, 105] and {note} -> {"action": "BUY", "amount_usd": 20, "reason": "r"}', "BUY", 20.0, "r"),
+    ('} ] stray closers {"action": "HOLD", "amount_usd": 0, "reason": "r"}', "HOLD", 0.0, "r"),
+    ('{"action": "BUY", "amount_usd": 40, "reason": "uses } and ] inside"}', "BUY", 40.0, "uses } and ] inside"),
+    # 截断 / 没有 JSON -> 正则兜底
+    ('<think>still thinking about whether to BUY', "BUY", 0.0, "Regex Fallback"),
+    ('{"action": "SELL", "amount_usd": 9', "SELL", 9.0, "Regex Fallback"),
+    ('I recommend BUY with 300 USD', "BUY", 300.0, "Regex Fallback"),
+    ('', "HOLD", 0.0, "Regex Fallback"),
+]
+
+
+@pytest.mark.parametrize("raw,action,amount,reason", CORPUS)
+def test_parse_decision_corpus(raw, action, amount, reason):
+    d = parse_decision(raw)
+    assert (d.action, d.amount_usd) == (action, amount)
+    if reason is not None: assert d.reason == reason
+
+
+def test_think_is_split_from_answer():
+    d = parse_decision('<think>\nline one\n</think>{"action": "HOLD", "amount_usd": 0}')
+    assert d.thought == "line one"
+    assert parse_decision('{"action": "HOLD"}').thought == NO_THOUGHT
+
+
+def test_parse_batch_corpus():
+    raw = ("<think>two coins, [one's fine]</think>```json\n"
+           '[{"symbol": "BTC/USD", "action": "BUY", "amount_usd": 10, "reason": "a"},'
+           " {'symbol': 'ETH/USD', 'action': 'HOLD', 'amount_usd': 0, 'reason': 'b'},"
+           ' {"symbol": "XRP/USD", "action": "BUY", "amount_usd": 1}]\n```')
+    decisions, thought = parse_batch(raw, ["BTC/USD", "ETH/USD"])
+    assert decisions == {"BTC/USD": ("BUY", 10.0, "a"), "ETH/USD": ("HOLD", 0.0, "b")}
+    assert thought == "two coins, [one's fine]"
+
+
+def test_streaming_scan_matches_one_shot():
+    # 流式早停：每次多给几个字符反复 scan()，结果和一次扫完相同
+    for raw, *_ in CORPUS:
+        expected = JsonScanner(has_action).scan(raw)
+        scanner, got = JsonScanner(has_action), None
+        for end in range(1, len(raw) + 1, 3):
+            got = scanner.scan(raw[:end])
+            if got is not None: break
+        if got is None: got = scanner.scan(raw)
+        assert got == expected
+
+
+def test_fuzz_never_raises():
+    rng = random.Random(1234)
+    alphabet = list("{}[]\"':,\\ \nabcBUYSELLHOLD0123456789.") + ["<think>", "</think>", "```json", "```"]
+    seeds = [raw for raw, *_ in CORPUS]
+    for _ in range(3000):
+        if rng.random() < 0.5:
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 80)))
+        else:
+            # 在真实回复上随机截断 / 插入 / 删除
+            text = list(rng.choice(seeds))
+            for _ in range(rng.randint(1, 5)):
+                op, pos = rng.random(), rng.randint(0, len(text))
+                if op < 0.4: text.insert(pos, rng.choice(alphabet))
+                elif op < 0.8 and text: del text[min(pos, len(text) - 1)]
+                else: text = text[:pos]
+            text = "".join(text)
+        d = parse_decision(text)
+        assert d.action in ("BUY", "SELL", "HOLD") or d.reason != "Regex Fallback"
+        assert isinstance(d.amount_usd, float)
+        parse_batch(text, ["BTC/USD"])
+        find_json(text)
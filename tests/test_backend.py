@@ -0,0 +1,29 @@
+import types
+
+import pytest
+
+pytest.importorskip("pandas_ta")
+import backend
+
+
+class FakeREST:
+    def __init__(self, key, secret, url, api_version=None):
+        self._session = None
+
+    def get_account(self):
+        return types.SimpleNamespace(cash="1000", equity="1500")
+
+
+def test_connect_puts_current_keys_on_session(monkeypatch):
+    monkeypatch.setattr(backend.tradeapi, "REST", FakeREST)
+    b = backend.AlpacaBackend()
+
+    success, _ = b.connect("KEY1", "SECRET1", "http://paper")
+    assert success
+    assert b.session.headers["APCA-API-KEY-ID"] == "KEY1"
+    assert b.session.headers["APCA-API-SECRET-KEY"] == "SECRET1"
+
+    # 重连换账户：不能还带着上一个账户的 Key
+    b.connect("KEY2", "SECRET2", "http://paper")
+    assert b.session.headers["APCA-API-KEY-ID"] == "KEY2"
+    assert b.session.headers["APCA-API-SECRET-KEY"] == "SECRET2"
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import Backtester, bar_seconds
+
+
+class AlwaysBuy:
+    needs_report = False
+
+    def __call__(self, ctx):
+        return "BUY", 100.0, "test"
+
+
+def make_bars(n, unit):
+    index = pd.date_range("2026-01-01", periods=n, freq="1min", tz="UTC", unit=unit)
+    close = 100 + np.sin(np.arange(n) / 10.0)
+    return pd.DataFrame({"open": close, "high": close + 1, "low": close - 1, "close": close, "volume": 1.0}, index=index)
+
+
+@pytest.mark.parametrize("unit", ["ns", "us", "ms", "s"])
+def test_bar_seconds_is_unit_independent(unit):
+    index = make_bars(3, unit).index
+    assert bar_seconds(index).tolist() == [1767225600, 1767225660, 1767225720]
+
+
+@pytest.mark.parametrize("unit", ["ns", "us"])
+def test_cooldown_counts_bar_time(unit):
+    # 300 秒冷却 + 1 分钟 K 线：每 5 根 K 线才能再买一次，和索引精度无关
+    res = Backtester("TEST", AlwaysBuy(), cash=1e6, cooldown=300).run(make_bars(200, unit))
+    buys = res["trade_log"]
+    assert len(buys) > 10
+    gaps = buys["time"].diff().dropna().unique()
+    assert list(gaps) == [pd.Timedelta(minutes=5)]
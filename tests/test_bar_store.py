@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from bar_store import BAR_DTYPE, BarStore
+
+
+def bars(start, n, close=100.0):
+    index = pd.date_range(start, periods=n, freq="1min", tz="UTC")
+    c = close + np.arange(n, dtype=float)
+    return pd.DataFrame({"open": c, "high": c + 1, "low": c - 1, "close": c, "volume": 1.0}, index=index)
+
+
+def day_file(store, symbol="BTC/USD", day="2026-01-01"):
+    return os.path.join(store._dir(symbol, "1Min"), day + ".bin")
+
+
+def test_unchanged_forming_bar_is_not_reappended(tmp_path):
+    store = BarStore(str(tmp_path))
+    df = bars("2026-01-01 00:00", 10)
+    assert store.append("BTC/USD", "1Min", df) == 10
+    size = os.path.getsize(day_file(store))
+
+    # 图表每 5 秒刷新：增量拉取总会带上最后一根
+    for _ in range(20):
+        assert store.append("BTC/USD", "1Min", df.tail(1)) == 0
+    assert os.path.getsize(day_file(store)) == size
+
+
+def test_changed_forming_bar_is_overwritten_in_place(tmp_path):
+    store = BarStore(str(tmp_path))
+    df = bars("2026-01-01 00:00", 10)
+    store.append("BTC/USD", "1Min", df)
+    size = os.path.getsize(day_file(store))
+
+    forming = df.tail(1).copy()
+    for v in range(5):
+        forming["close"] = 500.0 + v
+        assert store.append("BTC/USD", "1Min", forming) == 1
+    assert os.path.getsize(day_file(store)) == size
+
+    # 新的一根照常追加
+    store.append("BTC/USD", "1Min", bars("2026-01-01 00:10", 1, close=7.0))
+    out = store.read("BTC/USD", "1Min")
+    assert len(out) == 11
+    assert out["close"].iloc[-2] == 504.0
+    assert out["close"].iloc[-1] == 7.0
+
+
+def test_torn_tail_is_truncated_before_append(tmp_path):
+    store = BarStore(str(tmp_path))
+    store.append("BTC/USD", "1Min", bars("2026-01-01 00:00", 5))
+    with open(day_file(store), "ab") as f:
+        f.write(b"\x01" * 17)  # 进程被杀，最后一条只写了一半
+
+    store.append("BTC/USD", "1Min", bars("2026-01-01 00:05", 3, close=200.0))
+    assert os.path.getsize(day_file(store)) == 8 * BAR_DTYPE.itemsize
+    out = BarStore(str(tmp_path)).read("BTC/USD", "1Min")
+    assert len(out) == 8
+    assert out.index.is_monotonic_increasing
+    assert out["close"].tolist() == [100, 101, 102, 103, 104, 200, 201, 202]
@@ -0,0 +1,110 @@
+import threading
+import time
+import types
+
+import pytest
+import requests
+
+pytest.importorskip("pandas_ta")
+import config
+import engine as engine_mod
+from engine_client import RemoteEngine
+
+
+class StubBackend:
+    connected = True
+    credentials = ("key", "secret")
+    feed = None
+
+    def __init__(self):
+        self.orders = types.SimpleNamespace(start_stream=lambda *a: None, stop_stream=lambda: None)
+        self.connects = []
+
+    def connect(self, key, secret, url):
+        self.connects.append(key)
+        return True, "ok"
+
+
+def make_engine(monkeypatch, linger=0.0):
+    """行情 / 策略循环换成空转：running 变 False 后再拖 linger 秒才退出 (模拟这一轮还在收尾)"""
+    monkeypatch.setattr(config, "USE_STREAM", False)
+    eng = engine_mod.TradingEngine(backend=StubBackend(), ai=object(), journal=object())
+
+    def loop():
+        while eng.running: time.sleep(0.01)
+        time.sleep(linger)
+    monkeypatch.setattr(eng, "monitor_prices_loop", loop)
+    monkeypatch.setattr(eng, "strategy_loop", loop)
+    return eng
+
+
+def loops_alive():
+    return [t for t in threading.enumerate() if t.name in ("monitor", "strategy-loop")]
+
+
+def test_restart_waits_for_old_loops(monkeypatch):
+    eng = make_engine(monkeypatch, linger=0.3)
+    assert eng.start(["BTC/USD"])[0]
+    old = list(eng.threads)
+    eng.stop()
+    assert eng.start(["BTC/USD"])[0]
+    assert not any(t.is_alive() for t in old)
+    assert len(loops_alive()) == 2
+    eng.stop()
+    for t in eng.threads: t.join()
+
+
+def test_restart_refused_while_old_loops_busy(monkeypatch):
+    monkeypatch.setattr(config, "ENGINE_JOIN_SECONDS", 0.05)
+    eng = make_engine(monkeypatch, linger=0.5)
+    eng.start(["BTC/USD"])
+    eng.stop()
+    success, _ = eng.start(["BTC/USD"])
+    assert not success and not eng.running
+    for t in eng.threads: t.join()
+    assert eng.start(["BTC/USD"])[0]
+    eng.stop()
+
+
+def test_http_requires_token(monkeypatch):
+    eng = make_engine(monkeypatch)
+    server = engine_mod.serve(eng, "s3cret", port=18440)
+    url = "http://127.0.0.1:18440"
+    try:
+        assert server.server_address[0] == "127.0.0.1"
+        assert requests.get(f"{url}/state", timeout=5).status_code == 401
+        assert requests.get(f"{url}/state", headers={config.ENGINE_TOKEN_HEADER: "wrong"}, timeout=5).status_code == 401
+        resp = requests.post(f"{url}/connect", json={"key": "K", "secret": "S"}, timeout=5)
+        assert resp.status_code == 401 and eng.backend.connects == []
+
+        client = RemoteEngine(url, "s3cret")
+        assert client.connected
+        assert client.connect("K", "S") == (True, "ok") and eng.backend.connects == ["K"]
+        assert not RemoteEngine(url, "wrong").connect("K", "S")[0]
+
+        # 非 ASCII 的令牌 (http.server 按 latin-1 解出来) 也只是 401，连接不能断
+        raw = requests.Request("GET", f"{url}/state", headers={config.ENGINE_TOKEN_HEADER: "é".encode("latin-1")}).prepare()
+        assert requests.Session().send(raw, timeout=5).status_code == 401
+        headers = {config.ENGINE_TOKEN_HEADER: "s3cret"}
+        assert requests.get(f"{url}/events", params={"since": "abc"}, headers=headers, timeout=5).status_code == 400
+        assert requests.get(f"{url}/events", params={"since": "0"}, headers=headers, timeout=5).status_code == 200
+    finally:
+        server.shutdown()
+
+
+def test_serve_refuses_empty_token(monkeypatch):
+    with pytest.raises(ValueError):
+        engine_mod.serve(make_engine(monkeypatch), "", port=18441)
+
+
+def test_extreme_rsi_goes_to_ai_as_sell_candidate(monkeypatch):
+    eng = make_engine(monkeypatch)
+    eng.prefilter = engine_mod.PreFilter(rules=config.PREFILTER_RULES, enabled=True)
+    eng.backend.get_position = lambda symbol: (2.0, 0.0, 101.0)  # 持仓小幅浮亏 (没到止损)：不能当成 "take profit" 全卖
+    eng.backend.hints = {"BTC/USD": {'trend': "UP", 'rsi': 85.0, 'rsi_state': "OVERBOUGHT"}}
+    eng.running, eng.market_cache = True, {"BTC/USD": {}}
+    decision, request = eng.guard_symbol("BTC/USD", (100.0, "report"))
+    eng.running = False
+    assert decision is None
+    assert request['priority'] == engine_mod.PRIORITY_STOP
+    assert request['report'].startswith("report\n[PRE-FILTER] SELL CANDIDATE")
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import EMA, MACD, RSI, IndicatorEngine, ema_series, macd_series, rsi_series
+
+TOL = dict(rtol=1e-9, atol=1e-9)
+
+
+def make_bars(n=120, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    volume = rng.uniform(1, 10, n)
+    index = pd.date_range("2024-01-01", periods=n, freq="1min", tz="UTC")
+    return pd.DataFrame({"close": close, "volume": volume}, index=index)
+
+
+def as_float(x):
+    return np.nan if x is None else x
+
+
+@pytest.mark.parametrize("close", [make_bars()['close'].to_numpy(),
+                                   np.r_[np.full(20, 50.0), make_bars(60)['close'].to_numpy()]])  # 开头横盘: RSI 为 NaN
+def test_streaming_matches_series_including_warmup(close):
+    ema, rsi, macd = EMA(20), RSI(14), MACD()
+    got_ema = [as_float(ema.update(x)) for x in close]
+    got_rsi = [as_float(rsi.update(x)) for x in close]
+    got_macd = np.array([[as_float(v) for v in macd.update(x)] for x in close])
+
+    np.testing.assert_allclose(got_ema, ema_series(close, 20), **TOL)
+    np.testing.assert_allclose(got_rsi, rsi_series(close, 14), **TOL)
+    for col, expected in enumerate(macd_series(close)):
+        np.testing.assert_allclose(got_macd[:, col], expected, **TOL)
+
+
+def test_peek_matches_update():
+    close = make_bars(60)['close'].to_numpy()
+    ema, rsi, macd = EMA(20), RSI(14), MACD()
+    for x in close:
+        assert (ema.peek(x), rsi.peek(x), macd.peek(x)) == (ema.update(x), rsi.update(x), macd.update(x))
+
+
+def test_engine_snapshot_matches_series():
+    df = make_bars()
+    close = df['close'].to_numpy()
+    vol = df['volume'].to_numpy()
+    ema, rsi = ema_series(close, 20), rsi_series(close, 14)
+    macd, sig, hist = macd_series(close)
+    vol_ma = pd.Series(vol).rolling(20).mean().to_numpy()
+
+    engine, tail = IndicatorEngine(ema_len=20, rsi_len=14, vol_len=20, tail=12), 12
+    for t in range(len(df)):
+        snap = engine.update(df.iloc[:t + 1])  # 逐根增长，最后一根只 peek
+        window = slice(t - tail + 1, t + 1)
+        warm = t + 1 >= tail and not np.isnan(ema[t]) and not np.isnan(rsi[window]).any() and not np.isnan(macd[window]).any()
+        assert (snap is not None) == warm, t
+        if snap is None: continue
+        np.testing.assert_allclose(
+            [snap['ema'], snap['rsi'], snap['macd'], snap['macd_signal'], snap['macd_hist'], snap['vol_ma']],
+            [ema[t], rsi[t], macd[t], sig[t], hist[t], vol_ma[t]], **TOL)
+        np.testing.assert_allclose(snap['rsi_seq'], rsi[window], **TOL)
+        np.testing.assert_allclose(snap['macd_seq'], macd[window], **TOL)
+
+
+def test_engine_replays_after_gap():
+    df = make_bars()
+    engine = IndicatorEngine()
+    engine.update(df.iloc[:50])
+    gapped = df.iloc[60:]  # 缓存断档: 上次的时间戳不在新数据里，从头重放
+    assert engine.update(gapped) == IndicatorEngine().update(gapped)
+
+
+def test_series_match_pandas_ta():
+    ta = pytest.importorskip("pandas_ta")
+    close = make_bars(200)['close']
+    np.testing.assert_allclose(ema_series(close, 20), ta.ema(close, length=20, talib=False).to_numpy(), **TOL)
+    np.testing.assert_allclose(rsi_series(close, 14), ta.rsi(close, length=14, talib=False).to_numpy(), **TOL)
+    expected = ta.macd(close, talib=False)
+    for got, col in zip(macd_series(close), ("MACD_12_26_9", "MACDs_12_26_9", "MACDh_12_26_9")):
+        np.testing.assert_allclose(got, expected[col].to_numpy(), **TOL)
@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+import config
+import fake_ollama
+from ai_agent import DeepSeekAgent
+from decision_cache import DecisionCache
+from inference import PRIORITY_ENTRY, PRIORITY_HELD, PRIORITY_STOP, InferenceClient
+
+
+@pytest.fixture
+def fake():
+    """起一个假 Ollama，返回 (url, handler)；每个测试用自己的端口 / 计数器"""
+    servers = []
+
+    def make(port, **options):
+        server, handler = fake_ollama.serve(port=port, **dict(dict(token_delay=0.005, think_tokens=10), **options))
+        servers.append(server)
+        return f"http://127.0.0.1:{port}/api/generate", handler
+    yield make
+    for server in servers: server.shutdown()
+
+
+def client_for(endpoints, **model_endpoints):
+    """模型 "m" 默认走第一个地址 (没映射的模型会走 config.OLLAMA_URL)"""
+    return InferenceClient(endpoints=endpoints, model_endpoints=dict({"m": next(iter(endpoints))}, **model_endpoints), timeout=10)
+
+
+def payload(model, prompt):
+    return {"model": model, "prompt": prompt, "system": "", "options": {}}
+
+
+def test_concurrent_submit_from_cold_client(fake):
+    url, handler = fake(18442)
+    client = client_for({url: 4})
+    barrier, results, errors = threading.Barrier(4), [], []
+
+    def call(i):
+        barrier.wait()  # 4 个策略线程同时第一次调用，事件循环还没起来
+        try:
+            results.append(client.generate(payload("m", f"job {i}"))['status'])
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(4)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert errors == [] and results == [200] * 4
+
+
+def test_priority_order(fake):
+    url, handler = fake(18443)
+    client = client_for({url: 1})
+    blocker = client.submit(payload("m", "blocker"))
+    while handler.active == 0: time.sleep(0.005)  # 唯一的并发名额被占住，后面的都在排队
+
+    futures = [client.submit(payload("m", name), priority)
+               for name, priority in (("entry", PRIORITY_ENTRY), ("held", PRIORITY_HELD), ("stop", PRIORITY_STOP))]
+    for f in [blocker] + futures: assert f.result(timeout=30)['status'] == 200
+    assert [b['prompt'] for b in handler.received] == ["blocker", "stop", "held", "entry"]
+
+
+def test_endpoint_concurrency_caps(fake):
+    url_a, a = fake(18444)
+    url_b, b = fake(18445)
+    client = client_for({url_a: 2, url_b: 1}, big=url_a, small=url_b)
+    # 不早停：客户端读到最后一个 chunk 才释放名额，服务端的并发计数才准
+    futures = [client.submit(payload(model, f"{model} {i}"), early_stop=False) for model in ("big", "small") for i in range(4)]
+    for f in futures: assert f.result(timeout=30)['status'] == 200
+    assert {x['model'] for x in a.received} == {"big"} and {x['model'] for x in b.received} == {"small"}
+    assert (a.peak, b.peak) == (2, 1)
+
+
+def test_non_stream_uses_queue(fake, monkeypatch):
+    monkeypatch.setattr(config, "OLLAMA_STREAM", False)
+    url, handler = fake(18446)
+    agent = DeepSeekAgent()
+    agent.client = client_for({url: 1})
+    threads = [threading.Thread(target=agent._generate, args=(agent._payload("m", f"p {i}"),)) for i in range(3)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert len(handler.received) == 3 and handler.peak == 1  # 非流式也受并发上限约束
+    assert all(b['stream'] is False for b in handler.received)
+
+    status, raw = agent._generate(agent._payload("m", "once"))
+    assert status == 200 and '"action"' in raw
+
+
+@pytest.mark.parametrize("hold_ratio,deep_calls", [(1.0, 0), (0.0, 1)])
+def test_screen_model_routing(fake, monkeypatch, hold_ratio, deep_calls):
+    deep_url, deep = fake(18447 + int(hold_ratio), hold_ratio=0.0)
+    screen_url, screen = fake(18449 + int(hold_ratio), hold_ratio=hold_ratio)
+    monkeypatch.setattr(config, "AI_SCREEN_MODEL", "screen")
+    agent = DeepSeekAgent()
+    agent.cache = DecisionCache(enabled=False)
+    agent.client = client_for({deep_url: 1, screen_url: 1}, deep=deep_url, screen=screen_url)
+
+    items = [{'symbol': s, 'price': 100.0, 'report': "", 'qty': 0, 'avg': 0} for s in ("BTC/USD", "ETH/USD")]
+    results = agent.analyze_batch("deep", items, 1000, 1000, {})
+    assert set(results) == {"BTC/USD", "ETH/USD"}
+    assert [b['model'] for b in screen.received] == ["screen"]
+    # 初筛全判 HOLD 时不调用推理模型；全部放行时两个币种一起进一次批量推理
+    assert [b['model'] for b in deep.received] == ["deep"] * deep_calls
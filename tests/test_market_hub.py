@@ -0,0 +1,82 @@
+import threading
+import time
+
+import config
+import market_hub
+from market_hub import HubClient, MarketHub
+
+
+class FakeCache:
+    def get(self, symbol, tf_key):
+        return None
+
+
+class SlowBackend:
+    """get_bars_cached 模拟一次慢的网络请求，记录每次拉了哪些币种"""
+    def __init__(self, delay=0.3):
+        self.delay = delay
+        self.fetches = []
+        self.bar_cache = FakeCache()
+
+    def get_bars_cached(self, symbols, tf_key):
+        self.fetches.append(sorted(symbols))
+        time.sleep(self.delay)
+
+    def get_latest_prices(self, symbols):
+        return {s: 1.0 for s in symbols}
+
+
+def make_hub(backend):
+    hub = MarketHub.__new__(MarketHub)  # 不开 Listener
+    hub.backend = backend
+    hub._fresh, hub._inflight = {}, {}
+    hub._bars_lock = threading.Lock()
+    hub.stats = {'bar_requests': 0, 'bar_fetches': 0}
+    return hub
+
+
+def run_all(*targets):
+    threads = [threading.Thread(target=t) for t in targets]
+    t0 = time.time()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return time.time() - t0
+
+
+def test_different_symbols_fetch_in_parallel():
+    backend = SlowBackend()
+    hub = make_hub(backend)
+    elapsed = run_all(lambda: hub.get_bars(["BTC/USD"], "1Min"), lambda: hub.get_bars(["ETH/USD"], "1Min"))
+    assert sorted(backend.fetches) == [["BTC/USD"], ["ETH/USD"]]
+    assert elapsed < 2 * backend.delay  # 锁里不做网络请求，两个分片不用排队
+
+
+def test_same_symbols_fetched_once():
+    backend = SlowBackend()
+    hub = make_hub(backend)
+    run_all(*[lambda: hub.get_bars(["BTC/USD", "ETH/USD"], "1Min")] * 4)
+    assert backend.fetches == [["BTC/USD", "ETH/USD"]]
+    assert hub.stats == {'bar_requests': 4, 'bar_fetches': 1}
+
+
+def test_client_restart_leaves_one_listener(monkeypatch):
+    monkeypatch.setattr(config, "USE_STREAM", False)
+    monkeypatch.setattr(config, "HUB_PUBLISH_SECONDS", 0.05)
+    address, authkey = ("127.0.0.1", 18438), b"test-key"
+    hub = MarketHub(SlowBackend(), address, authkey)
+    threading.Thread(target=hub.run, daemon=True).start()
+    assert market_hub.wait_for_hub(address, authkey, timeout=5)
+
+    ticks = []
+    client = HubClient(address, authkey, on_trade=lambda s, p: ticks.append(threading.current_thread()))
+    client.start(["BTC/USD"])
+    time.sleep(0.3)
+    client.stop()
+    client.start(["BTC/USD"])  # 旧线程还卡在 recv 里
+    time.sleep(0.5)
+    listeners = [t for t in threading.enumerate() if t.name == "hub-client"]
+    assert len(listeners) == 1
+    ticks.clear()
+    time.sleep(0.3)
+    assert ticks and set(ticks) == set(listeners)
+    client.stop()
@@ -0,0 +1,43 @@
+import asyncio
+import threading
+import time
+
+import fake_stream
+from market_stream import MarketStream
+
+
+def test_stream_connects_and_receives_trades():
+    # 连本地假行情服务器：验证当前安装的 websockets 版本接受 connect() 的请求头参数
+    port = 18439
+    threading.Thread(target=lambda: asyncio.run(fake_stream.serve("127.0.0.1", port, tick_interval=0.05)), daemon=True).start()
+    ticks = []
+    stream = MarketStream("key", "secret", on_trade=lambda s, p: ticks.append(s), url=f"ws://127.0.0.1:{port}")
+    stream.start(["BTC/USD"])
+    deadline = time.time() + 10
+    while not ticks and time.time() < deadline: time.sleep(0.05)
+    stream.stop()
+    assert ticks and ticks[0] == "BTC/USD"
+    assert stream.last_price("BTC/USD") is not None
+
+
+def test_stop_closes_socket_and_allows_quick_restart():
+    port = 18452
+    threading.Thread(target=lambda: asyncio.run(fake_stream.serve("127.0.0.1", port, tick_interval=0.05)), daemon=True).start()
+    ticks = []
+    stream = MarketStream("key", "secret", on_trade=lambda s, p: ticks.append(time.time()), url=f"ws://127.0.0.1:{port}")
+    stream.start(["BTC/USD"])
+    deadline = time.time() + 10
+    while not ticks and time.time() < deadline: time.sleep(0.05)
+    old = stream._thread
+
+    t0 = time.time()
+    stream.stop()
+    assert not old.is_alive() and time.time() - t0 < 2  # 不用等 recv 的 5 秒超时
+    assert not stream._sockets
+
+    stopped_at = time.time()
+    stream.start(["BTC/USD"])
+    deadline = time.time() + 10
+    while not [t for t in ticks if t > stopped_at] and time.time() < deadline: time.sleep(0.05)
+    assert [t for t in ticks if t > stopped_at]
+    stream.stop()
@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+import fake_ollama
+from ai_parser import has_action, split_think
+from inference import InferenceClient
+from ollama_client import OllamaClient, StreamState
+
+
+def test_stream_state_think_then_early_stop():
+    pieces = []
+    state = StreamState(on_think=pieces.append)
+    chunks = ["<thi", "nk>RSI is ", "high, trend ", "up</th", "ink>\n{\"action\": ", "\"SELL\", \"amount_usd\": 5}", " extra"]
+    done_at = None
+    for i, text in enumerate(chunks):
+        if state.feed({"response": text, "done": False}) and done_at is None: done_at = i
+    assert "".join(pieces) == "RSI is high, trend up"
+    assert len(pieces) >= 3  # 边生成边回调，不是最后一次性给
+    assert done_at == 5 and state.result == {"action": "SELL", "amount_usd": 5}
+    assert not state.done
+
+
+def test_stream_state_thinking_field():
+    pieces = []
+    state = StreamState(on_think=pieces.append)
+    state.feed({"thinking": "a "})
+    state.feed({"thinking": "b"})
+    assert state.feed({"response": '{"action": "HOLD"}'})
+    assert pieces == ["a ", "b"]
+    assert split_think(state.raw) == ("a b", '{"action": "HOLD"}')
+
+
+@pytest.fixture
+def fake():
+    server, handler = fake_ollama.serve(port=18451, token_delay=0.005, think_tokens=20)
+    yield "http://127.0.0.1:18451/api/generate", handler
+    server.shutdown()
+    server.server_close()
+
+
+def check_early_stop(out, pieces, handler):
+    assert out['status'] == 200 and out['early_stop'] is True
+    assert has_action(out['result'])
+    assert out['stats'] == {}           # 最后一个带统计的 chunk 没收到就断开了
+    assert "Extra" not in out['raw']    # 模型后面的啰嗦没有读
+    thought, _ = split_think(out['raw'])
+    assert len(pieces) > 1 and "".join(pieces).strip() == thought
+    deadline = time.time() + 5
+    while handler.early_stops == 0 and time.time() < deadline: time.sleep(0.01)
+    assert handler.early_stops == 1     # 服务端看到连接被关掉，停止生成
+
+
+def test_inference_client_streams_and_stops_early(fake):
+    url, handler = fake
+    pieces = []
+    client = InferenceClient(endpoints={url: 1}, model_endpoints={"m": url}, timeout=10)
+    out = client.generate({"model": "m", "prompt": "p"}, on_think=pieces.append)
+    check_early_stop(out, pieces, handler)
+
+
+def test_ollama_client_streams_and_stops_early(fake):
+    url, handler = fake
+    pieces = []
+    out = OllamaClient(url, timeout=10).generate({"model": "m", "prompt": "p"}, on_think=pieces.append)
+    check_early_stop(out, pieces, handler)
@@ -0,0 +1,52 @@
+import pytest
+
+import config
+from prefilter import PreFilter
+
+
+def hints(trend="FLAT", rsi=50.0, state="NEUTRAL"):
+    return {'trend': trend, 'rsi': rsi, 'rsi_state': state}
+
+
+@pytest.mark.parametrize("qty,h,expected", [
+    (0, hints("DOWN", 45), ("HOLD", 0.0)),                   # 空仓 + 下跌
+    (0, hints("DOWN", 25, "OVERSOLD"), None),                # 下跌但超卖：交给 AI 看反弹
+    (0, hints("UP", 75, "OVERBOUGHT"), ("HOLD", 0.0)),       # 空仓 + 超买：不追高
+    (0, hints("UP", 55), None),
+    (1, hints("DOWN", 45), None),                            # 有持仓的下跌由 AI / 止损处理
+    (1, hints("UP", 85, "OVERBOUGHT"), None),                # 极端超买默认不直接卖
+])
+def test_rules(qty, h, expected):
+    decision = PreFilter(rules=config.PREFILTER_RULES, enabled=True).decide("BTC/USD", qty, 100.0, h)
+    assert (decision[:2] if decision else None) == expected
+
+
+def test_extreme_rsi_is_sell_candidate_by_default():
+    pf = PreFilter(rules=config.PREFILTER_RULES, enabled=True)
+    flag = pf.sell_candidate(2, hints("UP", 85, "OVERBOUGHT"))
+    assert "SELL CANDIDATE" in flag and "85.0 > 80" in flag
+    assert pf.sell_candidate(0, hints("UP", 85, "OVERBOUGHT")) is None   # 空仓没东西可卖
+    assert pf.sell_candidate(2, hints("UP", 75, "OVERBOUGHT")) is None   # 没到极端
+    assert PreFilter(rules=config.PREFILTER_RULES, enabled=False).sell_candidate(2, hints(rsi=85)) is None
+    assert PreFilter(rules=dict(config.PREFILTER_RULES, held_extreme_rsi_sell=None), enabled=True).sell_candidate(2, hints(rsi=85)) is None
+
+
+def test_extreme_rsi_partial_sell_when_configured():
+    pf = PreFilter(rules=dict(config.PREFILTER_RULES, held_extreme_rsi_sell_fraction=0.5), enabled=True)
+    action, amount_usd, reason = pf.decide("BTC/USD", 2, 100.0, hints("UP", 85, "OVERBOUGHT"))
+    assert (action, amount_usd) == ("SELL", 100.0)
+    assert "take profit" not in reason
+
+
+def test_disabled_and_missing_hints_go_to_ai():
+    assert PreFilter(enabled=False).decide("BTC/USD", 0, 100.0, hints("DOWN")) is None
+    assert PreFilter(enabled=True).decide("BTC/USD", 0, 100.0, None) is None
+
+
+def test_stats_skip_rate():
+    pf = PreFilter(rules=config.PREFILTER_RULES, enabled=True)
+    pf.decide("BTC/USD", 0, 100.0, hints("DOWN"))
+    pf.decide("BTC/USD", 0, 100.0, hints("UP"))
+    stats = pf.stats()["BTC/USD"]
+    assert (stats['seen'], stats['skipped'], stats['skip_rate']) == (2, 1, 0.5)
+    assert stats['rules'] == {'flat_downtrend_hold': 1}
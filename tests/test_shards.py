@@ -0,0 +1,32 @@
+import pytest
+
+pytest.importorskip("pandas_ta")
+import config
+from shards import plan_shards
+
+
+def account(name, key, symbols="BTC/USD,ETH/USD", **extra):
+    return dict(name=name, api_key=key, api_secret="s", symbols=symbols, **extra)
+
+
+def test_one_shard_per_account_and_shared_budget():
+    hub, shards = plan_shards({"engine_token": "t", "accounts": [account("a", "K1"), account("b", "K2", rate_limit=100)]})
+    assert [s['name'] for s in shards] == ["a", "b"]
+    assert shards[0]['symbols'] == ["BTC/USD", "ETH/USD"]
+    # 行情中心默认用第一个账户的 Key，和分片 a 平分预算
+    assert hub['rate_limit'] == shards[0]['rate_limit'] == config.ALPACA_RATE_LIMIT_PER_MIN / 2
+    assert shards[1]['rate_limit'] == 100
+
+
+@pytest.mark.parametrize("accounts", [
+    [account("a", "K1", processes=2)],
+    [account("a", "K1"), account("b", "K1", symbols="SOL/USD")],
+])
+def test_refuses_to_split_one_account(accounts):
+    with pytest.raises(ValueError):
+        plan_shards({"engine_token": "t", "accounts": accounts})
+
+
+def test_requires_engine_token():
+    with pytest.raises(ValueError):
+        plan_shards({"accounts": [account("a", "K1")]})
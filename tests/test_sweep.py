@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import Backtester, RulePolicy, load_bars
+from sweep import _run_group
+
+
+@pytest.fixture
+def bars_csv(tmp_path):
+    rng = np.random.default_rng(7)
+    n = 5000
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    index = pd.date_range("2026-01-01", periods=n, freq="1min", tz="UTC")
+    df = pd.DataFrame({"open": close, "high": close * 1.001, "low": close * 0.999, "close": close, "volume": 1.0}, index=index)
+    path = tmp_path / "bars.csv"
+    df.to_csv(path, index_label="timestamp")
+    return str(path)
+
+
+@pytest.mark.parametrize("cooldown", [0, 300, 1800])
+def test_sweep_matches_backtester(bars_csv, cooldown):
+    # load_bars 读出来的索引精度不一定是 ns，两边的冷却都要按 K 线秒数算
+    p = {"ema_len": 20, "rsi_len": 14, "overbought": 70, "oversold": 30, "cooldown": cooldown,
+         "stop_pct": -0.01, "stop_min_value": 50, "max_cash_fraction": 0.5}
+    (row,) = _run_group(("TEST", bars_csv, 20, 14, [p], 10000.0, 5e-4, 1e-3))
+
+    bt = Backtester("TEST", RulePolicy(), cash=10000.0, slippage_bps=5, fee_bps=10,
+                    cooldown=cooldown, stop_pct=-0.01, stop_min_value=50, max_cash_fraction=0.5,
+                    ema_len=20, rsi_len=14, overbought=70, oversold=30)
+    res = bt.run(load_bars(bars_csv))
+    assert row["trades"] == res["trades"]
+    assert row["return_pct"] == pytest.approx(res["return_pct"], abs=1e-6)
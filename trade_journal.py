@@ -0,0 +1,128 @@
+# trade_journal.py
+"""
+📓 成交日志：SQLite (WAL 模式) 只追加，按 (币种, 时间) 建索引
+- 每笔成交一条 INSERT，不再整本重写 trade_history.json
+- 图表只查可见时间窗口内的成交：每个币种的成交时间第一次查询后以 int64 缓存在内存，之后只做二分切片
+- 第一次启动时自动导入旧的 trade_history.json
+"""
+import bisect
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+import config
+
+LEGACY_FILE = "trade_history.json"
+
+
+def _to_utc(t):
+    """时间 -> UTC 的 pd.Timestamp (不带时区的按 UTC 处理)"""
+    t = pd.Timestamp(t)
+    return t.tz_convert('UTC') if t.tz is not None else t.tz_localize('UTC')
+
+
+def nearest_bar(bar_ts, trade_ts):
+    """
+    📍 每笔成交对应最近的一根 K 线 (整数下标)，等价于 get_indexer(method='nearest')，距离相同取后一根
+    bar_ts / trade_ts: 升序 int64 纳秒数组
+    """
+    if len(bar_ts) < 2: return np.zeros(len(trade_ts), dtype=np.intp)  # 调用方保证至少有一根 K 线
+    right = np.clip(np.searchsorted(bar_ts, trade_ts), 1, len(bar_ts) - 1)
+    left = right - 1
+    return np.where(bar_ts[right] - trade_ts <= trade_ts - bar_ts[left], right, left)
+
+
+class TradeJournal:
+    def __init__(self, path=None, legacy_file=LEGACY_FILE):
+        self.path = path or config.TRADE_JOURNAL_FILE
+        # 策略线程记账、UI 线程画图共用一个连接，用锁串行
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._marks = {}  # {symbol: ([ts 纳秒], [action])} 图表用的时间索引缓存 (按时间排序)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")  # WAL 下每笔提交不必等 fsync
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS trades (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                symbol TEXT NOT NULL,
+                ts INTEGER NOT NULL,   -- UTC 纳秒
+                time TEXT NOT NULL,    -- ISO 格式 (与旧 trade_history.json 一致)
+                action TEXT NOT NULL,
+                price REAL)""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS trades_symbol_ts ON trades (symbol, ts)")
+            self._conn.commit()
+        if legacy_file: self._import_legacy(legacy_file)
+
+    def _import_legacy(self, legacy_file):
+        """旧版 {symbol: [{'time', 'action', 'price'}]} 导入一次 (日志里已经有记录就不再导入)"""
+        if not os.path.exists(legacy_file): return
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM trades LIMIT 1").fetchone(): return
+        try:
+            with open(legacy_file, "r") as f: legacy = json.load(f)
+        except Exception as e:
+            print(f"Trade History Import Error: {e}")
+            return
+        rows = []
+        for symbol, trades in legacy.items():
+            for trade in trades:
+                try:
+                    t = _to_utc(trade['time'])
+                    rows.append((symbol, t.value, t.isoformat(), trade['action'], trade.get('price')))
+                except Exception:
+                    continue
+        with self._lock:
+            self._conn.executemany("INSERT INTO trades (symbol, ts, time, action, price) VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+        print(f"📓 已从 {legacy_file} 导入 {len(rows)} 笔历史成交")
+
+    def record(self, symbol, action, price, when=None):
+        """追加一笔成交 (when 默认现在，统一存 UTC 才能和 Alpaca 的 K 线对齐)"""
+        t = _to_utc(when if when is not None else pd.Timestamp.now(tz='UTC'))
+        with self._lock:
+            self._conn.execute("INSERT INTO trades (symbol, ts, time, action, price) VALUES (?, ?, ?, ?, ?)",
+                               (symbol, t.value, t.isoformat(), action, price))
+            self._conn.commit()
+            marks = self._marks.get(symbol)
+            if marks is not None:
+                i = bisect.bisect_right(marks[0], t.value)
+                marks[0].insert(i, t.value)
+                marks[1].insert(i, action)
+
+    def query(self, symbol, start=None, end=None):
+        """
+        查 [start, end] 时间窗口内某个币种的成交 (按时间排序)
+        Returns: [{'time': ISO 字符串 (UTC), 'action', 'price'}]
+        """
+        sql, args = "SELECT time, action, price FROM trades WHERE symbol = ?", [symbol]
+        if start is not None:
+            sql += " AND ts >= ?"
+            args.append(_to_utc(start).value)
+        if end is not None:
+            sql += " AND ts <= ?"
+            args.append(_to_utc(end).value)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY ts", args).fetchall()
+        return [{"time": t, "action": action, "price": price} for t, action, price in rows]
+
+    def markers(self, symbol, start=None, end=None):
+        """
+        图表标记用：[start, end] 内的成交
+        Returns: (ts int64 纳秒数组, action 数组)
+        """
+        with self._lock:
+            marks = self._marks.get(symbol)
+            if marks is None:
+                rows = self._conn.execute("SELECT ts, action FROM trades WHERE symbol = ? ORDER BY ts", (symbol,)).fetchall()
+                marks = self._marks[symbol] = ([r[0] for r in rows], [r[1] for r in rows])
+            lo = bisect.bisect_left(marks[0], _to_utc(start).value) if start is not None else 0
+            hi = bisect.bisect_right(marks[0], _to_utc(end).value) if end is not None else len(marks[0])
+            return np.array(marks[0][lo:hi], dtype=np.int64), np.array(marks[1][lo:hi], dtype=object)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,68 @@
+# ui_dispatch.py
+"""
+🎞️ 界面更新调度：后台线程只做标记，主线程按固定帧率一次性刷新
+- 表格：mark_dirty(symbol) 只把币种放进脏集合，同一帧内重复标记只刷新一次
+- 日志：log() 先进队列，每帧同一个文本框的消息拼成一次 insert，超过 LOG_MAX_LINES 行就删掉最早的
+不再为每个币种 / 每条日志往 Tk 事件队列里塞一个 after(0) 回调
+"""
+import threading
+import tkinter as tk
+from collections import deque
+
+import config
+
+
+class UIDispatcher:
+    def __init__(self, render_row, log_widgets, max_lines=None):
+        """
+        render_row: 主线程里刷新一行表格的函数 (参数为 symbol)
+        log_widgets: {名字: ScrolledText}
+        """
+        self.render_row = render_row
+        self.log_widgets = log_widgets
+        self.max_lines = max_lines or config.LOG_MAX_LINES
+        self._dirty = set()
+        self._logs = deque()  # (名字, 文本, tag)
+        self._lock = threading.Lock()
+
+    def mark_dirty(self, symbol):
+        """【任意线程】这个币种的表格行需要刷新"""
+        with self._lock:
+            self._dirty.add(symbol)
+
+    def log(self, name, text, tag=None):
+        """【任意线程】追加一段日志文本 (自己带换行)"""
+        self._logs.append((name, text, tag))
+
+    def flush(self):
+        """【主线程】每帧调用一次：刷新脏行 + 批量写日志"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        for symbol in dirty:
+            self.render_row(symbol)
+
+        # 同一个文本框、同一个 tag 的连续消息合并成一次 insert
+        batches = []
+        while self._logs:
+            name, text, tag = self._logs.popleft()
+            if batches and batches[-1][0] == name and batches[-1][2] == tag:
+                batches[-1][1].append(text)
+            else:
+                batches.append((name, [text], tag))
+        touched = set()
+        for name, texts, tag in batches:
+            widget = self.log_widgets[name]
+            if name not in touched: widget.config(state='normal')
+            widget.insert(tk.END, "".join(texts), tag)
+            touched.add(name)
+        for name in touched:
+            widget = self.log_widgets[name]
+            self._trim(widget)
+            widget.see(tk.END)
+            widget.config(state='disabled')
+        return len(dirty), len(batches)
+
+    def _trim(self, widget):
+        lines = int(widget.index('end-1c').split('.')[0])
+        if lines > self.max_lines:
+            widget.delete('1.0', f"{lines - self.max_lines + 1}.0")